@@ -5,11 +5,14 @@ Common utility functions for the Google Drive cleanup and trading data tools.
 from __future__ import annotations
 
 import datetime as dt
+import hashlib
 import json
+import mmap
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 
 
 def eprint(*args: object) -> None:
@@ -78,3 +81,118 @@ def write_json(path: str | Path, payload: Any) -> None:
     """Write a payload to a JSON file."""
     with open(path, "w", encoding="utf-8") as f:
         json.dump(payload, f, indent=2, sort_keys=True)
+
+
+def write_json_atomic(path: str | Path, payload: Any) -> None:
+    """
+    Write a payload to a JSON file via a temp file and rename.
+    Readers (or a resumed run after a crash) never see a half-written file.
+    """
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(payload, f, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def md5_file(path: str | Path, *, block_size: int = 8 << 20) -> str:
+    """
+    MD5 hex digest of a file, read through mmap.
+
+    The mapped file is fed to hashlib in large zero-copy slices; hashlib
+    releases the GIL for large updates, so several files hash in parallel on
+    threads.
+    """
+    h = hashlib.md5()
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            # Empty files cannot be mapped.
+            return h.hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                for off in range(0, size, block_size):
+                    h.update(view[off : off + block_size])
+            finally:
+                view.release()
+    return h.hexdigest()
+
+
+class HashCache:
+    """
+    Persistent path -> md5 cache.
+
+    Entries are keyed on the file's size and mtime_ns, so a file is re-hashed
+    only when it changes. The cache is a JSON object saved atomically.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.entries: Dict[str, List[Any]] = {}
+        self.dirty = False
+
+    def load(self) -> "HashCache":
+        if self.path.exists():
+            with self.path.open("r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+        return self
+
+    def get(self, key: str, st: os.stat_result) -> Optional[str]:
+        entry = self.entries.get(key)
+        if entry and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+            return entry[2]
+        return None
+
+    def put(self, key: str, st: os.stat_result, md5: str) -> None:
+        self.entries[key] = [st.st_size, st.st_mtime_ns, md5]
+        self.dirty = True
+
+    def retain(self, prefix: str, keep: Iterable[str]) -> None:
+        """Drop entries under `prefix` that are not in `keep` (deleted files)."""
+        keep_set = set(keep)
+        stale = [k for k in self.entries if k.startswith(prefix) and k not in keep_set]
+        for k in stale:
+            del self.entries[k]
+        self.dirty = self.dirty or bool(stale)
+
+    def save(self) -> None:
+        if self.dirty:
+            write_json_atomic(self.path, self.entries)
+            self.dirty = False
+
+
+def hash_files_parallel(
+    files: Iterable[Tuple[str, os.stat_result]],
+    *,
+    cache: Optional[HashCache] = None,
+    workers: int = 0,
+    on_hashed: Optional[Callable[[int], None]] = None,
+) -> Tuple[Dict[str, str], List[str]]:
+    """
+    MD5 every (path, stat) in `files`, using `cache` for unchanged files.
+
+    Cache misses are hashed on `workers` threads (default: CPU count).
+    `on_hashed(nbytes)` is called after each file is hashed. Returns
+    ({path: md5}, [paths that were actually hashed]).
+    """
+    digests: Dict[str, str] = {}
+    todo: List[Tuple[str, os.stat_result]] = []
+    for path, st in files:
+        md5 = cache.get(path, st) if cache else None
+        if md5 is None:
+            todo.append((path, st))
+        else:
+            digests[path] = md5
+
+    def _hash(item: Tuple[str, os.stat_result]) -> Tuple[str, os.stat_result, str]:
+        path, st = item
+        return path, st, md5_file(path)
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 4) as pool:
+        for path, st, md5 in pool.map(_hash, todo):
+            digests[path] = md5
+            if cache:
+                cache.put(path, st, md5)
+            if on_hashed:
+                on_hashed(st.st_size)
+    return digests, [path for path, _ in todo]
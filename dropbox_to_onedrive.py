@@ -7,7 +7,7 @@ This script is designed for "shared folder" URLs like:
 
 It will:
   1) download the Dropbox share as a ZIP (dl=1)
-  2) extract it locally
+  2) extract it locally (or, with --stream-zip, read members straight from the ZIP)
   3) upload contents into OneDrive via Microsoft Graph (device-code login)
 
 Safety:
@@ -18,25 +18,53 @@ Safety:
 from __future__ import annotations
 
 import argparse
-import itertools
+import base64
+import email.utils
+import json
+import mmap
 import os
+import random
+import shutil
+import socket
 import sys
 import tempfile
+import threading
 import time
 import zipfile
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from typing import IO, Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
 from urllib.parse import parse_qsl, quote, urlencode, urlparse, urlunparse
 
-from common_utils import eprint, human_bytes, now_stamp
+from common_utils import HashCache, eprint, human_bytes, now_stamp, write_json_atomic
 import msal
 import requests
+from requests.adapters import HTTPAdapter
 from tqdm import tqdm
+from urllib3.connection import HTTPConnection
 
 
 GRAPH_BASE = "https://graph.microsoft.com/v1.0"
+DROPBOX_API = "https://api.dropboxapi.com"
+DROPBOX_CONTENT = "https://content.dropboxapi.com"
+EXTRACT_BUFFER = 1024 * 1024
+DOWNLOAD_SEGMENT = 64 * 1024 * 1024
+DOWNLOAD_RETRIES = 3
+UPLOAD_CHUNK_RETRIES = 4
+UPLOAD_RETRY_BACKOFF_S = 1.0
+UPLOAD_STATE_SAVE_INTERVAL_S = 2.0
+RETRYABLE_STATUS = {408, 416, 429, 500, 502, 503, 504}
+GRAPH_RETRIES = 6
+GRAPH_RETRY_STATUS = {429, 500, 502, 503, 504}
+GRAPH_THROTTLE_STATUS = {429, 503}
+GRAPH_BACKOFF_BASE_S = 1.0
+GRAPH_BACKOFF_MAX_S = 60.0
+GRAPH_BATCH_LIMIT = 20
+SIMPLE_UPLOAD_MAX = 4 * 1024 * 1024
+QUICKXOR_BLOCK = 160 * 65536
+COPY_POLL_MAX_S = 5.0
+DELTA_SELECT = "id,name,size,file,folder,parentReference,deleted"
 
 
 def normalize_dropbox_download_url(url: str) -> str:
@@ -51,14 +79,371 @@ def normalize_dropbox_download_url(url: str) -> str:
     return urlunparse((u.scheme, u.netloc, u.path, u.params, new_query, u.fragment))
 
 
-def download_to_file(url: str, *, dest_path: Path, timeout_s: int = 120) -> None:
-    dest_path.parent.mkdir(parents=True, exist_ok=True)
-    with requests.get(url, stream=True, timeout=timeout_s, allow_redirects=True) as r:
+class DownloadParts:
+    """
+    Which segments of a ranged download are already on disk, persisted
+    (atomically) in a <dest>.parts.json sidecar so a re-run can resume.
+
+    The sidecar is kept after the download finishes, as the record that
+    dest holds this URL's content at this `version` (ETag or Last-Modified).
+    """
+
+    def __init__(
+        self, dest_path: Path, *, url: str, size: int, segment_size: int, version: Optional[str] = None
+    ) -> None:
+        self.path = Path(f"{dest_path}.parts.json")
+        self.url = url
+        self.size = size
+        self.segment_size = segment_size
+        self.version = version
+        self.done: Set[int] = set()
+        self._lock = threading.Lock()
+
+    def load(self) -> "DownloadParts":
+        """Pick up completed segments, if the sidecar describes this same download."""
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if (state.get("url"), state.get("size"), state.get("segmentSize"), state.get("version")) == (
+                self.url,
+                self.size,
+                self.segment_size,
+                self.version,
+            ):
+                self.done = set(state.get("done", []))
+        return self
+
+    @property
+    def segments(self) -> int:
+        return -(-self.size // self.segment_size)
+
+    def save(self) -> None:
+        write_json_atomic(
+            self.path,
+            {
+                "url": self.url,
+                "size": self.size,
+                "segmentSize": self.segment_size,
+                "version": self.version,
+                "done": sorted(self.done),
+            },
+        )
+
+    def mark(self, index: int) -> None:
+        with self._lock:
+            self.done.add(index)
+            self.save()
+
+
+class PooledAdapter(HTTPAdapter):
+    """
+    HTTPAdapter whose per-host pool holds one connection per worker, with
+    TCP keep-alive so idle connections survive long chunk uploads. Counts of
+    requests and new connections are kept per host for pool_stats().
+    """
+
+    def __init__(self, pool_size: int) -> None:
+        self._stats_lock = threading.Lock()
+        self._retired = {"requests": 0, "connections": 0}
+        super().__init__(pool_connections=4, pool_maxsize=max(1, pool_size))
+
+    def init_poolmanager(self, *args: Any, **kwargs: Any) -> None:
+        options = list(HTTPConnection.default_socket_options) + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+        if hasattr(socket, "TCP_KEEPIDLE"):
+            options += [
+                (socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 60),
+                (socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, 15),
+            ]
+        kwargs["socket_options"] = options
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pools.dispose_func = self._retire
+
+    def _retire(self, pool: Any) -> None:
+        # Keep the counts of host pools that drop out of the LRU.
+        with self._stats_lock:
+            self._retired["requests"] += pool.num_requests
+            self._retired["connections"] += pool.num_connections
+        pool.close()
+
+    def pool_stats(self) -> Dict[str, int]:
+        """Requests sent, TCP/TLS connections opened, and requests that reused a connection."""
+        with self._stats_lock:
+            stats = dict(self._retired)
+        pools = self.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                stats["requests"] += pool.num_requests
+                stats["connections"] += pool.num_connections
+        stats["reused"] = max(0, stats["requests"] - stats["connections"])
+        return stats
+
+
+def pooled_session(pool_size: int) -> requests.Session:
+    """A requests.Session whose connection pools fit `pool_size` concurrent workers."""
+    session = requests.Session()
+    adapter = PooledAdapter(pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def probe_range_support(
+    session: requests.Session, url: str, *, timeout_s: int
+) -> Tuple[str, Optional[int], Optional[str]]:
+    """
+    Ask for the first byte only. Returns (final URL after redirects, total
+    size, version) when the server answers 206 with a complete
+    Content-Range, or (url, None, None) when byte ranges are not supported.
+    The version is the ETag, or Last-Modified, if the server sends one.
+    """
+    with session.get(
+        url, headers={"Range": "bytes=0-0"}, stream=True, timeout=timeout_s, allow_redirects=True
+    ) as r:
+        r.raise_for_status()
+        content_range = r.headers.get("Content-Range", "")
+        if r.status_code == 206 and content_range.startswith("bytes 0-0/"):
+            total = content_range.rsplit("/", 1)[1]
+            if total.isdigit():
+                return r.url, int(total), r.headers.get("ETag") or r.headers.get("Last-Modified")
+    return url, None, None
+
+
+def _fetch_segment(
+    session: requests.Session,
+    url: str,
+    *,
+    dest_path: Path,
+    start: int,
+    end: int,
+    timeout_s: int,
+    on_bytes: Any,
+) -> None:
+    """Download bytes [start, end] into their place in dest_path, retrying the whole segment."""
+    for attempt in range(DOWNLOAD_RETRIES):
+        written = 0
+        try:
+            with session.get(
+                url, headers={"Range": f"bytes={start}-{end}"}, stream=True, timeout=timeout_s
+            ) as r:
+                if r.status_code != 206:
+                    raise RuntimeError(f"Expected 206 for bytes {start}-{end}, got HTTP {r.status_code}")
+                with open(dest_path, "r+b") as f:
+                    f.seek(start)
+                    for chunk in r.iter_content(chunk_size=1024 * 1024):
+                        f.write(chunk)
+                        written += len(chunk)
+                        on_bytes(len(chunk))
+            if written != end - start + 1:
+                raise RuntimeError(f"Segment {start}-{end} ended after {written} bytes")
+            return
+        except (requests.RequestException, RuntimeError):
+            on_bytes(-written)
+            if attempt == DOWNLOAD_RETRIES - 1:
+                raise
+            time.sleep(2**attempt)
+
+
+def _download_single(session: requests.Session, url: str, *, dest_path: Path, timeout_s: int) -> None:
+    with session.get(url, stream=True, timeout=timeout_s, allow_redirects=True) as r:
         r.raise_for_status()
-        with open(dest_path, "wb") as f:
+        total = int(r.headers.get("Content-Length") or 0) or None
+        with open(dest_path, "wb") as f, tqdm(total=total, unit="B", unit_scale=True) as pbar:
             for chunk in r.iter_content(chunk_size=1024 * 1024):
                 if chunk:
                     f.write(chunk)
+                    pbar.update(len(chunk))
+
+
+def download_to_file(
+    url: str,
+    *,
+    dest_path: Path,
+    timeout_s: int = 120,
+    workers: int = 4,
+    segment_size: int = DOWNLOAD_SEGMENT,
+) -> None:
+    """
+    Download url to dest_path.
+
+    When the server supports byte ranges, fixed-size segments are fetched
+    concurrently into a preallocated file and recorded in a sidecar, so an
+    interrupted download resumes with only the missing segments. An existing
+    file is reused only when its sidecar records every segment of this same
+    URL and version. Otherwise this falls back to a single streaming GET.
+    """
+    dest_path.parent.mkdir(parents=True, exist_ok=True)
+    with pooled_session(workers) as session:
+        final_url, size, version = probe_range_support(session, url, timeout_s=timeout_s)
+        if size is None:
+            print("Server does not support byte ranges; downloading as a single stream.")
+            _download_single(session, url, dest_path=dest_path, timeout_s=timeout_s)
+            return
+
+        parts = DownloadParts(dest_path, url=url, size=size, segment_size=segment_size, version=version)
+        if dest_path.exists() and dest_path.stat().st_size == size:
+            parts.load()
+            if len(parts.done) == parts.segments:
+                print(f"Already downloaded: {dest_path.name}")
+                return
+        if not parts.done:
+            # Write the sidecar before preallocating, so a full-size file
+            # never passes for another download or a finished one.
+            parts.save()
+        with open(dest_path, "r+b" if parts.done else "wb") as f:
+            f.truncate(size)
+
+        segments = [
+            (i, start, min(start + segment_size, size) - 1)
+            for i, start in enumerate(range(0, size, segment_size))
+        ]
+        todo = [seg for seg in segments if seg[0] not in parts.done]
+        if parts.done:
+            print(f"Resuming download: {len(segments) - len(todo)}/{len(segments)} segments already on disk.")
+        done_bytes = sum(end - start + 1 for i, start, end in segments if i in parts.done)
+
+        with tqdm(total=size, initial=done_bytes, unit="B", unit_scale=True) as pbar:
+
+            def fetch(seg: Tuple[int, int, int]) -> None:
+                i, start, end = seg
+                _fetch_segment(
+                    session,
+                    final_url,
+                    dest_path=dest_path,
+                    start=start,
+                    end=end,
+                    timeout_s=timeout_s,
+                    on_bytes=pbar.update,
+                )
+                parts.mark(i)
+
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+                list(ex.map(fetch, todo))
+
+
+class DropboxClient:
+    """
+    Lists and downloads the files of a Dropbox shared link through the
+    Dropbox API (files/list_folder and sharing/get_shared_link_file), one
+    request per file, instead of as one server-side ZIP.
+    """
+
+    def __init__(
+        self,
+        access_token: str,
+        *,
+        shared_url: str,
+        pool_size: int = 4,
+        api_url: str = DROPBOX_API,
+        content_url: str = DROPBOX_CONTENT,
+    ) -> None:
+        self.shared_url = shared_url
+        self.api_url = api_url.rstrip("/")
+        self.content_url = content_url.rstrip("/")
+        self._s = pooled_session(pool_size)
+        self._s.headers.update({"Authorization": f"Bearer {access_token}"})
+
+    def _post(self, url: str, **kwargs: Any) -> requests.Response:
+        """POST, retrying rate limits (honouring Retry-After), 5xx and dropped connections."""
+        for attempt in range(GRAPH_RETRIES + 1):
+            try:
+                r: Optional[requests.Response] = self._s.post(url, timeout=120, **kwargs)
+            except requests.RequestException:
+                if attempt == GRAPH_RETRIES:
+                    raise
+                r = None
+            if r is not None and (r.status_code not in GRAPH_RETRY_STATUS or attempt == GRAPH_RETRIES):
+                r.raise_for_status()
+                return r
+            if r is not None:
+                r.close()
+            retry_after = _retry_after_s(r.headers) if r is not None else None
+            time.sleep(_backoff_s(attempt) if retry_after is None else retry_after)
+        raise AssertionError("unreachable")
+
+    def list_folder(self, path: str) -> Iterable[dict]:
+        """Entries directly inside `path` ("" for the link's root), following cursors."""
+        data = self._post(
+            f"{self.api_url}/2/files/list_folder", json={"path": path, "shared_link": {"url": self.shared_url}}
+        ).json()
+        yield from data.get("entries", [])
+        while data.get("has_more"):
+            data = self._post(f"{self.api_url}/2/files/list_folder/continue", json={"cursor": data["cursor"]}).json()
+            yield from data.get("entries", [])
+
+    def download(self, path: str, dest_path: Path) -> int:
+        """Stream the file at `path` (inside the link) to dest_path; returns its size."""
+        # Dropbox-API-Arg must be ASCII; json.dumps escapes everything else.
+        arg = json.dumps({"url": self.shared_url, "path": path})
+        for attempt in range(DOWNLOAD_RETRIES + 1):
+            r = self._post(
+                f"{self.content_url}/2/sharing/get_shared_link_file", headers={"Dropbox-API-Arg": arg}, stream=True
+            )
+            written = 0
+            try:
+                with r, open(dest_path, "wb") as f:
+                    for chunk in r.iter_content(chunk_size=EXTRACT_BUFFER):
+                        f.write(chunk)
+                        written += len(chunk)
+                return written
+            except requests.RequestException:
+                # The connection dropped mid-body: fetch the file again.
+                if attempt == DOWNLOAD_RETRIES:
+                    raise
+                time.sleep(_backoff_s(attempt))
+        raise AssertionError("unreachable")
+
+
+def list_shared_folder(dbx: DropboxClient, *, workers: int) -> Tuple[List[Tuple[str, Path, int]], int]:
+    """
+    All files under the shared link as (Dropbox path, relative path, size),
+    plus the number of entries skipped for unsafe names.
+
+    list_folder is not recursive for shared links, so the tree is walked
+    breadth first, listing each level's folders concurrently.
+    """
+    files: List[Tuple[str, Path, int]] = []
+    unsafe = 0
+    level = [""]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+        while level:
+            next_level: List[str] = []
+            for folder, entries in zip(level, ex.map(lambda p: list(dbx.list_folder(p)), level)):
+                for entry in entries:
+                    path = f"{folder}/{entry.get('name', '')}"
+                    rel = zip_member_rel_path(path.lstrip("/"))
+                    if rel is None:
+                        unsafe += 1
+                    elif entry.get(".tag") == "folder":
+                        next_level.append(path)
+                    elif entry.get(".tag") == "file":
+                        files.append((path, rel, int(entry.get("size") or 0)))
+            level = next_level
+    return files, unsafe
+
+
+def dropbox_fetcher(
+    dbx: DropboxClient, spool_dir: Path, *, existing: Optional[Dict[Path, RemoteFile]] = None
+) -> Callable[[Tuple[str, Path, int]], Optional[Path]]:
+    """
+    The fetch() for upload_files with --source dropbox-api: download an
+    entry into spool_dir and return the local file, or None (after deleting
+    it) when `existing` already holds the same content at that path.
+    """
+
+    def fetch(entry: Tuple[str, Path, int]) -> Optional[Path]:
+        source, rel_path, size = entry
+        fd, name = tempfile.mkstemp(dir=spool_dir)
+        os.close(fd)
+        local = Path(name)
+        dbx.download(source, local)
+        remote = (existing or {}).get(rel_path)
+        if remote is not None and remote.size == size and remote.quick_xor == quickxor_file(local):
+            local.unlink()
+            return None
+        return local
+
+    return fetch
 
 
 def pick_extracted_root(extract_dir: Path) -> Path:
@@ -96,6 +481,270 @@ def iter_files_with_size(root: Path) -> Iterable[Tuple[Path, Path, int]]:
     yield from _scan(root, Path(""))
 
 
+def zip_mtime_ns(info: zipfile.ZipInfo) -> int:
+    """A member's modification time (local time, as stored in the ZIP) in ns since the epoch."""
+    return int(time.mktime(info.date_time + (0, 0, -1))) * 1_000_000_000
+
+
+def zip_member_rel_path(name: str) -> Optional[Path]:
+    """
+    Safe relative path for a ZIP member name, or None if the name is empty or
+    would escape the destination (absolute paths, drive letters, "..").
+    """
+    name = name.replace("\\", "/")
+    parts = [p for p in name.split("/") if p not in ("", ".")]
+    if not parts or name.startswith("/") or ":" in parts[0] or ".." in parts:
+        return None
+    return Path(*parts)
+
+
+def iter_zip_members(zf: zipfile.ZipFile) -> Tuple[List[Tuple[zipfile.ZipInfo, Path, int]], int]:
+    """
+    List the file members of a ZIP as (info, relative path, size), without
+    extracting anything.
+
+    Like pick_extracted_root, a single top-level directory wrapping every
+    member is stripped. A repeated name yields only its last copy, which is
+    what extraction leaves on disk. Returns (members, number of unsafe names
+    skipped).
+    """
+    entries: List[Tuple[zipfile.ZipInfo, Path]] = []
+    unsafe = 0
+    for info in zf.infolist():
+        rel = zip_member_rel_path(info.filename)
+        if rel is None:
+            unsafe += 1
+            continue
+        entries.append((info, rel))
+
+    tops = {rel.parts[0] for _, rel in entries}
+    strip = len(tops) == 1 and all(
+        len(rel.parts) > 1 or info.is_dir() for info, rel in entries
+    )
+    latest: Dict[Path, zipfile.ZipInfo] = {}
+    for info, rel in entries:
+        if info.is_dir():
+            continue
+        if strip:
+            rel = Path(*rel.parts[1:])
+        latest[rel] = info
+    return [(info, rel, info.file_size) for rel, info in latest.items()], unsafe
+
+
+class ZipReader:
+    """
+    Opens ZIP members for reading from several threads.
+
+    Each thread gets its own ZipFile handle (and so its own file position and
+    decompressor); handles are closed together by close().
+    """
+
+    def __init__(self, zip_path: Path) -> None:
+        self.zip_path = zip_path
+        self._local = threading.local()
+        self._handles: List[zipfile.ZipFile] = []
+        self._lock = threading.Lock()
+
+    def open(self, info: zipfile.ZipInfo) -> IO[bytes]:
+        zf = getattr(self._local, "zf", None)
+        if zf is None:
+            zf = self._local.zf = zipfile.ZipFile(self.zip_path)
+            with self._lock:
+                self._handles.append(zf)
+        return zf.open(info)
+
+    def close(self) -> None:
+        with self._lock:
+            for zf in self._handles:
+                zf.close()
+            self._handles.clear()
+
+
+def extract_zip_parallel(zip_path: Path, dest_dir: Path, *, workers: int) -> Tuple[int, int, int]:
+    """
+    Extract a ZIP like ZipFile.extractall, but decompress members concurrently.
+
+    Directories are created once up front; each worker thread then reads
+    through its own ZipFile handle. Names that would escape dest_dir are
+    skipped. Returns (files extracted, bytes written, unsafe entries skipped).
+    """
+    with zipfile.ZipFile(zip_path) as zf:
+        infos = zf.infolist()
+
+    dirs: Set[Path] = set()
+    latest: Dict[Path, zipfile.ZipInfo] = {}
+    unsafe = 0
+    for info in infos:
+        rel = zip_member_rel_path(info.filename)
+        if rel is None:
+            unsafe += 1
+        elif info.is_dir():
+            dirs.add(rel)
+        else:
+            dirs.add(rel.parent)
+            # A name may repeat; extractall leaves the last copy, and two
+            # threads must never write the same file.
+            latest[rel] = info
+    for d in sorted(dirs):
+        (dest_dir / d).mkdir(parents=True, exist_ok=True)
+
+    # Largest first, so a big member does not start last and run alone.
+    members = sorted(((info, rel) for rel, info in latest.items()), key=lambda m: m[0].file_size, reverse=True)
+    reader = ZipReader(zip_path)
+
+    def extract(member: Tuple[zipfile.ZipInfo, Path]) -> int:
+        info, rel = member
+        with reader.open(info) as src, open(dest_dir / rel, "wb") as dst:
+            shutil.copyfileobj(src, dst, EXTRACT_BUFFER)
+        # Keep the archive's timestamp so hash-cache entries stay valid
+        # across re-extractions.
+        mtime_ns = zip_mtime_ns(info)
+        os.utime(dest_dir / rel, ns=(mtime_ns, mtime_ns))
+        return info.file_size
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+            written = sum(ex.map(extract, members))
+    finally:
+        reader.close()
+    return len(members), written, unsafe
+
+
+class QuickXorHash:
+    """
+    OneDrive's quickXorHash, computed incrementally.
+
+    Byte i of the input is XORed into a 160-bit circular register at bit
+    offset 11 * i (mod 160); the total length (8 bytes, little-endian) is
+    then XORed into the register's last 8 bytes. Bytes 160 apart land on
+    the same offset, so each update first folds its data to 160 bytes with
+    big-int XORs and only those 160 bytes are placed individually.
+    """
+
+    WIDTH = 160
+    SHIFT = 11
+    _MASK = (1 << WIDTH) - 1
+
+    def __init__(self) -> None:
+        self._state = 0
+        self._length = 0
+
+    def update(self, data: Any) -> None:
+        view = memoryview(data).cast("B")
+        n = len(view)
+        if not n:
+            return
+        whole = n - n % self.WIDTH
+        folded = bytearray(self.WIDTH)
+        if whole:
+            acc = int.from_bytes(view[:whole], "little")
+            rows = whole // self.WIDTH
+            while rows > 1:
+                low_bits = (rows // 2) * self.WIDTH * 8
+                acc = (acc >> low_bits) ^ (acc & ((1 << low_bits) - 1))
+                rows -= rows // 2
+            folded[:] = acc.to_bytes(self.WIDTH, "little")
+        for r, b in enumerate(view[whole:]):
+            folded[r] ^= b
+
+        state = self._state
+        for r, b in enumerate(folded):
+            if b:
+                shift = (self.SHIFT * (self._length + r)) % self.WIDTH
+                v = b << shift
+                state ^= (v | (v >> self.WIDTH)) & self._MASK
+        self._state = state
+        self._length += n
+
+    def digest(self) -> bytes:
+        out = bytearray(self._state.to_bytes(self.WIDTH // 8, "little"))
+        for i, b in enumerate(self._length.to_bytes(8, "little")):
+            out[self.WIDTH // 8 - 8 + i] ^= b
+        return bytes(out)
+
+    def b64digest(self) -> str:
+        """The digest as Graph reports it in file.hashes.quickXorHash."""
+        return base64.b64encode(self.digest()).decode("ascii")
+
+
+def quickxor_file(path: Path, *, block_size: int = QUICKXOR_BLOCK) -> str:
+    """quickXorHash of a local file, read through mmap in zero-copy slices."""
+    h = QuickXorHash()
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            # Empty files cannot be mapped.
+            return h.b64digest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                for off in range(0, size, block_size):
+                    h.update(view[off : off + block_size])
+            finally:
+                view.release()
+    return h.b64digest()
+
+
+def quickxor_stream(stream: IO[bytes], *, block_size: int = QUICKXOR_BLOCK) -> str:
+    h = QuickXorHash()
+    while True:
+        data = stream.read(block_size)
+        if not data:
+            return h.b64digest()
+        h.update(data)
+
+
+@dataclass(frozen=True)
+class _SourceStat:
+    """The two os.stat_result fields HashCache checks, for ZIP members."""
+
+    st_size: int
+    st_mtime_ns: int
+
+
+def hash_sources(
+    files: List[Tuple[Any, Path, int]],
+    *,
+    reader: Optional[ZipReader],
+    cache: HashCache,
+    workers: int,
+) -> Dict[str, str]:
+    """
+    quickXorHash of every upload source, keyed by relative POSIX path.
+
+    Extracted files are hashed through mmap and ZIP members from their
+    decompressing stream, on `workers` threads. Results are cached by
+    relative path, size and mtime, so unchanged files in a re-downloaded
+    share are not hashed again.
+    """
+    digests: Dict[str, str] = {}
+    todo: List[Tuple[Any, str, Any]] = []
+    for source, rel, _ in files:
+        key = rel.as_posix()
+        if reader is not None:
+            st: Any = _SourceStat(source.file_size, zip_mtime_ns(source))
+        else:
+            st = os.stat(source)
+        digest = cache.get(key, st)
+        if digest is None:
+            todo.append((source, key, st))
+        else:
+            digests[key] = digest
+
+    def _hash(item: Tuple[Any, str, Any]) -> Tuple[str, Any, str]:
+        source, key, st = item
+        if reader is not None:
+            with reader.open(source) as stream:
+                return key, st, quickxor_stream(stream)
+        return key, st, quickxor_file(source)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for key, st, digest in pool.map(_hash, todo):
+            digests[key] = digest
+            cache.put(key, st, digest)
+    return digests
+
+
 def encode_drive_path(path: str) -> str:
     """
     Encode a OneDrive path for Graph's /root:/...: addressing.
@@ -105,46 +754,357 @@ def encode_drive_path(path: str) -> str:
     return quote(path, safe="/")
 
 
+class UploadState:
+    """
+    Upload session URLs/offsets and completed files, persisted (atomically)
+    so an interrupted import resumes instead of starting over. The file is
+    removed once an import finishes.
+
+    Entries are keyed by OneDrive path and only apply while the source size
+    is unchanged. Session changes are saved at once; completions are saved
+    at most every UPLOAD_STATE_SAVE_INTERVAL_S (and by flush()), so imports
+    of many small files do not rewrite the file per upload.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.sessions: Dict[str, Dict[str, Any]] = {}
+        self.completed: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._saved_at = 0.0
+
+    def load(self) -> "UploadState":
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            self.sessions = state.get("sessions", {})
+            self.completed = state.get("completed", {})
+        return self
+
+    def is_complete(self, drive_path: str, size: int) -> bool:
+        with self._lock:
+            return self.completed.get(drive_path) == size
+
+    def session(self, drive_path: str, size: int) -> Optional[str]:
+        """The saved upload URL for this path, if it was started for the same size."""
+        with self._lock:
+            e = self.sessions.get(drive_path)
+        if e and e["size"] == size:
+            return e["uploadUrl"]
+        return None
+
+    def put_session(self, drive_path: str, size: int, upload_url: str, offset: int) -> None:
+        with self._lock:
+            self.sessions[drive_path] = {"uploadUrl": upload_url, "size": size, "offset": offset}
+            self._save()
+
+    def complete(self, drive_path: str, size: int) -> None:
+        with self._lock:
+            self.completed[drive_path] = size
+            self._dirty = True
+            if self.sessions.pop(drive_path, None) is not None:
+                self._save()
+            elif time.monotonic() - self._saved_at >= UPLOAD_STATE_SAVE_INTERVAL_S:
+                self._save()
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._dirty:
+                self._save()
+
+    def remove(self) -> None:
+        """Forget the run once it has finished, so a later import uploads afresh."""
+        with self._lock:
+            self.sessions.clear()
+            self.completed.clear()
+            self._dirty = False
+            if self.path.exists():
+                self.path.unlink()
+
+    def _save(self) -> None:
+        # Caller holds self._lock.
+        write_json_atomic(self.path, {"sessions": self.sessions, "completed": self.completed})
+        self._dirty = False
+        self._saved_at = time.monotonic()
+
+
+class ChunkBufferPool:
+    """
+    A fixed budget of reusable upload buffers shared by all workers.
+
+    At most `count` buffers of `buffer_size` bytes ever exist (allocated on
+    first use), so chunk memory is bounded by the budget whatever the file
+    sizes or worker count. acquire() blocks while all buffers are in flight.
+    """
+
+    def __init__(self, buffer_size: int, *, budget_bytes: int) -> None:
+        self.buffer_size = buffer_size
+        self.count = max(1, budget_bytes // buffer_size)
+        self.allocated = 0
+        self._free: List[bytearray] = []
+        self._cond = threading.Condition()
+
+    def acquire(self) -> bytearray:
+        with self._cond:
+            while not self._free and self.allocated >= self.count:
+                self._cond.wait()
+            if self._free:
+                return self._free.pop()
+            self.allocated += 1
+        return bytearray(self.buffer_size)
+
+    def release(self, buf: bytearray) -> None:
+        with self._cond:
+            self._free.append(buf)
+            self._cond.notify()
+
+
+def _read_into(stream: IO[bytes], view: memoryview) -> int:
+    """Fill view from stream (readinto may return short reads); returns the bytes read."""
+    filled = 0
+    while filled < len(view):
+        n = stream.readinto(view[filled:])
+        if not n:
+            break
+        filled += n
+    return filled
+
+
+class GraphGovernor:
+    """
+    Shared cap on in-flight Graph requests across all worker threads.
+
+    The cap follows AIMD: it halves when Graph throttles (429/503) and grows
+    by one after a full window of successes, so a large import settles near
+    the highest rate Graph accepts. A Retry-After pauses every thread, not
+    only the one that received it.
+    """
+
+    def __init__(self, max_concurrency: int, *, min_concurrency: int = 1) -> None:
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.limit = float(self.max_concurrency)
+        self.in_flight = 0
+        self.throttled = 0
+        self._successes = 0
+        self._paused_until = 0.0
+        self._last_decrease = float("-inf")
+        self._cond = threading.Condition()
+
+    def acquire(self) -> None:
+        with self._cond:
+            while True:
+                wait = self._paused_until - time.monotonic()
+                if wait <= 0 and self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return
+                self._cond.wait(timeout=wait if wait > 0 else None)
+
+    def release(self) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def on_success(self) -> None:
+        with self._cond:
+            if self.limit >= self.max_concurrency:
+                return
+            self._successes += 1
+            if self._successes >= int(self.limit):
+                self.limit += 1
+                self._successes = 0
+                self._cond.notify_all()
+
+    def on_throttle(self, retry_after_s: float) -> None:
+        with self._cond:
+            now = time.monotonic()
+            self.throttled += 1
+            self._successes = 0
+            self._paused_until = max(self._paused_until, now + retry_after_s)
+            # Requests already in flight were sent at the old rate; decrease
+            # once per pause so a burst of 429s does not collapse the cap.
+            if now - self._last_decrease >= max(retry_after_s, 1.0):
+                self.limit = max(float(self.min_concurrency), self.limit / 2)
+                self._last_decrease = now
+
+
+def _retry_after_s(headers: Any) -> Optional[float]:
+    """Retry-After in seconds (delta-seconds or HTTP-date), if present."""
+    value = headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def _backoff_s(attempt: int) -> float:
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(GRAPH_BACKOFF_MAX_S, GRAPH_BACKOFF_BASE_S * 2**attempt))
+
+
 @dataclass(frozen=True)
 class GraphAuth:
     access_token: str
 
 
 class GraphClient:
-    def __init__(self, auth: GraphAuth) -> None:
-        self._s = requests.Session()
+    def __init__(
+        self,
+        auth: GraphAuth,
+        *,
+        governor: Optional[GraphGovernor] = None,
+        buffers: Optional[ChunkBufferPool] = None,
+        base_url: str = GRAPH_BASE,
+    ) -> None:
+        # base_url points the client at another Graph endpoint, e.g. the
+        # local fake in onedrive_fake.py used for offline benchmarks.
+        self.base_url = base_url.rstrip("/")
+        self.governor = governor or GraphGovernor(32)
+        self.buffers = buffers
+        # --- OPTIMIZATION: Pools sized to the worker count ---
+        # The default pool keeps 10 connections per host, so with more
+        # workers the extras were discarded after each request and the next
+        # one paid a fresh TCP + TLS handshake. One shared session (with
+        # urllib3's thread-safe pools) now keeps a connection per worker.
+        self._s = pooled_session(self.governor.max_concurrency)
         self._s.headers.update(
             {
                 "Authorization": f"Bearer {auth.access_token}",
             }
         )
 
+    def pool_stats(self) -> Dict[str, int]:
+        return self._s.get_adapter(self.base_url).pool_stats()
+
+    def _request(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        """
+        Send a request through the governor.
+
+        Throttling (429/503, honouring Retry-After), other 5xx responses and
+        connection errors are retried with jittered exponential backoff; a
+        file body is rewound before each retry. The last response is returned
+        unchecked, so callers keep their own raise_for_status handling.
+        """
+        body = kwargs.get("data")
+        rewind = body.tell() if hasattr(body, "seek") else None
+        for attempt in range(GRAPH_RETRIES + 1):
+            if attempt and rewind is not None:
+                body.seek(rewind)
+            self.governor.acquire()
+            try:
+                r: Optional[requests.Response] = self._s.request(method, url, **kwargs)
+            except requests.RequestException:
+                if attempt == GRAPH_RETRIES:
+                    raise
+                r = None
+            finally:
+                self.governor.release()
+
+            if r is not None and r.status_code not in GRAPH_RETRY_STATUS:
+                self.governor.on_success()
+                return r
+            if r is not None and attempt == GRAPH_RETRIES:
+                return r
+            if r is not None and r.status_code in GRAPH_THROTTLE_STATUS:
+                # The governor pauses every thread until Retry-After has passed.
+                retry_after = _retry_after_s(r.headers)
+                self.governor.on_throttle(_backoff_s(attempt) if retry_after is None else retry_after)
+            else:
+                time.sleep(_backoff_s(attempt))
+        raise AssertionError("unreachable")
+
+    def batch(self, requests_: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Send up to GRAPH_BATCH_LIMIT requests in one JSON $batch call and
+        return their responses ({"status", "headers", "body"}) in order.
+
+        Inner requests that were throttled or hit a 5xx are sent again in a
+        smaller batch, with the same backoff and governor pause as _request.
+        """
+        results: Dict[str, Dict[str, Any]] = {}
+        pending = {str(i): dict(req, id=str(i)) for i, req in enumerate(requests_)}
+        for attempt in range(GRAPH_RETRIES + 1):
+            r = self._request("POST", f"{self.base_url}/$batch", json={"requests": list(pending.values())}, timeout=120)
+            r.raise_for_status()
+            retry_after: Optional[float] = None
+            throttled = False
+            for resp in r.json().get("responses", []):
+                rid = str(resp.get("id"))
+                status = int(resp.get("status", 0))
+                if status in GRAPH_RETRY_STATUS and attempt < GRAPH_RETRIES:
+                    if status in GRAPH_THROTTLE_STATUS:
+                        throttled = True
+                        retry_after = max(retry_after or 0.0, _retry_after_s(resp.get("headers") or {}) or 0.0)
+                    continue
+                results[rid] = resp
+                pending.pop(rid, None)
+            if not pending:
+                break
+            if throttled:
+                self.governor.on_throttle(retry_after or _backoff_s(attempt))
+            else:
+                time.sleep(_backoff_s(attempt))
+        return [results[str(i)] for i in range(len(requests_))]
+
     def get_json(self, path: str, *, params: Optional[dict] = None) -> dict:
-        r = self._s.get(f"{GRAPH_BASE}{path}", params=params, timeout=120)
+        r = self._request("GET", f"{self.base_url}{path}", params=params, timeout=120)
         r.raise_for_status()
         return r.json()
 
     def post_json(self, path: str, payload: dict) -> dict:
-        r = self._s.post(f"{GRAPH_BASE}{path}", json=payload, timeout=120)
+        r = self._request("POST", f"{self.base_url}{path}", json=payload, timeout=120)
         r.raise_for_status()
         return r.json()
 
     def put_bytes(self, url: str, data: bytes, *, headers: Optional[dict] = None) -> dict:
-        r = self._s.put(url, data=data, headers=headers, timeout=300)
+        r = self._request("PUT", url, data=data, headers=headers, timeout=300)
         r.raise_for_status()
         # For upload-session finalization, Graph returns JSON item metadata
         return r.json() if r.content else {}
 
     def put_file_simple(self, drive_path: str, local_path: Path) -> None:
         encoded = encode_drive_path(drive_path)
-        url = f"{GRAPH_BASE}/me/drive/root:/{encoded}:/content"
+        url = f"{self.base_url}/me/drive/root:/{encoded}:/content"
         with open(local_path, "rb") as f:
-            r = self._s.put(url, data=f, timeout=600)
+            r = self._request("PUT", url, data=f, timeout=600)
             r.raise_for_status()
 
+    def put_content_simple(self, drive_path: str, data: Any) -> None:
+        """Simple upload (<= 4 MB) of in-memory content (bytes or a memoryview)."""
+        encoded = encode_drive_path(drive_path)
+        url = f"{self.base_url}/me/drive/root:/{encoded}:/content"
+        r = self._request("PUT", url, data=data, timeout=600)
+        r.raise_for_status()
+
+    def put_stream_simple(self, drive_path: str, stream: IO[bytes], *, size: int) -> None:
+        """Simple upload (<= 4 MB) of a stream, read into a pooled buffer if there is a pool."""
+        if self.buffers is None:
+            self.put_content_simple(drive_path, stream.read())
+            return
+        if size > self.buffers.buffer_size:
+            # Reading it unpooled would escape the memory budget.
+            raise ValueError(f"size {size} exceeds the buffer pool's {self.buffers.buffer_size}")
+        buf = self.buffers.acquire()
+        try:
+            data = memoryview(buf)[:size]
+            got = _read_into(stream, data)
+            if got != size:
+                raise RuntimeError(f"Source ended early at byte {got} of {size}: {drive_path}")
+            self.put_content_simple(drive_path, data)
+        finally:
+            self.buffers.release(buf)
+
     def create_upload_session(self, drive_path: str) -> str:
         encoded = encode_drive_path(drive_path)
-        url = f"{GRAPH_BASE}/me/drive/root:/{encoded}:/createUploadSession"
+        url = f"{self.base_url}/me/drive/root:/{encoded}:/createUploadSession"
         payload = {"item": {"@microsoft.graph.conflictBehavior": "replace"}}
         resp = self.post_json(f"/me/drive/root:/{encoded}:/createUploadSession", payload)
         upload_url = resp.get("uploadUrl")
@@ -159,51 +1119,189 @@ class GraphClient:
         *,
         total: int,
         chunk_size: int,
+        state: Optional[UploadState] = None,
+        on_bytes: Optional[Callable[[int], None]] = None,
     ) -> None:
-        upload_url = self.create_upload_session(drive_path)
         with open(local_path, "rb") as f:
-            start = 0
-            while start < total:
-                end_exclusive = min(start + chunk_size, total)
-                f.seek(start)
-                data = f.read(end_exclusive - start)
+            self.upload_large_stream(
+                drive_path, f, total=total, chunk_size=chunk_size, state=state, on_bytes=on_bytes
+            )
+
+    def upload_session_offset(self, upload_url: str) -> Optional[int]:
+        """
+        The next byte an upload session expects (from nextExpectedRanges), or
+        None if the session has expired or no longer accepts data.
+        """
+        r = self._request("GET", upload_url, timeout=120)
+        if r.status_code == 404:
+            return None
+        r.raise_for_status()
+        ranges = r.json().get("nextExpectedRanges") or []
+        if not ranges:
+            return None
+        # Chunks are sent in order, so the only gap is the open-ended tail.
+        return int(str(ranges[0]).split("-", 1)[0])
+
+    def upload_large_stream(
+        self,
+        drive_path: str,
+        stream: IO[bytes],
+        *,
+        total: int,
+        chunk_size: int,
+        state: Optional[UploadState] = None,
+        on_bytes: Optional[Callable[[int], None]] = None,
+    ) -> None:
+        """
+        Upload `total` bytes read sequentially from `stream` through an upload
+        session. on_bytes, if given, is called with the bytes the session
+        has newly accepted (for progress reporting).
+
+        With a state, the session URL and offset are saved after every chunk,
+        and a later call for the same path and size continues from the
+        session's nextExpectedRanges. A failed chunk is retried the same
+        way. The stream is only seeked to resume, which ZIP members support.
+        """
+        reported = 0
+
+        def progress(accepted: int) -> None:
+            nonlocal reported
+            if on_bytes is not None and accepted > reported:
+                on_bytes(accepted - reported)
+                reported = accepted
+
+        upload_url = state.session(drive_path, total) if state else None
+        start = 0
+        if upload_url:
+            offset = self.upload_session_offset(upload_url)
+            if offset is None:
+                upload_url = None
+            else:
+                start = offset
+                stream.seek(start)
+                progress(start)
+        if not upload_url:
+            upload_url = self.create_upload_session(drive_path)
+            if state:
+                state.put_session(drive_path, total, upload_url, 0)
+
+        # --- OPTIMIZATION: Reusable chunk buffers ---
+        # Each chunk is read with readinto() into a buffer from the shared
+        # pool and sent as a memoryview, instead of allocating a fresh
+        # bytes object per chunk. The pool caps the chunk bytes held across
+        # all workers, so peak memory no longer grows with --parallel.
+        if self.buffers is not None and chunk_size > self.buffers.buffer_size:
+            raise ValueError(f"chunk_size {chunk_size} exceeds the buffer pool's {self.buffers.buffer_size}")
+        failures = 0
+        while start < total:
+            end_exclusive = min(start + chunk_size, total)
+            buf = self.buffers.acquire() if self.buffers is not None else bytearray(chunk_size)
+            try:
+                data = memoryview(buf)[: end_exclusive - start]
+                got = _read_into(stream, data)
+                if got != len(data):
+                    raise RuntimeError(f"Source ended early at byte {start + got} of {total}: {drive_path}")
                 headers = {
                     "Content-Length": str(len(data)),
                     "Content-Range": f"bytes {start}-{end_exclusive - 1}/{total}",
                 }
-                r = self._s.put(upload_url, data=data, headers=headers, timeout=600)
-                # 202 accepted for intermediate chunks; 201/200 for final chunk
-                if r.status_code in (200, 201):
-                    return
-                if r.status_code == 202:
-                    start = end_exclusive
-                    continue
-                r.raise_for_status()
+                try:
+                    r: Optional[requests.Response] = self._request(
+                        "PUT", upload_url, data=data, headers=headers, timeout=600
+                    )
+                except requests.RequestException:
+                    r = None
+            finally:
+                if self.buffers is not None:
+                    self.buffers.release(buf)
+            # 202 accepted for intermediate chunks; 201/200 for final chunk
+            if r is not None and r.status_code in (200, 201):
+                progress(total)
+                if state:
+                    state.complete(drive_path, total)
+                return
+            if r is not None and r.status_code == 202:
+                start = end_exclusive
+                failures = 0
+                progress(start)
+                if state:
+                    state.put_session(drive_path, total, upload_url, start)
+                continue
 
-    def delta(self, *, item_id: str) -> Iterable[dict]:
+            # Timeouts, throttling, server errors, or 416 after a lost
+            # response: ask the session where it stands and resend from there.
+            failures += 1
+            if (r is not None and r.status_code not in RETRYABLE_STATUS) or failures > UPLOAD_CHUNK_RETRIES:
+                if r is not None:
+                    r.raise_for_status()
+                raise RuntimeError(f"Upload of {drive_path} failed at byte {start} after {failures} attempts")
+            time.sleep(UPLOAD_RETRY_BACKOFF_S * 2 ** (failures - 1))
+            offset = self.upload_session_offset(upload_url)
+            if offset is None:
+                raise RuntimeError(f"Upload session for {drive_path} expired at byte {start}")
+            start = offset
+            stream.seek(start)
+            progress(start)
+
+    def copy_item(self, item_id: str, *, parent_id: str, name: str) -> None:
         """
-        Iterate through all descendants of an item using the delta query.
-        This is significantly faster than recursive listings for large folders.
+        Server-side copy of a drive item into parent_id as `name` (replacing
+        any file there), waiting for Graph's async copy monitor to finish.
         """
-        next_link = f"{GRAPH_BASE}/me/drive/items/{item_id}/delta"
+        r = self._request(
+            "POST",
+            f"{self.base_url}/me/drive/items/{item_id}/copy",
+            params={"@microsoft.graph.conflictBehavior": "replace"},
+            json={"parentReference": {"id": parent_id}, "name": name},
+            timeout=120,
+        )
+        r.raise_for_status()
+        monitor = r.headers.get("Location")
+        delay = 0.5
+        while monitor:
+            # The monitor URL is pre-authenticated; it must not get our token.
+            m = self._request("GET", monitor, headers={"Authorization": None}, timeout=120)
+            m.raise_for_status()
+            status = m.json().get("status")
+            if status in (None, "completed"):
+                return
+            if status == "failed":
+                raise RuntimeError(f"Server-side copy of {item_id} to {name} failed: {m.json()}")
+            time.sleep(delay)
+            delay = min(COPY_POLL_MAX_S, delay * 2)
+
+    def delta_pages(self, *, item_id: str, delta_link: Optional[str] = None) -> Iterable[dict]:
+        """
+        Pages of a delta query over an item's descendants: all of them, or
+        only the changes since `delta_link` (from an earlier run). The last
+        page carries the "@odata.deltaLink" to pass next time.
+        """
+        next_link = delta_link or f"{self.base_url}/me/drive/items/{item_id}/delta"
+        params: Optional[Dict[str, str]] = None if delta_link else {"$select": DELTA_SELECT}
         while next_link:
-            r = self._s.get(next_link, timeout=120)
+            r = self._request("GET", next_link, params=params, timeout=120)
             r.raise_for_status()
             data = r.json()
-            yield from data.get("value", [])
+            yield data
+            # nextLink/deltaLink already carry the query options.
+            params = None
             next_link = data.get("@odata.nextLink")
 
+    def delta(self, *, item_id: str) -> Iterable[dict]:
+        """
+        Iterate through all descendants of an item using the delta query.
+        This is significantly faster than recursive listings for large folders.
+        """
+        for page in self.delta_pages(item_id=item_id):
+            yield from page.get("value", [])
+
     def _iter_children(self, *, item_id: str) -> Iterable[dict]:
         """Iterate through all children of an item, handling pagination."""
-        path = (
-            "/me/drive/root/children"
-            if item_id == "root"
-            else f"/me/drive/items/{item_id}/children"
-        )
+        path = _children_path(item_id)
         params: Optional[Dict] = {"$select": "id,name,folder", "$top": 999}
-        url: Optional[str] = f"{GRAPH_BASE}{path}"
+        url: Optional[str] = f"{self.base_url}{path}"
         while url:
-            r = self._s.get(url, params=params, timeout=120)
+            r = self._request("GET", url, params=params, timeout=120)
             # Params are only needed for the first request with a relative path
             params = None
             r.raise_for_status()
@@ -256,47 +1354,170 @@ def load_onedrive_auth(
     return GraphAuth(access_token=str(result["access_token"]))
 
 
-def get_existing_files_delta(
-    client: GraphClient, *, item_id: str, dest_folder_name: str
-) -> Set[Path]:
+@dataclass(frozen=True)
+class RemoteFile:
+    id: str
+    size: int
+    quick_xor: Optional[str]
+
+
+class RemoteIndex:
     """
-    Use Graph's `delta` query for a high-performance recursive file listing.
-    This avoids the N+1 problem of traversing the folder hierarchy manually.
+    The destination folder's files as of a Graph deltaLink, persisted
+    (atomically) so the next run asks Graph only for what changed since.
+
+    Items are kept by id as [parent id, name, is folder, size, quickXorHash];
+    paths are derived from the parent chain, because delta results do not
+    reliably carry parentReference.path. The state belongs to one
+    destination folder (root_id) and is rebuilt if that changes.
     """
-    existing_paths: Set[Path] = set()
-    # The `delta` response provides item paths relative to the drive root.
-    # We need to strip the destination folder's path to make them relative
-    # to the sync root, for accurate duplicate detection.
-    # Example: we want "sub/file.txt", not "MyImport/sub/file.txt".
-    path_prefix_to_strip = f"{dest_folder_name}/"
 
-    for item in client.delta(item_id=item_id):
-        # The `parentReference.path` gives the full path from the drive root.
-        # Example: /drives/{id}/root:/folder/subfolder
-        path_str = item.get("parentReference", {}).get("path")
-        name = item.get("name")
-        if not path_str or not name or not item.get("file"):
-            continue
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.root_id: Optional[str] = None
+        self.delta_link: Optional[str] = None
+        self.items: Dict[str, List[Any]] = {}
+
+    def load(self) -> "RemoteIndex":
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            self.root_id = state.get("rootId")
+            self.delta_link = state.get("deltaLink")
+            self.items = state.get("items", {})
+        return self
+
+    def reset(self, root_id: str) -> None:
+        self.root_id = root_id
+        self.delta_link = None
+        self.items = {}
+
+    def apply(self, item: dict) -> None:
+        """Apply one delta result: an added/changed item or a deletion."""
+        item_id = item.get("id")
+        if not isinstance(item_id, str) or item_id == self.root_id:
+            return
+        if item.get("deleted") is not None:
+            self.items.pop(item_id, None)
+            return
+        hashes = (item.get("file") or {}).get("hashes") or {}
+        self.items[item_id] = [
+            (item.get("parentReference") or {}).get("id"),
+            item.get("name"),
+            item.get("folder") is not None,
+            int(item.get("size") or 0),
+            hashes.get("quickXorHash"),
+        ]
+
+    def files(self) -> Dict[Path, RemoteFile]:
+        """{ path relative to the destination folder -> RemoteFile }"""
+        paths: Dict[str, Optional[Path]] = {str(self.root_id): Path()}
+
+        def path_of(item_id: str) -> Optional[Path]:
+            chain: List[str] = []
+            cur: Optional[str] = item_id
+            while cur not in paths:
+                e = self.items.get(cur) if cur is not None else None
+                if e is None or len(chain) > len(self.items):
+                    # Orphaned (parent deleted or outside the folder) or cyclic.
+                    base = None
+                    break
+                chain.append(cur)
+                cur = e[0]
+            else:
+                base = paths[cur]
+            for c in reversed(chain):
+                base = None if base is None else base / self.items[c][1]
+                paths[c] = base
+            return paths.get(item_id)
+
+        existing: Dict[Path, RemoteFile] = {}
+        for item_id, (_, _, is_folder, size, quick_xor) in self.items.items():
+            if is_folder:
+                continue
+            path = path_of(item_id)
+            if path is not None:
+                existing[path] = RemoteFile(id=item_id, size=size, quick_xor=quick_xor)
+        return existing
+
+    def save(self) -> None:
+        write_json_atomic(
+            self.path, {"rootId": self.root_id, "deltaLink": self.delta_link, "items": self.items}
+        )
 
-        # Find the start of the path relative to the drive root.
-        colon_idx = path_str.find(":")
-        if colon_idx == -1:
-            continue
 
-        # This gives a path like: /folder/subfolder
-        path_from_root = path_str[colon_idx + 1 :]
+def sync_remote_index(client: GraphClient, index: RemoteIndex, *, item_id: str) -> int:
+    """
+    Bring `index` up to date for folder `item_id` with Graph's `delta` query:
+    only the changes since its saved deltaLink, or a full listing on the
+    first run, for a different folder, or once Graph expires the token
+    (410 Gone). Returns the number of delta results applied.
+    """
+    if index.root_id != item_id:
+        index.reset(item_id)
+    while True:
+        applied = 0
+        try:
+            for page in client.delta_pages(item_id=item_id, delta_link=index.delta_link):
+                for item in page.get("value", []):
+                    index.apply(item)
+                    applied += 1
+                if page.get("@odata.deltaLink"):
+                    index.delta_link = page["@odata.deltaLink"]
+            return applied
+        except requests.HTTPError as ex:
+            if ex.response is None or ex.response.status_code != 410 or index.delta_link is None:
+                raise
+            index.reset(item_id)
+
+
+def plan_by_content(
+    files: List[Tuple[Any, Path, int]],
+    *,
+    digests: Dict[str, str],
+    remote: Dict[Path, RemoteFile],
+) -> Tuple[List[Tuple[Any, Path, int]], List[Tuple[Tuple[Any, Path, int], RemoteFile]], int]:
+    """
+    Decide per file by content: skip it when the same path already holds the
+    same bytes, copy it server-side when identical bytes exist elsewhere in
+    the destination (renamed/moved files), and upload it otherwise.
+    Returns (to upload, [(entry, remote twin) to copy], identical count).
+    """
+    by_content = {(r.size, r.quick_xor): r for r in remote.values() if r.quick_xor}
+    uploads: List[Tuple[Any, Path, int]] = []
+    copies: List[Tuple[Tuple[Any, Path, int], RemoteFile]] = []
+    identical = 0
+    for entry in files:
+        _, rel_path, size = entry
+        digest = digests[rel_path.as_posix()]
+        at_path = remote.get(rel_path)
+        if at_path is not None and at_path.size == size and at_path.quick_xor == digest:
+            identical += 1
+            continue
+        twin = by_content.get((size, digest))
+        # A small file uploads in one request; copying only pays off above that.
+        if twin is not None and size > SIMPLE_UPLOAD_MAX:
+            copies.append((entry, twin))
+        else:
+            uploads.append(entry)
+    return uploads, copies, identical
 
-        # Full path of the item from the drive root.
-        full_path_from_root = f"{path_from_root}/{name}"
 
-        # Normalize to remove any leading slash for consistent matching.
-        full_path_from_root = full_path_from_root.lstrip("/")
+def _children_path(item_id: str) -> str:
+    return "/me/drive/root/children" if item_id == "root" else f"/me/drive/items/{item_id}/children"
 
-        if full_path_from_root.startswith(path_prefix_to_strip):
-            rel_path_str = full_path_from_root[len(path_prefix_to_strip) :]
-            existing_paths.add(Path(rel_path_str))
 
-    return existing_paths
+def _folder_children(items: Iterable[dict]) -> Dict[str, str]:
+    """{ folder_name -> folder_id } for the folders among a children listing."""
+    mapping: Dict[str, str] = {}
+    for ch in items:
+        if ch.get("folder") is None:
+            continue
+        nm = ch.get("name")
+        cid = ch.get("id")
+        if isinstance(nm, str) and isinstance(cid, str):
+            mapping[nm] = cid
+    return mapping
 
 
 def get_or_create_folder(
@@ -308,15 +1529,7 @@ def get_or_create_folder(
 ) -> str:
     # Cache by parent_id: { folder_name -> folder_id }
     if parent_id not in children_cache:
-        mapping: Dict[str, str] = {}
-        for ch in client._iter_children(item_id=parent_id):
-            if ch.get("folder") is None:
-                continue
-            nm = ch.get("name")
-            cid = ch.get("id")
-            if isinstance(nm, str) and isinstance(cid, str):
-                mapping[nm] = cid
-        children_cache[parent_id] = mapping
+        children_cache[parent_id] = _folder_children(client._iter_children(item_id=parent_id))
 
     if name in children_cache[parent_id]:
         return children_cache[parent_id][name]
@@ -327,10 +1540,7 @@ def get_or_create_folder(
         "@microsoft.graph.conflictBehavior": "fail",
     }
     try:
-        if parent_id == "root":
-            created = client.post_json("/me/drive/root/children", payload)
-        else:
-            created = client.post_json(f"/me/drive/items/{parent_id}/children", payload)
+        created = client.post_json(_children_path(parent_id), payload)
         fid = str(created["id"])
         children_cache[parent_id][name] = fid
         return fid
@@ -383,6 +1593,94 @@ def ensure_folder_path(
     return cur_id
 
 
+def create_folder_tree(
+    client: GraphClient,
+    *,
+    base_parent_id: str,
+    rel_dirs: Iterable[Path],
+    children_cache: Dict[str, Dict[str, str]],
+    folder_id_cache: Dict[str, str],
+) -> int:
+    """
+    Create rel_dirs (and their ancestors) under base_parent_id, breadth-first.
+
+    Each level first lists the children of parents not seen yet, then
+    creates the missing folders, both as JSON $batch calls of up to
+    GRAPH_BATCH_LIMIT requests. New folders are known to be empty, so they
+    are never listed. Fills folder_id_cache (keys as in ensure_folder_path)
+    and children_cache; returns the number of folders created.
+    """
+    wanted: Set[Tuple[str, ...]] = set()
+    for d in rel_dirs:
+        parts = tuple(p for p in d.parts if p not in ("", ".", "/"))
+        for i in range(1, len(parts) + 1):
+            wanted.add(parts[:i])
+    by_depth: Dict[int, List[Tuple[str, ...]]] = {}
+    for parts in wanted:
+        by_depth.setdefault(len(parts), []).append(parts)
+
+    def parent_of(parts: Tuple[str, ...]) -> str:
+        return folder_id_cache["/".join(parts[:-1])] if len(parts) > 1 else base_parent_id
+
+    created = 0
+    for depth in sorted(by_depth):
+        level = sorted(p for p in by_depth[depth] if "/".join(p) not in folder_id_cache)
+
+        unlisted = sorted({parent_of(p) for p in level} - children_cache.keys())
+        for i in range(0, len(unlisted), GRAPH_BATCH_LIMIT):
+            group = unlisted[i : i + GRAPH_BATCH_LIMIT]
+            responses = client.batch(
+                [{"method": "GET", "url": f"{_children_path(pid)}?$select=id,name,folder&$top=999"} for pid in group]
+            )
+            for pid, resp in zip(group, responses):
+                if resp.get("status") != 200:
+                    raise RuntimeError(f"Listing folder {pid} failed: HTTP {resp.get('status')} {resp.get('body')}")
+                body = resp.get("body") or {}
+                # More than one page of children: list that parent in full.
+                items = client._iter_children(item_id=pid) if body.get("@odata.nextLink") else body.get("value", [])
+                children_cache[pid] = _folder_children(items)
+
+        missing: List[Tuple[str, str, str]] = []
+        for parts in level:
+            key = "/".join(parts)
+            pid = parent_of(parts)
+            fid = children_cache[pid].get(parts[-1])
+            if fid:
+                folder_id_cache[key] = fid
+            else:
+                missing.append((key, pid, parts[-1]))
+
+        for i in range(0, len(missing), GRAPH_BATCH_LIMIT):
+            group = missing[i : i + GRAPH_BATCH_LIMIT]
+            responses = client.batch(
+                [
+                    {
+                        "method": "POST",
+                        "url": _children_path(pid),
+                        "headers": {"Content-Type": "application/json"},
+                        "body": {"name": name, "folder": {}, "@microsoft.graph.conflictBehavior": "fail"},
+                    }
+                    for _, pid, name in group
+                ]
+            )
+            for (key, pid, name), resp in zip(group, responses):
+                status = resp.get("status")
+                if status in (200, 201):
+                    fid = str(resp["body"]["id"])
+                    children_cache[fid] = {}
+                    created += 1
+                elif status == 409:
+                    # Created elsewhere since the listing: relist the parent once.
+                    if name not in children_cache.get(pid, {}):
+                        children_cache.pop(pid, None)
+                    fid = get_or_create_folder(client, parent_id=pid, name=name, children_cache=children_cache)
+                else:
+                    raise RuntimeError(f"Creating folder {key} failed: HTTP {status} {resp.get('body')}")
+                children_cache[pid][name] = fid
+                folder_id_cache[key] = fid
+    return created
+
+
 def upload_one_file(
     local_file: Path,
     rel_path: Path,
@@ -394,6 +1692,8 @@ def upload_one_file(
     children_cache: Dict[str, Dict[str, str]],
     folder_id_cache: Dict[str, str],
     chunk_size: int,
+    state: Optional[UploadState] = None,
+    on_bytes: Optional[Callable[[int], None]] = None,
 ) -> Tuple[str, int]:
     parent_rel = rel_path.parent
     # This function is run in a thread, so directory creation needs to be safe.
@@ -407,24 +1707,258 @@ def upload_one_file(
     )
 
     drive_path = f"{onedrive_folder}/{rel_path.as_posix()}"
-    if file_size <= 4 * 1024 * 1024:
+    if file_size <= SIMPLE_UPLOAD_MAX:
         client.put_file_simple(drive_path, local_file)
+        if on_bytes is not None:
+            on_bytes(file_size)
     else:
         client.upload_large_file(
             drive_path,
             local_file,
             total=file_size,
             chunk_size=chunk_size,
+            state=state,
+            on_bytes=on_bytes,
         )
+    if state:
+        state.complete(drive_path, file_size)
+    return (str(rel_path), file_size)
+
+
+def upload_zip_member(
+    info: zipfile.ZipInfo,
+    rel_path: Path,
+    file_size: int,
+    *,
+    reader: ZipReader,
+    client: GraphClient,
+    dest_folder_id: str,
+    onedrive_folder: str,
+    children_cache: Dict[str, Dict[str, str]],
+    folder_id_cache: Dict[str, str],
+    chunk_size: int,
+    state: Optional[UploadState] = None,
+    on_bytes: Optional[Callable[[int], None]] = None,
+) -> Tuple[str, int]:
+    """Like upload_one_file, but reads the content straight from the ZIP member."""
+    ensure_folder_path(
+        client,
+        base_parent_id=dest_folder_id,
+        rel_folder=rel_path.parent,
+        children_cache=children_cache,
+        folder_id_cache=folder_id_cache,
+    )
+
+    drive_path = f"{onedrive_folder}/{rel_path.as_posix()}"
+    with reader.open(info) as stream:
+        if file_size <= SIMPLE_UPLOAD_MAX:
+            client.put_stream_simple(drive_path, stream, size=file_size)
+            if on_bytes is not None:
+                on_bytes(file_size)
+        else:
+            client.upload_large_stream(
+                drive_path, stream, total=file_size, chunk_size=chunk_size, state=state, on_bytes=on_bytes
+            )
+    if state:
+        state.complete(drive_path, file_size)
     return (str(rel_path), file_size)
 
 
+def upload_files(
+    client: GraphClient,
+    files: List[Tuple[Any, Path, int]],
+    *,
+    onedrive_folder: str,
+    dest_folder_id: str,
+    children_cache: Dict[str, Dict[str, str]],
+    folder_id_cache: Dict[str, str],
+    chunk_size: int,
+    workers: int,
+    reader: Optional[ZipReader] = None,
+    state: Optional[UploadState] = None,
+    copies: Optional[List[Tuple[Tuple[Any, Path, int], RemoteFile]]] = None,
+    fetch: Optional[Callable[[Tuple[Any, Path, int]], Optional[Path]]] = None,
+    fetch_workers: int = 4,
+) -> int:
+    """
+    Upload (source, relative path, size) entries into dest_folder_id: create
+    the folder tree, run the server-side `copies`, then upload the files
+    with `workers` threads. Sources are local Paths, or ZipInfos read through
+    `reader`. Returns the number of files uploaded.
+
+    With `fetch`, sources are remote: fetch(entry) downloads one to a local
+    file (or returns None to skip it) on `fetch_workers` threads, and each
+    file is uploaded, then deleted, as soon as it has arrived.
+    """
+    copies = copies or []
+
+    # --- OPTIMIZATION: Parallel uploads ---
+    # To make parallel uploads safe, first discover all unique directories
+    # and create them before any upload starts. This avoids race
+    # conditions where multiple threads might try to create the same
+    # folder, and lets network I/O for files run concurrently.
+    #
+    # --- OPTIMIZATION: Batched, breadth-first folder creation ---
+    # Creating folders one POST at a time (plus a listing per new
+    # parent) cost two round trips per folder. Each tree level is now
+    # listed and created with $batch calls of 20 requests, and new
+    # folders are never listed.
+    print("Pre-creating directories...")
+    # Use pre-calculated relative paths
+    all_dirs = {
+        rel_p.parent
+        for _, rel_p, _ in files + [entry for entry, _ in copies]
+        if rel_p.parent != Path(".")
+    }
+    n_created = create_folder_tree(
+        client,
+        base_parent_id=dest_folder_id,
+        rel_dirs=all_dirs,
+        children_cache=children_cache,
+        folder_id_cache=folder_id_cache,
+    )
+    if all_dirs:
+        print(f"Folders ready: {len(folder_id_cache)} ({n_created} created).")
+
+    if copies:
+        print(f"Copying {len(copies)} files server-side...")
+
+        def copy(job: Tuple[Tuple[Any, Path, int], RemoteFile]) -> None:
+            (_, rel_path, _), twin = job
+            parent_id = ensure_folder_path(
+                client,
+                base_parent_id=dest_folder_id,
+                rel_folder=rel_path.parent,
+                children_cache=children_cache,
+                folder_id_cache=folder_id_cache,
+            )
+            client.copy_item(twin.id, parent_id=parent_id, name=rel_path.name)
+
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            list(ex.map(copy, copies))
+
+    # Now, upload files in parallel.
+    uploaded_count = 0
+    skipped_count = 0
+    if not files:
+        print("No files to upload.")
+        return 0
+
+    # --- OPTIMIZATION: Largest files first (LPT scheduling) ---
+    # In directory order a few multi-GB files could start last and
+    # leave one worker busy long after the rest were idle. Starting
+    # the largest files first lets the many small ones fill the free
+    # slots at the end, so wall time approaches total bytes divided
+    # by bandwidth. Progress is counted in bytes, so the rate and
+    # ETA reflect the transfer rather than the file count.
+    files.sort(key=lambda e: e[2], reverse=True)
+    upload_bytes = sum(size for _, _, size in files)
+
+    with tqdm(total=upload_bytes, unit="B", unit_scale=True, unit_divisor=1024) as pbar:
+        pbar_lock = threading.Lock()
+
+        def on_bytes(n: int) -> None:
+            with pbar_lock:
+                pbar.update(n)
+
+        def upload(entry: Tuple[Any, Path, int]) -> Tuple[str, int]:
+            source, rel_path, size = entry
+            common = dict(
+                client=client,
+                dest_folder_id=dest_folder_id,
+                onedrive_folder=onedrive_folder,
+                children_cache=children_cache,
+                folder_id_cache=folder_id_cache,
+                chunk_size=chunk_size,
+                state=state,
+                on_bytes=on_bytes,
+            )
+            if reader is not None:
+                return upload_zip_member(source, rel_path, size, reader=reader, **common)
+            return upload_one_file(source, rel_path, size, **common)
+
+        def file_done(*, skipped: bool = False) -> None:
+            nonlocal uploaded_count, skipped_count
+            with pbar_lock:
+                if skipped:
+                    skipped_count += 1
+                else:
+                    uploaded_count += 1
+                pbar.set_postfix_str(f"{uploaded_count + skipped_count}/{len(files)} files", refresh=False)
+
+        if fetch is not None:
+            # --- OPTIMIZATION: Overlapped download and upload ---
+            # Each file is handed to the upload pool the moment its download
+            # finishes, so both directions of the link are busy at once and
+            # nothing waits for the whole share to arrive. A semaphore caps
+            # the files downloaded but not yet uploaded, bounding temp disk.
+            print(f"Downloading with {max(1, fetch_workers)} and uploading with {workers} workers...")
+            spooled = threading.BoundedSemaphore(max(1, fetch_workers) + 2 * workers)
+
+            def upload_fetched(entry: Tuple[Any, Path, int], local: Path) -> None:
+                try:
+                    upload((local, entry[1], entry[2]))
+                finally:
+                    local.unlink(missing_ok=True)
+                    spooled.release()
+                file_done()
+
+            def fetch_then_upload(entry: Tuple[Any, Path, int], up_ex: ThreadPoolExecutor) -> Optional[Any]:
+                spooled.acquire()
+                try:
+                    local = fetch(entry)
+                except BaseException:
+                    spooled.release()
+                    raise
+                if local is None:
+                    spooled.release()
+                    on_bytes(entry[2])
+                    file_done(skipped=True)
+                    return None
+                return up_ex.submit(upload_fetched, entry, local)
+
+            with ThreadPoolExecutor(max_workers=workers) as up_ex:
+                with ThreadPoolExecutor(max_workers=max(1, fetch_workers)) as dl_ex:
+                    fetched = [dl_ex.submit(fetch_then_upload, entry, up_ex) for entry in files]
+                    pending = [f.result() for f in as_completed(fetched)]
+                for fut in as_completed([f for f in pending if f is not None]):
+                    fut.result()
+        elif workers > 1:
+            print(f"Uploading with {workers} parallel workers...")
+            with ThreadPoolExecutor(max_workers=workers) as ex:
+                futures = [ex.submit(upload, entry) for entry in files]
+                for fut in as_completed(futures):
+                    fut.result()
+                    file_done()
+        else:
+            # Sequential upload for --parallel=1
+            print("Uploading sequentially...")
+            for entry in files:
+                upload(entry)
+                file_done()
+
+    if skipped_count:
+        print(f"Unchanged: {skipped_count} (skipped after download).")
+    return uploaded_count
+
+
 def main(argv: List[str]) -> int:
     p = argparse.ArgumentParser(
         prog="dropbox_to_onedrive.py",
         description="Download a Dropbox shared folder and upload it into OneDrive.",
     )
     p.add_argument("--dropbox-url", required=True, help="Dropbox shared folder URL")
+    p.add_argument(
+        "--source",
+        choices=["zip", "dropbox-api"],
+        default="zip",
+        help="zip: download the share as one ZIP (default); dropbox-api: list it and download files concurrently",
+    )
+    p.add_argument(
+        "--dropbox-token",
+        default=os.environ.get("DROPBOX_ACCESS_TOKEN") or "",
+        help="Dropbox API access token for --source dropbox-api (or set env DROPBOX_ACCESS_TOKEN)",
+    )
     p.add_argument(
         "--onedrive-folder",
         default=f"Dropbox Import {now_stamp()}",
@@ -468,47 +2002,172 @@ def main(argv: List[str]) -> int:
         default=1,
         help="Number of parallel uploads to run (default: 1, sequential). Improves performance for many small files.",
     )
-    p.add_argument("--skip-duplicates", action="store_true", help="Do not upload files that already exist in the destination")
+    p.add_argument(
+        "--skip-duplicates",
+        action="store_true",
+        help="Compare content (quickXorHash) with the destination: skip unchanged files, copy moved ones server-side",
+    )
+    p.add_argument(
+        "--hash-cache",
+        default=".onedrive_hash_cache.json",
+        help="Cache of local quickXorHash values used by --skip-duplicates",
+    )
+    p.add_argument(
+        "--hash-workers",
+        type=int,
+        default=os.cpu_count() or 4,
+        help="Threads hashing local files for --skip-duplicates (default: CPU count)",
+    )
+    p.add_argument(
+        "--delta-state",
+        default=".onedrive_delta_state.json",
+        help="Where --skip-duplicates keeps the remote index and delta token so the next run lists only changes",
+    )
+    p.add_argument(
+        "--download-workers",
+        type=int,
+        default=4,
+        help="Concurrent ranged requests when downloading the ZIP (default: 4)",
+    )
+    p.add_argument(
+        "--segment-mb",
+        type=int,
+        default=DOWNLOAD_SEGMENT // (1024 * 1024),
+        help="Size of each ranged download segment in MB (default: 64)",
+    )
+    p.add_argument(
+        "--extract-workers",
+        type=int,
+        default=min(8, os.cpu_count() or 1),
+        help="Threads used to decompress ZIP members when extracting (default: CPU count, max 8)",
+    )
+    p.add_argument(
+        "--memory-mb",
+        type=int,
+        default=512,
+        help="Memory budget for upload chunk buffers across all workers (default: 512)",
+    )
+    p.add_argument(
+        "--upload-state",
+        default=os.environ.get("ONEDRIVE_UPLOAD_STATE") or ".onedrive_upload_state.json",
+        help="Where upload sessions and finished files are recorded so a re-run resumes",
+    )
+    p.add_argument(
+        "--stream-zip",
+        action="store_true",
+        help="Upload members straight from the downloaded ZIP instead of extracting it to disk first",
+    )
     args = p.parse_args(argv)
 
     if not args.client_id:
         eprint("Missing --client-id (or set env ONEDRIVE_CLIENT_ID).")
         return 2
-
-    dl_url = normalize_dropbox_download_url(args.dropbox_url)
-
-    if args.keep_zip:
-        zip_path = Path("dropbox-download.zip").resolve()
-        tmp_zip_ctx = None
-    else:
-        tmp_zip_ctx = tempfile.TemporaryDirectory(prefix="dropbox_zip_")
-        zip_path = Path(tmp_zip_ctx.name) / "dropbox.zip"
-
-    try:
-        print(f"Downloading Dropbox ZIP...")
-        download_to_file(dl_url, dest_path=zip_path)
-        zip_size = zip_path.stat().st_size
-        print(f"Downloaded: {zip_path.name} ({human_bytes(zip_size)})")
-
-        if args.keep_extracted:
-            extract_dir = Path("dropbox-extracted").resolve()
-            extract_dir.mkdir(parents=True, exist_ok=True)
-            tmp_extract_ctx = None
+    if args.stream_zip and args.keep_extracted:
+        eprint("--keep-extracted cannot be combined with --stream-zip (nothing is extracted).")
+        return 2
+    if args.source == "dropbox-api":
+        if not args.dropbox_token:
+            eprint("--source dropbox-api needs --dropbox-token (or set env DROPBOX_ACCESS_TOKEN).")
+            return 2
+        if args.stream_zip or args.keep_zip or args.keep_extracted:
+            eprint("--stream-zip, --keep-zip and --keep-extracted only apply to --source zip.")
+            return 2
+
+    zip_path: Optional[Path] = None
+    tmp_zip_ctx = None
+    if args.source == "zip":
+        dl_url = normalize_dropbox_download_url(args.dropbox_url)
+        if args.keep_zip:
+            zip_path = Path("dropbox-download.zip").resolve()
         else:
-            tmp_extract_ctx = tempfile.TemporaryDirectory(prefix="dropbox_extract_")
-            extract_dir = Path(tmp_extract_ctx.name)
+            tmp_zip_ctx = tempfile.TemporaryDirectory(prefix="dropbox_zip_")
+            zip_path = Path(tmp_zip_ctx.name) / "dropbox.zip"
 
+    try:
+        if zip_path is not None:
+            print(f"Downloading Dropbox ZIP...")
+            # --- OPTIMIZATION: Parallel, resumable ranged download ---
+            # One TCP stream rarely fills the link, and a dropped connection
+            # used to mean starting over. Segments are fetched concurrently and
+            # recorded in a sidecar; with --keep-zip a re-run resumes.
+            download_to_file(
+                dl_url,
+                dest_path=zip_path,
+                workers=args.download_workers,
+                segment_size=max(1, args.segment_mb) * 1024 * 1024,
+            )
+            zip_size = zip_path.stat().st_size
+            print(f"Downloaded: {zip_path.name} ({human_bytes(zip_size)})")
+
+        tmp_extract_ctx = None
+        spool_ctx = None
+        dbx: Optional[DropboxClient] = None
+        reader: Optional[ZipReader] = None
+        state: Optional[UploadState] = None
+        copies: List[Tuple[Tuple[Any, Path, int], RemoteFile]] = []
+        existing: Dict[Path, RemoteFile] = {}
         try:
-            print("Extracting ZIP...")
-            with zipfile.ZipFile(zip_path) as zf:
-                zf.extractall(extract_dir)
-            src_root = pick_extracted_root(extract_dir)
-
-            # --- OPTIMIZATION: Single-pass file scan with pre-calculation ---
-            # Use a single pass to collect file paths and sizes, avoiding
-            # repeated `stat()` calls. This is a measurable performance gain
-            # for directories with thousands of files.
-            files: List[Tuple[Path, Path, int]] = list(iter_files_with_size(src_root))
+            # Each entry is (source, relative path, size); the source is a
+            # local Path, a ZipInfo when streaming from the ZIP, or a path
+            # inside the shared link with --source dropbox-api.
+            files: List[Tuple[Any, Path, int]]
+            if args.source == "dropbox-api":
+                # --- OPTIMIZATION: Per-file downloads through the Dropbox API ---
+                # The share is listed instead of zipped server-side, so there
+                # is no ZIP size limit and no wait for the archive to be built
+                # and fully downloaded. Files are fetched concurrently during
+                # the upload (see upload_files) into a bounded temp spool.
+                print("Listing Dropbox shared folder...")
+                dbx = DropboxClient(args.dropbox_token, shared_url=args.dropbox_url, pool_size=args.download_workers)
+                files, unsafe = list_shared_folder(dbx, workers=args.download_workers)
+                if unsafe:
+                    eprint(f"Skipping {unsafe} Dropbox entries with unsafe names.")
+                spool_ctx = tempfile.TemporaryDirectory(prefix="dropbox_spool_")
+            elif args.stream_zip:
+                # --- OPTIMIZATION: Stream members straight from the ZIP ---
+                # Reading the central directory is enough to plan the upload;
+                # each member is then decompressed directly into the request
+                # body. This skips writing the extracted tree to disk and
+                # reading it back, and temp-disk use stays at the ZIP itself.
+                assert zip_path is not None
+                with zipfile.ZipFile(zip_path) as zf:
+                    files, unsafe = iter_zip_members(zf)
+                if unsafe:
+                    eprint(f"Skipping {unsafe} ZIP entries with unsafe names.")
+                reader = ZipReader(zip_path)
+            else:
+                if args.keep_extracted:
+                    extract_dir = Path("dropbox-extracted").resolve()
+                    extract_dir.mkdir(parents=True, exist_ok=True)
+                else:
+                    tmp_extract_ctx = tempfile.TemporaryDirectory(prefix="dropbox_extract_")
+                    extract_dir = Path(tmp_extract_ctx.name)
+
+                # --- OPTIMIZATION: Parallel extraction ---
+                # extractall inflates one member at a time on a single core.
+                # zlib releases the GIL while decompressing, so spreading the
+                # members over threads (each with its own ZipFile handle)
+                # scales extraction with the number of cores.
+                print(f"Extracting ZIP with {max(1, args.extract_workers)} workers...")
+                t0 = time.monotonic()
+                assert zip_path is not None
+                n_extracted, n_bytes, unsafe = extract_zip_parallel(
+                    zip_path, extract_dir, workers=args.extract_workers
+                )
+                elapsed = max(time.monotonic() - t0, 1e-6)
+                print(
+                    f"Extracted {n_extracted} files ({human_bytes(n_bytes)}) in {elapsed:.1f}s "
+                    f"({human_bytes(int(n_bytes / elapsed))}/s)"
+                )
+                if unsafe:
+                    eprint(f"Skipped {unsafe} ZIP entries with unsafe names.")
+                src_root = pick_extracted_root(extract_dir)
+
+                # --- OPTIMIZATION: Single-pass file scan with pre-calculation ---
+                # Use a single pass to collect file paths and sizes, avoiding
+                # repeated `stat()` calls. This is a measurable performance gain
+                # for directories with thousands of files.
+                files = list(iter_files_with_size(src_root))
             total = sum(size for _, _, size in files)
             print(f"Files to upload: {len(files)} (total {human_bytes(total)})")
 
@@ -527,7 +2186,27 @@ def main(argv: List[str]) -> int:
                 tenant=args.tenant,
                 token_cache_path=token_cache_path,
             )
-            client = GraphClient(auth)
+            # --- OPTIMIZATION: Shared throttling governor ---
+            # All workers share one GraphClient, so a 429 seen by any of them
+            # pauses the rest and lowers the in-flight cap, instead of every
+            # worker hammering a throttled endpoint until the import fails.
+            workers = min(max(1, args.parallel), 32)
+            chunk_size = max(1, int(args.chunk_mb)) * 1024 * 1024
+            # Graph best practice: chunk size multiple of 320 KiB
+            if chunk_size % 327_680 != 0:
+                # round down to nearest multiple (minimum 320 KiB)
+                chunk_size = max(327_680, (chunk_size // 327_680) * 327_680)
+            # Buffers also hold whole simple uploads (up to 4 MB) read from
+            # the ZIP, so they are never smaller than that.
+            buffers = ChunkBufferPool(
+                max(chunk_size, SIMPLE_UPLOAD_MAX), budget_bytes=max(1, args.memory_mb) * 1024 * 1024
+            )
+            if buffers.count < workers:
+                print(
+                    f"Memory budget allows {buffers.count} buffer(s) of {human_bytes(buffers.buffer_size)} in flight; "
+                    f"raise --memory-mb to keep all {workers} workers busy on large files."
+                )
+            client = GraphClient(auth, governor=GraphGovernor(workers), buffers=buffers)
 
             # Create destination folder under OneDrive root
             children_cache: Dict[str, Dict[str, str]] = {}
@@ -537,118 +2216,105 @@ def main(argv: List[str]) -> int:
             )
 
             if args.skip_duplicates:
-                print("Checking for existing files in OneDrive (this may take a while for large folders)...")
-                # --- OPTIMIZATION: High-performance duplicate check ---
-                # Use the Graph API's `delta` query to fetch the entire file
-                # list in the destination folder in a single operation. This
-                # avoids the N+1 problem of recursively listing directories,
-                # significantly speeding up the check for large, nested folders.
-                existing_paths = get_existing_files_delta(
-                    client, item_id=dest_folder_id, dest_folder_name=args.onedrive_folder
-                )
-                if existing_paths:
-                    original_count = len(files)
-                    # --- FIX: Ensure `files` is reassigned to the filtered list ---
-                    # The original logic failed to reassign the `files` variable if no
-                    # duplicates were found, causing the upload step to iterate over
-                    # the wrong list. This is corrected by always reassigning `files`
-                    # to the filtered result.
-                    files = [
-                        (p, rel_p, size)
-                        for p, rel_p, size in files
-                        if rel_p not in existing_paths
-                    ]
-                    skipped = original_count - len(files)
-                    if skipped > 0:
-                        print(f"Found {len(existing_paths)} existing files. Skipping {skipped} duplicates.")
+                # --- OPTIMIZATION: Incremental remote listing ---
+                # Use the Graph API's `delta` query to list the destination
+                # folder without walking it folder by folder, and keep the
+                # resulting index plus its deltaLink in --delta-state. Later
+                # runs into the same folder fetch only what changed since,
+                # so a repeat sync starts uploading within seconds instead of
+                # re-listing every remote item.
+                index = RemoteIndex(Path(args.delta_state).expanduser().resolve()).load()
+                incremental = index.root_id == dest_folder_id and index.delta_link is not None
+                if incremental:
+                    print("Fetching OneDrive changes since the last sync...")
+                else:
+                    print("Listing existing files in OneDrive (this may take a while for large folders)...")
+                applied = sync_remote_index(client, index, item_id=dest_folder_id)
+                index.save()
+                if incremental:
+                    print(f"Applied {applied} remote change(s) since the last sync.")
+                existing = index.files()
+                if existing and dbx is not None:
+                    # Content is only known once downloaded: each file is
+                    # hashed as it arrives and skipped if unchanged.
+                    print(f"Found {len(existing)} existing files; unchanged files are skipped after download.")
+                elif existing:
+                    # --- OPTIMIZATION: Content-based duplicate detection ---
+                    # Comparing paths alone re-uploaded renamed files and
+                    # skipped changed ones. Local files are hashed with the
+                    # quickXorHash OneDrive reports (cached across runs), so
+                    # only new or changed content is uploaded and content
+                    # that moved is copied server-side instead.
+                    print(f"Found {len(existing)} existing files. Hashing local files...")
+                    hash_cache = HashCache(Path(args.hash_cache).expanduser().resolve()).load()
+                    digests = hash_sources(files, reader=reader, cache=hash_cache, workers=args.hash_workers)
+                    hash_cache.save()
+                    files, copies, identical = plan_by_content(files, digests=digests, remote=existing)
+                    print(
+                        f"Unchanged: {identical}; copy server-side: {len(copies)} "
+                        f"({human_bytes(sum(e[2] for e, _ in copies))}); "
+                        f"upload: {len(files)} ({human_bytes(sum(size for _, _, size in files))})"
+                    )
                 else:
                     print("No existing files found in destination.")
 
-            chunk_size = max(1, int(args.chunk_mb)) * 1024 * 1024
-            # Graph best practice: chunk size multiple of 320 KiB
-            if chunk_size % 327_680 != 0:
-                # round down to nearest multiple (minimum 320 KiB)
-                chunk_size = max(327_680, (chunk_size // 327_680) * 327_680)
+            # Files finished by an interrupted earlier run are skipped; partial
+            # large files continue from their saved upload session.
+            state = UploadState(Path(args.upload_state).expanduser().resolve()).load()
+            original_count = len(files)
+            files = [
+                entry
+                for entry in files
+                if not state.is_complete(f"{args.onedrive_folder}/{entry[1].as_posix()}", entry[2])
+            ]
+            if len(files) < original_count:
+                print(f"Skipping {original_count - len(files)} files already uploaded by a previous run.")
 
             print(f"Uploading into OneDrive folder: {args.onedrive_folder}")
-
-            # --- OPTIMIZATION: Parallel uploads ---
-            # To make parallel uploads safe, first discover all unique directories
-            # and create them sequentially. This avoids race conditions where
-            # multiple threads might try to create the same folder.
-            # This is a performance optimization for folders with many files,
-            # as network I/O can be done concurrently.
-            print("Pre-creating directories...")
-            # Use pre-calculated relative paths
-            all_dirs = sorted(
-                list(
-                    {
-                        rel_p.parent
-                        for _, rel_p, _ in files
-                        if rel_p.parent != Path(".")
-                    }
-                )
+            fetch = None
+            if dbx is not None and spool_ctx is not None:
+                fetch = dropbox_fetcher(dbx, Path(spool_ctx.name), existing=existing)
+            uploaded_count = upload_files(
+                client,
+                files,
+                onedrive_folder=args.onedrive_folder,
+                dest_folder_id=dest_folder_id,
+                children_cache=children_cache,
+                folder_id_cache=folder_id_cache,
+                chunk_size=chunk_size,
+                workers=workers,
+                reader=reader,
+                state=state,
+                copies=copies,
+                fetch=fetch,
+                fetch_workers=args.download_workers,
             )
-            for d in all_dirs:
-                ensure_folder_path(
-                    client,
-                    base_parent_id=dest_folder_id,
-                    rel_folder=d,
-                    children_cache=children_cache,
-                    folder_id_cache=folder_id_cache,
-                )
-
-            # Now, upload files in parallel.
-            workers = min(max(1, args.parallel), 32)
-            uploaded_count = 0
+            # Every file is in OneDrive now. The state only exists to resume
+            # this run; kept, it would skip same-size changes next time.
+            state.remove()
             if not files:
-                print("No files to upload.")
                 return 0
-
-            with tqdm(total=len(files), unit="file") as pbar:
-                if workers > 1:
-                    print(f"Uploading with {workers} parallel workers...")
-                    with ThreadPoolExecutor(max_workers=workers) as ex:
-                        # Unpack the (local_path, rel_path, size) tuples
-                        local_paths, rel_paths, sizes = zip(*files)
-                        tasks = ex.map(
-                            upload_one_file,
-                            local_paths,
-                            rel_paths,
-                            sizes,
-                            itertools.repeat(client),
-                            itertools.repeat(dest_folder_id),
-                            itertools.repeat(args.onedrive_folder),
-                            itertools.repeat(children_cache),
-                            itertools.repeat(folder_id_cache),
-                            itertools.repeat(chunk_size),
-                        )
-                        for _, size in tasks:
-                            uploaded_count += 1
-                            pbar.update(1)
-                else:
-                    # Sequential upload for --parallel=1
-                    print("Uploading sequentially...")
-                    for local_file, rel_path, size in files:
-                        upload_one_file(
-                            local_file,
-                            rel_path,
-                            size,
-                            client=client,
-                            dest_folder_id=dest_folder_id,
-                            onedrive_folder=args.onedrive_folder,
-                            children_cache=children_cache,
-                            folder_id_cache=folder_id_cache,
-                            chunk_size=chunk_size,
-                        )
-                        uploaded_count += 1
-                        pbar.update(1)
-
             print(f"Done. Uploaded {uploaded_count} files into '{args.onedrive_folder}'.")
+            stats = client.pool_stats()
+            print(
+                f"HTTP: {stats['requests']} requests over {stats['connections']} connections "
+                f"({stats['reused']} reused)."
+            )
+            if client.governor.throttled:
+                print(
+                    f"Graph throttled {client.governor.throttled} requests; "
+                    f"concurrency settled at {int(client.governor.limit)} of {workers}."
+                )
             return 0
         finally:
-            if not args.keep_extracted and "tmp_extract_ctx" in locals() and tmp_extract_ctx:
+            if state is not None:
+                state.flush()
+            if reader is not None:
+                reader.close()
+            if tmp_extract_ctx:
                 tmp_extract_ctx.cleanup()
+            if spool_ctx:
+                spool_ctx.cleanup()
     finally:
         if not args.keep_zip and tmp_zip_ctx:
             tmp_zip_ctx.cleanup()
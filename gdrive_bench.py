@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark runner for gdrive_cleanup.py.
+
+Runs the cleanup commands against the in-memory FakeDriveService
+(gdrive_fake.py) and reports files/sec and API calls per command, so scan
+and batch optimisations can be measured on a laptop with no network.
+
+Examples:
+  python gdrive_bench.py --files 200000
+  python gdrive_bench.py --files 50000 --latency-ms 80 --commands audit,duplicates
+  python gdrive_bench.py --corpus recorded.jsonl --json bench.json
+
+Recording a corpus from a real account (read-only scope):
+  python gdrive_bench.py record --out recorded.jsonl
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import gdrive_cleanup as gc
+from common_utils import eprint, write_json
+from gdrive_fake import FakeDriveService, load_corpus, synthetic_corpus
+
+
+COMMANDS: Dict[str, List[str]] = {
+    "audit": ["audit"],
+    "audit-rollup": ["audit", "--rollup"],
+    "audit-estimate": ["audit", "--estimate", "--estimate-seed", "0"],
+    "audit-all-drives": ["--all-drives", "audit"],
+    "duplicates": ["duplicates", "--plan-json", ""],
+    "duplicate-folders": ["duplicate-folders", "--plan-json", ""],
+    "duplicates-all-drives": ["--all-drives", "duplicates", "--plan-json", ""],
+    "trash-query": ["trash-query"],
+    "trash-query-stream": ["trash-query", "--stream", "--apply"],
+    "trash": ["trash"],
+}
+
+
+def _run_command(argv: List[str], service: FakeDriveService) -> int:
+    args = gc.build_parser().parse_args(argv)
+    args.service = service
+    # Silence tables and progress bars; only the timings matter here.
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        return int(args.func(args))
+
+
+def bench_command(
+    name: str,
+    *,
+    make_service: Callable[[], FakeDriveService],
+    page_size: int,
+    trash_count: int,
+    workdir: Path,
+) -> Dict[str, Any]:
+    service = make_service()
+    n_items = len(service._items)
+    argv = ["--page-size", str(page_size)] + list(COMMANDS[name])
+    if name == "trash":
+        ids = random.Random(0).sample(sorted(service._items), min(trash_count, n_items))
+        ids_path = workdir / "ids.json"
+        write_json(ids_path, {"fileIds": ids})
+        argv += ["--ids-json", str(ids_path), "--confirm", f"TRASH {len(ids)} FILES", "--apply"]
+        n_items = len(ids)
+    elif name == "trash-query-stream":
+        n_items = sum(1 for it in service._items.values() if it.get("mimeType") != gc.FOLDER_MIME_TYPE)
+        argv += ["--confirm", f"TRASH {n_items} FILES", "--checkpoint", str(workdir / "trash.ckpt")]
+    elif "--plan-json" in argv:
+        argv[argv.index("--plan-json") + 1] = str(workdir / f"{name}.json")
+
+    t0 = time.perf_counter()
+    rc = _run_command(argv, service)
+    elapsed = time.perf_counter() - t0
+    calls = dict(service.calls)
+    return {
+        "command": name,
+        "exitCode": rc,
+        "items": n_items,
+        "seconds": round(elapsed, 3),
+        "itemsPerSec": round(n_items / elapsed, 1) if elapsed > 0 else None,
+        "httpRequests": calls.pop("http", 0),
+        "calls": calls,
+    }
+
+
+def cmd_run(args: argparse.Namespace) -> int:
+    if args.corpus:
+        items = load_corpus(Path(args.corpus))
+    else:
+        items = synthetic_corpus(
+            args.files,
+            files_per_folder=args.files_per_folder,
+            dup_ratio=args.dup_ratio,
+            seed=args.seed,
+            shared_drives=args.shared_drives,
+        )
+
+    def make_service() -> FakeDriveService:
+        return FakeDriveService(
+            items,
+            latency_ms=args.latency_ms,
+            jitter_ms=args.jitter_ms,
+            error_rate=args.error_rate,
+            max_qps=args.max_qps,
+            seed=args.seed,
+        )
+
+    os.environ.setdefault("TQDM_DISABLE", "1")
+    names = [c.strip() for c in args.commands.split(",") if c.strip()]
+    unknown = [c for c in names if c not in COMMANDS]
+    if unknown:
+        eprint(f"Unknown commands: {', '.join(unknown)} (choose from {', '.join(COMMANDS)})")
+        return 2
+
+    results = []
+    print(f"Corpus: {len(items)} items; latency={args.latency_ms}ms error_rate={args.error_rate} max_qps={args.max_qps or '-'}")
+    print(f"{'command':<22} {'rc':>3} {'items':>10} {'seconds':>9} {'items/s':>11} {'http':>7}  calls")
+    with tempfile.TemporaryDirectory(prefix="gdrive_bench_") as tmp:
+        for name in names:
+            r = bench_command(
+                name,
+                make_service=make_service,
+                page_size=args.page_size,
+                trash_count=args.trash_count,
+                workdir=Path(tmp),
+            )
+            results.append(r)
+            calls = ", ".join(f"{k}={v}" for k, v in sorted(r["calls"].items()))
+            print(
+                f"{r['command']:<22} {r['exitCode']:>3} {r['items']:>10} {r['seconds']:>9.3f} "
+                f"{r['itemsPerSec'] or 0:>11.1f} {r['httpRequests']:>7}  {calls}"
+            )
+
+    if args.json:
+        write_json(args.json, {"corpusItems": len(items), "results": results})
+        print(f"Wrote JSON: {args.json}")
+    return 0
+
+
+def cmd_record(args: argparse.Namespace) -> int:
+    creds = gc.load_credentials(
+        credentials_path=args.credentials,
+        token_path=args.token,
+        scopes=gc.SCOPES_READONLY,
+    )
+    service = gc.drive_service(creds=creds)
+    n = 0
+    with open(args.out, "w", encoding="utf-8") as f:
+        for item in gc.iter_files(
+            service,
+            q=args.query,
+            include_trashed=False,
+            page_size=1000,
+        ):
+            d = dict(item.__dict__)
+            d["owners"] = [{"emailAddress": o} for o in item.owners]
+            d["parents"] = list(item.parents)
+            if d["size"] is not None:
+                d["size"] = str(d["size"])
+            f.write(json.dumps(d) + "\n")
+            n += 1
+    print(f"Recorded {n} items to {args.out}")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(
+        prog="gdrive_bench.py",
+        description="Benchmark gdrive_cleanup.py commands against an offline fake Drive service.",
+    )
+    p.add_argument("--files", type=int, default=100_000, help="Synthetic corpus size (files)")
+    p.add_argument("--files-per-folder", type=int, default=50, help="Synthetic files per folder")
+    p.add_argument("--dup-ratio", type=float, default=0.1, help="Synthetic duplicate-content ratio")
+    p.add_argument("--shared-drives", type=int, default=0, help="Spread the synthetic corpus over N shared drives")
+    p.add_argument("--corpus", default=None, help="Recorded corpus (JSON or JSONL) instead of synthetic")
+    p.add_argument("--seed", type=int, default=0, help="Random seed")
+    p.add_argument("--latency-ms", type=float, default=0.0, help="Latency per HTTP request")
+    p.add_argument("--jitter-ms", type=float, default=0.0, help="Random extra latency per request")
+    p.add_argument("--error-rate", type=float, default=0.0, help="Probability of a 500 per call")
+    p.add_argument("--max-qps", type=float, default=0.0, help="Quota in requests/sec (0 = unlimited)")
+    p.add_argument("--page-size", type=int, default=1000, help="files.list page size")
+    p.add_argument("--trash-count", type=int, default=1000, help="IDs to trash in the 'trash' benchmark")
+    p.add_argument(
+        "--commands",
+        default="audit,audit-rollup,duplicates,duplicate-folders,trash-query,trash",
+        help=f"Comma-separated commands to run ({', '.join(COMMANDS)})",
+    )
+    p.add_argument("--json", default=None, help="Write results as JSON")
+    p.set_defaults(func=cmd_run)
+
+    sub = p.add_subparsers(dest="cmd")
+    r = sub.add_parser("record", help="Record a real Drive listing as JSONL for replay")
+    r.add_argument("--out", required=True, help="Output JSONL path")
+    r.add_argument("--credentials", default="credentials.json", help="OAuth client secrets JSON path")
+    r.add_argument("--token", default="token.json", help="OAuth token cache path")
+    r.add_argument("--query", default=None, help="Drive API query (q=...) to filter files")
+    r.set_defaults(func=cmd_record)
+    return p
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    return int(args.func(args))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
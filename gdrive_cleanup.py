@@ -16,22 +16,42 @@ Setup:
 from __future__ import annotations
 
 import argparse
+import base64
 import csv
 import datetime as dt
+import hashlib
 import heapq
 import json
+import math
+import mimetypes
 import os
+import queue
+import random
+import re
 import sys
+import threading
+import time
+from array import array
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Any, Dict, Iterable, List, Optional, Tuple
-
-from common_utils import eprint, human_bytes, now_stamp, write_json
-from google.auth.transport.requests import Request
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from common_utils import (
+    HashCache,
+    eprint,
+    hash_files_parallel,
+    human_bytes,
+    now_stamp,
+    write_json,
+    write_json_atomic,
+)
+import httplib2
+from google.auth.exceptions import GoogleAuthError
 from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaFileUpload
 from tqdm import tqdm
 
 
@@ -77,7 +97,53 @@ DUPLICATES_PASS1_FIELDS = ",".join(
 # --- OPTIMIZATION: Fields for fetching full file metadata ---
 # Used in the second pass of the duplicates command to fetch detailed metadata
 # for only the files identified as duplicates.
-FULL_FILE_FIELDS = "id,name,mimeType,size,md5Checksum,trashed,createdTime,modifiedTime,owners(displayName,emailAddress),parents,webViewLink"
+FULL_FILE_FIELDS = "id,name,mimeType,size,md5Checksum,trashed,createdTime,modifiedTime,owners(displayName,emailAddress),parents,webViewLink,driveId"
+
+
+# --- OPTIMIZATION: Single listing for folder-tree duplicates ---
+# Folder duplicates are computed from one listing of files and folders. Only
+# the fields needed to rebuild the folder graph and hash contents are fetched.
+FOLDER_TREE_FIELDS = ",".join(
+    [
+        "nextPageToken",
+        "files(id,name,mimeType,size,md5Checksum,parents)",
+    ]
+)
+
+
+# --- OPTIMIZATION: Fields for audit rollups ---
+# Rollups need owners, mimeType and parents on top of the fields used for the
+# top-N listing, but still nothing like the full metadata set.
+AUDIT_ROLLUP_FIELDS = ",".join(
+    [
+        "nextPageToken",
+        "files(id,name,mimeType,size,owners(displayName,emailAddress),parents,webViewLink)",
+    ]
+)
+
+
+# --- OPTIMIZATION: Fields for path resolution ---
+# Listings that need item paths add `parents`; ancestor folders are fetched
+# with only the fields needed to walk up the tree.
+TRASH_QUERY_PATH_FIELDS = ",".join(
+    [
+        "nextPageToken",
+        "files(id,name,size,webViewLink,parents)",
+    ]
+)
+FOLDER_PATH_FIELDS = "id,name,parents"
+
+
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+
+
+# --- OPTIMIZATION: Per-drive corpora ---
+# With --all-drives, My Drive and every shared drive are listed as separate
+# corpora on a thread pool instead of one includeItemsFromAllDrives cursor, so
+# wall time tracks the largest drive rather than the sum of all of them, and
+# results can be reported per drive. MY_DRIVE_ID stands for the user corpus.
+MY_DRIVE_ID = "my-drive"
+DRIVES_FIELDS = "nextPageToken,drives(id,name)"
 
 
 @dataclass(frozen=True)
@@ -92,6 +158,8 @@ class DriveFile:
     modifiedTime: Optional[str]
     owners: Tuple[str, ...]
     webViewLink: Optional[str]
+    parents: Tuple[str, ...] = ()
+    driveId: Optional[str] = None
 
     @staticmethod
     def from_api(d: Dict[str, Any]) -> "DriveFile":
@@ -115,7 +183,532 @@ class DriveFile:
             modifiedTime=d.get("modifiedTime"),
             owners=owners,
             webViewLink=d.get("webViewLink"),
+            parents=tuple(d.get("parents") or ()),
+            driveId=d.get("driveId"),
+        )
+
+    @staticmethod
+    def from_state(d: Dict[str, Any]) -> "DriveFile":
+        """Rebuild from `__dict__` after a JSON round trip (lists back to tuples)."""
+        return DriveFile(**dict(d, owners=tuple(d["owners"]), parents=tuple(d.get("parents") or ())))
+
+
+class ChecksumIndex:
+    """
+    Compact md5 -> file ID index for duplicates pass 1.
+
+    A ``Dict[str, List[str]]`` keyed by hex digests costs several hundred bytes
+    per file (hex string, list, ID string and dict slot). This index instead
+    stores each record as a 16-byte binary digest in one ``bytearray``, its size
+    in a packed ``array``, and its ID in a shared byte blob addressed by an end
+    offset, i.e. roughly 60 bytes per file. Duplicate groups are found by
+    partitioning on the first digest byte and hashing one partition at a time,
+    so only candidate groups are ever materialized as Python objects.
+    """
+
+    DIGEST_SIZE = 16
+
+    def __init__(self) -> None:
+        self._digests = bytearray()
+        self._sizes = array("q")
+        self._id_blob = bytearray()
+        self._id_ends = array("Q")
+
+    def __len__(self) -> int:
+        return len(self._sizes)
+
+    def add(self, file_id: str, md5_hex: str, size: Optional[int]) -> bool:
+        """Add a record; returns False if the checksum is not a valid md5."""
+        try:
+            digest = bytes.fromhex(md5_hex)
+        except ValueError:
+            return False
+        if len(digest) != self.DIGEST_SIZE:
+            return False
+        self._digests += digest
+        self._sizes.append(size if size is not None else -1)
+        self._id_blob += file_id.encode("utf-8")
+        self._id_ends.append(len(self._id_blob))
+        return True
+
+    def extend(self, other: "ChecksumIndex") -> None:
+        """Append every record of `other` (e.g. merging per-drive indexes)."""
+        base = len(self._id_blob)
+        self._digests += other._digests
+        self._sizes.extend(other._sizes)
+        self._id_blob += other._id_blob
+        self._id_ends.extend(end + base for end in other._id_ends)
+
+    def file_id(self, i: int) -> str:
+        start = self._id_ends[i - 1] if i else 0
+        return self._id_blob[start : self._id_ends[i]].decode("utf-8")
+
+    def size(self, i: int) -> Optional[int]:
+        s = self._sizes[i]
+        return s if s >= 0 else None
+
+    def digest_hex(self, i: int) -> str:
+        off = i * self.DIGEST_SIZE
+        return self._digests[off : off + self.DIGEST_SIZE].hex()
+
+    def to_state(self) -> Dict[str, str]:
+        def enc(b: bytes) -> str:
+            return base64.b64encode(b).decode("ascii")
+
+        return {
+            "digests": enc(bytes(self._digests)),
+            "sizes": enc(self._sizes.tobytes()),
+            "idBlob": enc(bytes(self._id_blob)),
+            "idEnds": enc(self._id_ends.tobytes()),
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict[str, str]) -> "ChecksumIndex":
+        idx = cls()
+        idx._digests = bytearray(base64.b64decode(state["digests"]))
+        idx._sizes.frombytes(base64.b64decode(state["sizes"]))
+        idx._id_blob = bytearray(base64.b64decode(state["idBlob"]))
+        idx._id_ends.frombytes(base64.b64decode(state["idEnds"]))
+        return idx
+
+    def duplicate_groups(self) -> Dict[str, List[str]]:
+        """Return {md5: [file IDs]} for every checksum shared by 2+ files."""
+        ds = self.DIGEST_SIZE
+        digests = self._digests
+        # One byte per record; partitioning on it keeps the transient dict
+        # below to ~1/256 of the records at any time.
+        first_bytes = digests[0::ds]
+        out: Dict[str, List[str]] = {}
+        for bucket in range(256):
+            first_seen: Dict[bytes, int] = {}
+            groups: Dict[bytes, List[int]] = {}
+            pos = first_bytes.find(bucket)
+            while pos != -1:
+                key = bytes(digests[pos * ds : (pos + 1) * ds])
+                first = first_seen.setdefault(key, pos)
+                if first != pos:
+                    groups.setdefault(key, [first]).append(pos)
+                pos = first_bytes.find(bucket, pos + 1)
+            for key, idxs in groups.items():
+                out[key.hex()] = [self.file_id(i) for i in idxs]
+        return out
+
+
+def bottom_up_order(parent_of: Dict[str, Optional[str]]) -> List[str]:
+    """
+    Order folder IDs so every folder comes after all of its descendants.
+
+    `parent_of` maps each known folder ID to its parent folder ID (or None).
+    Parents outside the mapping are treated as roots. Runs in O(folders).
+    """
+    children: Dict[str, List[str]] = defaultdict(list)
+    roots: List[str] = []
+    for fid, parent in parent_of.items():
+        if parent is not None and parent in parent_of:
+            children[parent].append(fid)
+        else:
+            roots.append(fid)
+
+    order: List[str] = []
+    # Iterative post-order DFS; deep trees must not hit the recursion limit.
+    stack: List[Tuple[str, bool]] = [(r, False) for r in roots]
+    while stack:
+        fid, expanded = stack.pop()
+        if expanded:
+            order.append(fid)
+            continue
+        stack.append((fid, True))
+        stack.extend((c, False) for c in children.get(fid, ()))
+    return order
+
+
+@dataclass
+class FolderNode:
+    id: str
+    name: str
+    parent: Optional[str]
+    entries: List[bytes]
+    size: int = 0
+    file_count: int = 0
+    digest: bytes = b""
+
+
+def _entry_digest(kind: str, name: str, content: str) -> bytes:
+    h = hashlib.sha256()
+    for part in (kind, name, content):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.digest()
+
+
+def find_duplicate_folders(files: Iterable[DriveFile]) -> List[List[FolderNode]]:
+    """
+    Find identical folder subtrees using a bottom-up Merkle hash.
+
+    Each folder's hash covers the sorted names and content hashes of its
+    children (md5 for files, the subtree hash for folders), so two folders
+    match exactly when their whole trees match, regardless of the folders'
+    own names. Files without an md5 (Google Docs, shortcuts) hash by ID and
+    therefore never match. Only maximal groups are returned: a group whose
+    members all sit inside duplicated parents is covered by the parent group.
+    Groups are sorted by reclaimable bytes, largest first.
+    """
+    folders: Dict[str, FolderNode] = {}
+    pending: Dict[str, List[Tuple[bytes, int]]] = defaultdict(list)
+
+    for f in files:
+        parent = f.parents[0] if f.parents else None
+        if f.mimeType == FOLDER_MIME_TYPE:
+            folders[f.id] = FolderNode(id=f.id, name=f.name, parent=parent, entries=[])
+            continue
+        if parent is None:
+            continue
+        content = f"md5:{f.md5Checksum}:{f.size or 0}" if f.md5Checksum else f"id:{f.id}"
+        pending[parent].append((_entry_digest("f", f.name, content), f.size or 0))
+
+    # Files may be listed before their parent folder, so attach them afterwards.
+    for parent, entries in pending.items():
+        node = folders.get(parent)
+        if node is None:
+            continue
+        for digest, size in entries:
+            node.entries.append(digest)
+            node.size += size
+            node.file_count += 1
+    pending.clear()
+
+    for fid in bottom_up_order({k: v.parent for k, v in folders.items()}):
+        node = folders[fid]
+        node.digest = hashlib.sha256(b"".join(sorted(node.entries))).digest()
+        node.entries = []
+        parent_node = folders.get(node.parent) if node.parent else None
+        if parent_node is not None:
+            parent_node.entries.append(_entry_digest("d", node.name, node.digest.hex()))
+            parent_node.size += node.size
+            parent_node.file_count += node.file_count
+
+    by_digest: Dict[bytes, List[FolderNode]] = defaultdict(list)
+    for node in folders.values():
+        if node.file_count > 0:
+            by_digest[node.digest].append(node)
+    dup_digests = {d for d, nodes in by_digest.items() if len(nodes) >= 2}
+
+    def _covered(node: FolderNode) -> bool:
+        parent_node = folders.get(node.parent) if node.parent else None
+        return parent_node is not None and parent_node.digest in dup_digests
+
+    groups = [
+        sorted(by_digest[d], key=lambda n: n.id)
+        for d in dup_digests
+        if not all(_covered(n) for n in by_digest[d])
+    ]
+    groups.sort(key=lambda g: (g[0].size * (len(g) - 1), g[0].file_count), reverse=True)
+    return groups
+
+
+class UsageRollup:
+    """
+    Streaming size/count rollups by owner, by mimeType and by folder subtree.
+
+    Files are never retained: each one only bumps counters for its owner, its
+    mimeType and its direct parent folder, so memory is O(owners + mimeTypes +
+    folders) regardless of how many files are scanned. Folder items record
+    their own parent, and `folder_totals` propagates the direct totals up the
+    tree once the scan is complete.
+    """
+
+    def __init__(self) -> None:
+        self.by_owner: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
+        self.by_mime: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
+        self._direct: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
+        self._folders: Dict[str, Tuple[str, Optional[str]]] = {}
+
+    def add(self, f: DriveFile) -> None:
+        parent = f.parents[0] if f.parents else None
+        if f.mimeType == FOLDER_MIME_TYPE:
+            self._folders[f.id] = (f.name, parent)
+            return
+        size = f.size or 0
+        for owner in f.owners or ("(no owner)",):
+            acc = self.by_owner[owner]
+            acc[0] += size
+            acc[1] += 1
+        acc = self.by_mime[f.mimeType or "(unknown)"]
+        acc[0] += size
+        acc[1] += 1
+        if parent is not None:
+            acc = self._direct[parent]
+            acc[0] += size
+            acc[1] += 1
+
+    def merge(self, other: "UsageRollup") -> None:
+        for mine, theirs in (
+            (self.by_owner, other.by_owner),
+            (self.by_mime, other.by_mime),
+            (self._direct, other._direct),
+        ):
+            for key, (size, count) in theirs.items():
+                acc = mine[key]
+                acc[0] += size
+                acc[1] += count
+        self._folders.update(other._folders)
+
+    def to_state(self) -> Dict[str, Any]:
+        return {
+            "byOwner": dict(self.by_owner),
+            "byMime": dict(self.by_mime),
+            "direct": dict(self._direct),
+            "folders": self._folders,
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "UsageRollup":
+        rollup = cls()
+        rollup.by_owner.update(state["byOwner"])
+        rollup.by_mime.update(state["byMime"])
+        rollup._direct.update(state["direct"])
+        rollup._folders = {k: (v[0], v[1]) for k, v in state["folders"].items()}
+        return rollup
+
+    def folder_totals(self) -> Dict[str, Tuple[str, int, int]]:
+        """Return {folder ID: (name, subtree bytes, subtree files)}."""
+        totals: Dict[str, List[int]] = {
+            fid: list(self._direct.get(fid, (0, 0))) for fid in self._folders
+        }
+        parent_of = {fid: parent for fid, (_, parent) in self._folders.items()}
+        for fid in bottom_up_order(parent_of):
+            parent = parent_of[fid]
+            if parent in totals:
+                totals[parent][0] += totals[fid][0]
+                totals[parent][1] += totals[fid][1]
+        return {
+            fid: (self._folders[fid][0], size, count)
+            for fid, (size, count) in totals.items()
+        }
+
+    @staticmethod
+    def top(groups: Dict[str, List[int]], n: int) -> List[Tuple[str, int, int]]:
+        return heapq.nlargest(n, ((k, v[0], v[1]) for k, v in groups.items()), key=lambda x: x[1])
+
+    def top_folders(self, n: int) -> List[Tuple[str, str, int, int]]:
+        totals = self.folder_totals()
+        rows = ((fid, name, size, count) for fid, (name, size, count) in totals.items())
+        return heapq.nlargest(n, rows, key=lambda x: x[2])
+
+
+def print_rollup(
+    rollup: UsageRollup, *, top: int, resolver: Optional["FolderPathResolver"] = None
+) -> None:
+    print("")
+    print(f"Top {top} owners by size:")
+    for owner, size, count in UsageRollup.top(rollup.by_owner, top):
+        print(f"- {human_bytes(size)}  {count} files  {owner}")
+    print("")
+    print(f"Top {top} mimeTypes by size:")
+    for mime, size, count in UsageRollup.top(rollup.by_mime, top):
+        print(f"- {human_bytes(size)}  {count} files  {mime}")
+    print("")
+    print(f"Top {top} heaviest folders (recursive):")
+    folders = rollup.top_folders(top)
+    if resolver:
+        resolver.resolve(fid for fid, _, _, _ in folders)
+    for fid, name, size, count in folders:
+        label = resolver.folder_path(fid) if resolver else name
+        print(f"- {human_bytes(size)}  {count} files  {label}  ({fid})")
+
+
+class AuditTotals:
+    """Streaming audit aggregates: totals, the top-N largest files and optional rollups."""
+
+    def __init__(self, *, top: int, rollup: bool) -> None:
+        self.top = top
+        # Entries are (size, id, file); the unique id breaks ties so DriveFile
+        # objects are never compared.
+        self.heap: List[Tuple[int, str, DriveFile]] = []
+        self.total_size = 0
+        self.scanned = 0
+        self.count_with_size = 0
+        self.rollup = UsageRollup() if rollup else None
+
+    def add(self, f: DriveFile) -> None:
+        self.scanned += 1
+        if self.rollup:
+            self.rollup.add(f)
+        if f.size is not None:
+            self.total_size += f.size
+            self.count_with_size += 1
+            self._push((f.size, f.id, f))
+
+    def _push(self, entry: Tuple[int, str, DriveFile]) -> None:
+        # Use a min-heap to keep track of the k largest files.
+        if len(self.heap) < self.top:
+            heapq.heappush(self.heap, entry)
+        else:
+            heapq.heappushpop(self.heap, entry)
+
+    def merge(self, other: "AuditTotals") -> None:
+        self.total_size += other.total_size
+        self.scanned += other.scanned
+        self.count_with_size += other.count_with_size
+        for entry in other.heap:
+            self._push(entry)
+        if self.rollup and other.rollup:
+            self.rollup.merge(other.rollup)
+
+    def top_files(self) -> List[DriveFile]:
+        """The k largest files, largest first."""
+        return sorted([item[2] for item in self.heap], key=lambda x: x.size or -1, reverse=True)
+
+    def to_state(self) -> Dict[str, Any]:
+        return {
+            "heap": [[size, fid, f.__dict__] for size, fid, f in self.heap],
+            "totalSize": self.total_size,
+            "scanned": self.scanned,
+            "countWithSize": self.count_with_size,
+            "rollup": self.rollup.to_state() if self.rollup else None,
+        }
+
+    def load_state(self, state: Dict[str, Any]) -> None:
+        self.heap = [(size, fid, DriveFile.from_state(d)) for size, fid, d in state["heap"]]
+        heapq.heapify(self.heap)
+        self.total_size = state["totalSize"]
+        self.scanned = state["scanned"]
+        self.count_with_size = state["countWithSize"]
+        if self.rollup:
+            self.rollup = UsageRollup.from_state(state["rollup"])
+
+
+# A page fetch can fail with an API error, but also with an expired or
+# revoked token (RefreshError), or a transport failure: DNS, a reset
+# connection or a timeout. All of them happen between pages, so the
+# checkpoint is saved for every one.
+SCAN_ERRORS = (HttpError, GoogleAuthError, httplib2.HttpLib2Error, OSError)
+# A periodic save waits at least this many times as long as the previous
+# save took, so checkpointing stays under ~5% of the scan.
+CHECKPOINT_COST_RATIO = 20
+
+
+class ScanCheckpoint:
+    """
+    Periodically save a listing's position and the command's partial results.
+
+    Every `every_pages` pages (and when a page fetch fails) the checkpoint
+    writes the query/field set identifying the scan, the next page token and
+    `state_fn()` to `path`. A run started with --resume reloads the state and
+    continues from that page token instead of page one. Saves happen between
+    pages, so the token and the aggregates always agree.
+
+    Each save rewrites the whole state, which grows with the scan (for
+    duplicates, the full checksum index). Periodic saves are therefore
+    spaced by CHECKPOINT_COST_RATIO times the last save's duration, so
+    their total cost stays proportional to the scan rather than quadratic.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        key: Dict[str, Any],
+        every_pages: int,
+        state_fn: Callable[[], Dict[str, Any]],
+    ) -> None:
+        self.path = path
+        self.key = key
+        self.every_pages = every_pages
+        self.state_fn = state_fn
+        self.page_token: Optional[str] = None
+        self.pages = 0
+        self._saved_at: Optional[float] = None
+        self._save_s = 0.0
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        """Return the saved state, or None if there is no checkpoint."""
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, "r", encoding="utf-8") as f:
+            payload = json.load(f)
+        if payload.get("key") != self.key:
+            raise ValueError(
+                f"Checkpoint {self.path} was written by a different scan "
+                "(command, query, fields or options differ)."
+            )
+        self.page_token = payload.get("pageToken")
+        self.pages = int(payload.get("pages", 0))
+        return payload.get("state") or {}
+
+    def on_page(self, page_token: Optional[str]) -> None:
+        self.page_token = page_token
+        if page_token is None:
+            return
+        self.pages += 1
+        if self.every_pages > 0 and self.pages % self.every_pages == 0:
+            if self._saved_at is None or time.monotonic() - self._saved_at >= CHECKPOINT_COST_RATIO * self._save_s:
+                self.save()
+
+    def save(self) -> None:
+        if self.page_token is None or self.every_pages <= 0:
+            return
+        started = time.monotonic()
+        write_json_atomic(
+            self.path,
+            {
+                "key": self.key,
+                "pageToken": self.page_token,
+                "pages": self.pages,
+                "savedAt": dt.datetime.now(dt.timezone.utc).isoformat(),
+                "state": self.state_fn(),
+            },
         )
+        self._saved_at = time.monotonic()
+        self._save_s = self._saved_at - started
+
+    def remove(self) -> None:
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def open_scan_checkpoint(
+    args: argparse.Namespace,
+    *,
+    fields: str,
+    options: Dict[str, Any],
+    state_fn: Callable[[], Dict[str, Any]],
+) -> Tuple[ScanCheckpoint, Optional[Dict[str, Any]]]:
+    """Create the command's checkpoint; with --resume, also return the saved state."""
+    key = {
+        "command": args.cmd,
+        "query": args.query,
+        "includeTrashed": args.include_trashed,
+        "pageSize": args.page_size,
+        "fields": fields,
+        "options": options,
+    }
+    ckpt = ScanCheckpoint(
+        args.checkpoint, key=key, every_pages=args.checkpoint_every, state_fn=state_fn
+    )
+    if not args.resume:
+        return ckpt, None
+    state = ckpt.load()
+    if state is None:
+        eprint(f"No checkpoint at {args.checkpoint}; starting from the first page.")
+    else:
+        eprint(f"Resuming from checkpoint {args.checkpoint} (page {ckpt.pages}).")
+    return ckpt, state
+
+
+# --- OPTIMIZATION: Fast startup ---
+# Scripted runs pay for every millisecond before the first request:
+#   - the Drive client is built from the discovery document bundled with
+#     google-api-python-client (static_discovery=True), never fetched;
+#   - credentials are refreshed only when expired (google-auth treats tokens
+#     within a few minutes of expiry as expired) and token.json is rewritten
+#     only when the token changed (after a refresh or a new OAuth flow);
+#   - credentials are loaded once per process and shared by every service the
+#     command opens (e.g. per-worker services);
+#   - the OAuth flow and refresh transport (which pull in requests and
+#     oauthlib) are imported only when needed.
+_credentials_cache: Dict[Tuple[str, Tuple[str, ...]], Credentials] = {}
+_credentials_lock = threading.Lock()
 
 
 def load_credentials(
@@ -123,12 +716,34 @@ def load_credentials(
     credentials_path: str,
     token_path: str,
     scopes: List[str],
+) -> Credentials:
+    key = (os.path.abspath(token_path), tuple(scopes))
+    with _credentials_lock:
+        creds = _credentials_cache.get(key)
+        if creds is not None and creds.valid:
+            return creds
+        creds = _load_credentials(
+            credentials_path=credentials_path, token_path=token_path, scopes=scopes
+        )
+        _credentials_cache[key] = creds
+        return creds
+
+
+def _load_credentials(
+    *,
+    credentials_path: str,
+    token_path: str,
+    scopes: List[str],
 ) -> Credentials:
     creds: Optional[Credentials] = None
     if os.path.exists(token_path):
         creds = Credentials.from_authorized_user_file(token_path, scopes=scopes)
+    changed = False
     if creds and creds.expired and creds.refresh_token:
+        from google.auth.transport.requests import Request
+
         creds.refresh(Request())
+        changed = True
     if not creds or not creds.valid:
         if not os.path.exists(credentials_path):
             raise FileNotFoundError(
@@ -136,17 +751,133 @@ def load_credentials(
                 "Create a 'Desktop app' OAuth client in Google Cloud Console, download JSON, "
                 "and save it as ./credentials.json"
             )
+        from google_auth_oauthlib.flow import InstalledAppFlow
+
         flow = InstalledAppFlow.from_client_secrets_file(credentials_path, scopes=scopes)
         creds = flow.run_local_server(port=0)
-    with open(token_path, "w", encoding="utf-8") as f:
-        f.write(creds.to_json())
+        changed = True
+    if changed:
+        with open(token_path, "w", encoding="utf-8") as f:
+            f.write(creds.to_json())
     return creds
 
 
 def drive_service(*, creds: Credentials) -> Any:
     """Initialize the Drive API service."""
-    # cache_discovery=False avoids writing discovery cache files
-    return build("drive", "v3", credentials=creds, cache_discovery=False)
+    # static_discovery uses the discovery document bundled with the client
+    # library (no network); cache_discovery=False avoids writing cache files.
+    return build("drive", "v3", credentials=creds, cache_discovery=False, static_discovery=True)
+
+
+def open_drive_service(args: argparse.Namespace, *, scopes: List[str]) -> Any:
+    """
+    Return the Drive service for a command.
+
+    A stand-in service (see gdrive_fake.py) can be injected by setting
+    `args.service` before calling a command, which skips OAuth entirely.
+    """
+    service = getattr(args, "service", None)
+    if service is not None:
+        return service
+    creds = load_credentials(
+        credentials_path=args.credentials,
+        token_path=args.token,
+        scopes=scopes,
+    )
+    return drive_service(creds=creds)
+
+
+@dataclass(frozen=True)
+class DriveScope:
+    """One corpus to scan: My Drive (id MY_DRIVE_ID) or a shared drive."""
+
+    id: str
+    name: str
+
+
+def list_drives(service: Any) -> List[DriveScope]:
+    """My Drive followed by every shared drive the user can see (drives.list)."""
+    drives = [DriveScope(MY_DRIVE_ID, "My Drive")]
+    page_token = None
+    while True:
+        resp = (
+            service.drives()
+            .list(pageSize=100, pageToken=page_token, fields=DRIVES_FIELDS)
+            .execute()
+        )
+        drives.extend(DriveScope(d["id"], d.get("name") or d["id"]) for d in resp.get("drives", []))
+        page_token = resp.get("nextPageToken")
+        if not page_token:
+            return drives
+
+
+def drive_label(drives: List[DriveScope], drive_id: Optional[str]) -> str:
+    """Display name for a file's driveId (None means My Drive)."""
+    key = drive_id or MY_DRIVE_ID
+    for d in drives:
+        if d.id == key:
+            return d.name
+    return key
+
+
+def scan_drives(
+    args: argparse.Namespace,
+    *,
+    scopes: List[str],
+    drives: List[DriveScope],
+    scan: Callable[[Any, DriveScope], Any],
+) -> List[Any]:
+    """
+    Run `scan(service, drive)` for every drive on `--drive-workers` threads.
+
+    Each worker thread opens its own service (googleapiclient services are not
+    thread-safe). Results come back in `drives` order; the first HttpError
+    raised by any scan propagates.
+    """
+    local = threading.local()
+    open_lock = threading.Lock()
+    pbar = tqdm(total=len(drives), desc="Scanning drives", unit="drives")
+
+    def _run(drive: DriveScope) -> Any:
+        service = getattr(local, "service", None)
+        if service is None:
+            with open_lock:
+                service = local.service = open_drive_service(args, scopes=scopes)
+        result = scan(service, drive)
+        pbar.update(1)
+        return result
+
+    workers = max(1, min(args.drive_workers, len(drives)))
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(_run, drives))
+    finally:
+        pbar.close()
+
+
+def _corpus_params(drive_id: Optional[str]) -> Dict[str, Any]:
+    """files.list corpus parameters: everything (None), My Drive, or one shared drive."""
+    if drive_id is None:
+        return {"supportsAllDrives": True, "includeItemsFromAllDrives": True}
+    if drive_id == MY_DRIVE_ID:
+        return {"corpora": "user", "supportsAllDrives": True, "includeItemsFromAllDrives": False}
+    return {
+        "corpora": "drive",
+        "driveId": drive_id,
+        "supportsAllDrives": True,
+        "includeItemsFromAllDrives": True,
+    }
+
+
+def _final_query(q: Optional[str], include_trashed: bool) -> Optional[str]:
+    """Apply the default `trashed = false` filter to a user query."""
+    base_q = q.strip() if q else ""
+    if include_trashed:
+        return base_q or None
+    trash_filter = "trashed = false"
+    if base_q:
+        return f"({base_q}) and ({trash_filter})"
+    return trash_filter
 
 
 def iter_files(
@@ -156,19 +887,24 @@ def iter_files(
     include_trashed: bool,
     page_size: int,
     fields: str = DEFAULT_FIELDS,
+    page_token: Optional[str] = None,
+    on_page: Optional[Callable[[Optional[str]], None]] = None,
+    drive_id: Optional[str] = None,
 ) -> Iterable[DriveFile]:
-    page_token = None
-    base_q = q.strip() if q else ""
-    if include_trashed:
-        final_q = base_q or None
-    else:
-        trash_filter = "trashed = false"
-        if base_q:
-            final_q = f"({base_q}) and ({trash_filter})"
-        else:
-            final_q = trash_filter
-
+    """
+    Yield files matching `q`, one page at a time.
+
+    By default every drive is listed as one stream; `drive_id` restricts the
+    listing to one shared drive, or to My Drive with MY_DRIVE_ID.
+    `page_token` starts the listing mid-way (e.g. from a checkpoint).
+    `on_page` is called with the token of the page about to be fetched; at that
+    point the consumer has processed every file of the previous pages, so the
+    token and the consumer's aggregates describe the same position.
+    """
+    final_q = _final_query(q, include_trashed)
     while True:
+        if on_page is not None:
+            on_page(page_token)
         resp = (
             service.files()
             .list(
@@ -176,8 +912,7 @@ def iter_files(
                 fields=fields,
                 pageSize=page_size,
                 pageToken=page_token,
-                supportsAllDrives=True,
-                includeItemsFromAllDrives=True,
+                **_corpus_params(drive_id),
             )
             .execute()
         )
@@ -188,7 +923,9 @@ def iter_files(
             break
 
 
-def write_csv(path: str, files: List[DriveFile]) -> None:
+def write_csv(
+    path: str, files: List[DriveFile], *, paths: Optional[Dict[str, str]] = None
+) -> None:
     with open(path, "w", newline="", encoding="utf-8") as f:
         w = csv.writer(f)
         w.writerow(
@@ -204,6 +941,7 @@ def write_csv(path: str, files: List[DriveFile]) -> None:
                 "modifiedTime",
                 "webViewLink",
             ]
+            + (["path"] if paths is not None else [])
         )
         for x in files:
             w.writerow(
@@ -219,6 +957,7 @@ def write_csv(path: str, files: List[DriveFile]) -> None:
                     x.modifiedTime or "",
                     x.webViewLink or "",
                 ]
+                + ([paths.get(x.id, "")] if paths is not None else [])
             )
 
 
@@ -257,46 +996,48 @@ def _trash_batch_callback(
         failed_list.append((request_id, str(exception)))
 
 
-def trash_files_batch(
-    service: Any, *, file_ids: List[str]
-) -> Tuple[int, List[Tuple[str, str]]]:
-    """Trash a list of file IDs using batch requests for performance."""
-    if not file_ids:
-        return (0, [])
+def trash_chunk(service: Any, *, file_ids: List[str]) -> List[Tuple[str, str]]:
+    """Trash up to GOOGLE_API_BATCH_LIMIT IDs in one batch request; return failures."""
     failed: List[Tuple[str, str]] = []
     batch = service.new_batch_http_request(
         callback=lambda req_id, resp, exc: _trash_batch_callback(
             req_id, resp, exc, failed_list=failed
         )
     )
+    for fid in file_ids:
+        batch.add(
+            service.files().update(fileId=fid, body={"trashed": True}),
+            request_id=fid,
+        )
+    batch.execute()
+    return failed
+
 
+def trash_files_batch(
+    service: Any, *, file_ids: List[str]
+) -> Tuple[int, List[Tuple[str, str]]]:
+    """Trash a list of file IDs using batch requests for performance."""
+    if not file_ids:
+        return (0, [])
+    failed: List[Tuple[str, str]] = []
     with tqdm(total=len(file_ids), desc="Trashing files", unit="files") as pbar:
-        for i, fid in enumerate(file_ids):
-            batch.add(
-                service.files().update(fileId=fid, body={"trashed": True}),
-                request_id=fid,
-            )
-            # Batch supports up to 100 calls. Execute every 100.
-            if (i + 1) % GOOGLE_API_BATCH_LIMIT == 0:
-                batch.execute()
-                pbar.update(GOOGLE_API_BATCH_LIMIT)
-                # Create a new batch for the next set of requests.
-                batch = service.new_batch_http_request(
-                    callback=lambda req_id, resp, exc: _trash_batch_callback(
-                        req_id, resp, exc, failed_list=failed
-                    )
-                )
-        # Execute any remaining requests in the last batch.
-        remainder = (i + 1) % GOOGLE_API_BATCH_LIMIT
-        if remainder != 0:
-            batch.execute()
-            pbar.update(remainder)
+        # Batch supports up to 100 calls, so execute one batch per 100 IDs.
+        for i in range(0, len(file_ids), GOOGLE_API_BATCH_LIMIT):
+            chunk = file_ids[i : i + GOOGLE_API_BATCH_LIMIT]
+            failed.extend(trash_chunk(service, file_ids=chunk))
+            pbar.update(len(chunk))
 
     ok = len(file_ids) - len(failed)
     return (ok, failed)
 
 
-def get_files_batch(service: Any, *, file_ids: List[str]) -> Iterable[DriveFile]:
+def get_files_batch(
+    service: Any,
+    *,
+    file_ids: List[str],
+    fields: str = FULL_FILE_FIELDS,
+    desc: str = "Fetching metadata",
+) -> Iterable[DriveFile]:
     """
     Fetch metadata for a list of file IDs using batch requests.
     This is more efficient than N+1 individual requests.
@@ -324,14 +1065,14 @@ def get_files_batch(service: Any, *, file_ids: List[str]) -> Iterable[DriveFile]
     # more than 100 file IDs, the list is processed in chunks, executing a
     # separate batch request for each. This makes the function robust for
     # large inputs and avoids API errors.
-    with tqdm(total=len(file_ids), desc="Fetching metadata", unit="files") as pbar:
+    with tqdm(total=len(file_ids), desc=desc, unit="files") as pbar:
         for i in range(0, len(file_ids), GOOGLE_API_BATCH_LIMIT):
             chunk = file_ids[i : i + GOOGLE_API_BATCH_LIMIT]
             batch = service.new_batch_http_request(callback=_callback)
             for fid in chunk:
                 batch.add(
                     service.files().get(
-                        fileId=fid, fields=FULL_FILE_FIELDS, supportsAllDrives=True
+                        fileId=fid, fields=fields, supportsAllDrives=True
                     ),
                     request_id=fid,
                 )
@@ -346,15 +1087,84 @@ def get_files_batch(service: Any, *, file_ids: List[str]) -> Iterable[DriveFile]
     return results
 
 
+class FolderPathResolver:
+    """
+    Resolve Drive items to full paths like "My Drive/Backups/MT5/file.csv".
+
+    Folder names and parents are memoized by ID, so each folder is fetched at
+    most once per run. Unknown ancestors are fetched level by level in batched
+    `files.get` calls (up to 100 per HTTP request) instead of one call per
+    file. Folders already seen in a listing can be seeded to skip fetching.
+    """
+
+    def __init__(self, service: Any) -> None:
+        self._service = service
+        self._nodes: Dict[str, Tuple[str, Optional[str]]] = {}
+        self._paths: Dict[str, str] = {}
+        self.fetched = 0
+
+    def seed(self, f: DriveFile) -> None:
+        if f.mimeType == FOLDER_MIME_TYPE and f.id not in self._nodes:
+            self._nodes[f.id] = (f.name, f.parents[0] if f.parents else None)
+
+    def _unknown(self, folder_ids: Iterable[str]) -> set:
+        unknown = set()
+        for fid in folder_ids:
+            cur: Optional[str] = fid
+            while cur and cur not in self._paths:
+                node = self._nodes.get(cur)
+                if node is None:
+                    unknown.add(cur)
+                    break
+                cur = node[1]
+        return unknown
+
+    def resolve(self, folder_ids: Iterable[str]) -> None:
+        """Fetch every not-yet-known ancestor of the given folder IDs."""
+        pending = self._unknown(folder_ids)
+        while pending:
+            fetched = get_files_batch(
+                self._service,
+                file_ids=sorted(pending),
+                fields=FOLDER_PATH_FIELDS,
+                desc="Resolving folder paths",
+            )
+            self.fetched += len(pending)
+            for f in fetched:
+                self._nodes[f.id] = (f.name, f.parents[0] if f.parents else None)
+            for fid in pending:
+                # Inaccessible ancestors become an opaque path root.
+                self._nodes.setdefault(fid, (f"[{fid}]", None))
+            pending = self._unknown(pending)
+
+    def resolve_files(self, files: Iterable[DriveFile]) -> None:
+        self.resolve(f.parents[0] for f in files if f.parents)
+
+    def folder_path(self, folder_id: str) -> str:
+        chain: List[str] = []
+        cur: Optional[str] = folder_id
+        while cur and cur not in self._paths and cur in self._nodes:
+            chain.append(cur)
+            cur = self._nodes[cur][1]
+            if len(chain) > 10_000:  # defensive: malformed parent cycle
+                break
+        base = self._paths.get(cur, "") if cur else ""
+        for fid in reversed(chain):
+            name = self._nodes[fid][0]
+            base = f"{base}/{name}" if base else name
+            self._paths[fid] = base
+        return self._paths.get(folder_id, base)
+
+    def path_of(self, f: DriveFile) -> str:
+        if not f.parents:
+            return f.name
+        return f"{self.folder_path(f.parents[0])}/{f.name}"
+
+
 def cmd_trash_query(args: argparse.Namespace) -> int:
     # This command modifies Drive, so it uses the broader scope.
     scopes = SCOPES_TRASH
-    creds = load_credentials(
-        credentials_path=args.credentials,
-        token_path=args.token,
-        scopes=scopes,
-    )
-    service = drive_service(creds=creds)
+    service = open_drive_service(args, scopes=scopes)
 
     name_q = None
     if args.name_contains:
@@ -362,23 +1172,56 @@ def cmd_trash_query(args: argparse.Namespace) -> int:
 
     folder_filter = None
     if not args.include_folders:
-        folder_filter = "mimeType != 'application/vnd.google-apps.folder'"
+        folder_filter = f"mimeType != '{FOLDER_MIME_TYPE}'"
 
     final_q = and_query([args.query, name_q, folder_filter])
 
+    if args.stream:
+        if args.all_drives:
+            eprint("--stream is not supported with --all-drives.")
+            return 2
+        return _trash_query_stream(args, service, final_q=final_q, scopes=scopes)
+
+    fields = TRASH_QUERY_PATH_FIELDS if args.show_paths else TRASH_QUERY_FIELDS
     matched: List[DriveFile] = []
     try:
-        iterator = iter_files(
-            service,
-            q=final_q,
-            include_trashed=args.include_trashed,
-            page_size=args.page_size,
-            fields=TRASH_QUERY_FIELDS,
-        )
-        for f in tqdm(iterator, desc="Scanning for trash candidates", unit="files"):
-            matched.append(f)
-            if args.limit and len(matched) >= args.limit:
-                break
+        if args.all_drives:
+
+            def _scan(wservice: Any, drive: DriveScope) -> List[DriveFile]:
+                found: List[DriveFile] = []
+                for f in iter_files(
+                    wservice,
+                    q=final_q,
+                    include_trashed=args.include_trashed,
+                    page_size=args.page_size,
+                    fields=fields,
+                    drive_id=drive.id,
+                ):
+                    found.append(f)
+                    if args.limit and len(found) >= args.limit:
+                        break
+                return found
+
+            drives = list_drives(service)
+            per_drive = scan_drives(args, scopes=scopes, drives=drives, scan=_scan)
+            print("Matches per drive:")
+            for drive, found in zip(drives, per_drive):
+                print(f"- {drive.name}: {len(found)}")
+                matched.extend(found)
+            if args.limit:
+                matched = matched[: args.limit]
+        else:
+            iterator = iter_files(
+                service,
+                q=final_q,
+                include_trashed=args.include_trashed,
+                page_size=args.page_size,
+                fields=fields,
+            )
+            for f in tqdm(iterator, desc="Scanning for trash candidates", unit="files"):
+                matched.append(f)
+                if args.limit and len(matched) >= args.limit:
+                    break
     except HttpError as ex:
         eprint("Drive API error:", ex)
         return 2
@@ -394,9 +1237,15 @@ def cmd_trash_query(args: argparse.Namespace) -> int:
         return 0
 
     show_n = min(args.show, n)
+    resolver = None
+    if args.show_paths:
+        resolver = FolderPathResolver(service)
+        resolver.resolve_files(matched[:show_n])
     print(f"Showing {show_n}/{n}:")
     for f in matched[:show_n]:
         print(f"- {human_bytes(f.size)}  {f.name}  ({f.id})")
+        if resolver:
+            print(f"  path: {resolver.path_of(f)}")
         if args.show_links and f.webViewLink:
             print(f"  link: {f.webViewLink}")
 
@@ -437,75 +1286,620 @@ def cmd_trash_query(args: argparse.Namespace) -> int:
     return 0
 
 
-def cmd_audit(args: argparse.Namespace) -> int:
-    scopes = SCOPES_READONLY
-    creds = load_credentials(
-        credentials_path=args.credentials,
-        token_path=args.token,
-        scopes=scopes,
-    )
-    service = drive_service(creds=creds)
+class TrashCheckpoint:
+    """
+    Append-only progress log for streaming trash-query runs.
 
-    # --- OPTIMIZATION: Memory-efficient audit ---
-    # When not exporting to CSV/JSON, the audit can find the largest files
-    # without storing the entire file list in memory. This is critical for
-    # very large drives, as it reduces memory usage from O(N) to O(k), where N
-    # is the total number of files and k is the number of top files to show.
-    # A min-heap is used to keep track of the largest k files seen so far.
-    is_exporting = args.csv or args.json
-    if is_exporting:
-        # Fallback to the original memory-intensive method when exporting.
-        return _cmd_audit_export(args, service)
+    The first line records the query and confirmed count; every completed
+    batch appends one line with the trashed and failed IDs. Appending keeps
+    each save O(batch) even for runs that trash hundreds of thousands of files.
+    """
 
-    top_n_heap: List[Tuple[int, DriveFile]] = []
-    total_size = 0
-    scanned_count = 0
-    count_with_size = 0
-    try:
-        # --- OPTIMIZATION: Minimal fields for audit scan ---
-        # When only displaying the top N files on the terminal, we don't need
-        # full metadata for every file. Requesting only essential fields
-        # significantly reduces the API payload and speeds up the scan.
-        iterator = iter_files(
-            service,
-            q=args.query,
-            include_trashed=args.include_trashed,
-            page_size=args.page_size,
-            fields=TRASH_QUERY_FIELDS,
-        )
-        for f in tqdm(iterator, desc="Scanning files", unit="files"):
-            scanned_count += 1
-            if f.size is not None:
-                total_size += f.size
-                count_with_size += 1
-                # Use a min-heap to keep track of the k largest files.
-                if len(top_n_heap) < args.top:
-                    heapq.heappush(top_n_heap, (f.size, f))
-                else:
-                    heapq.heappushpop(top_n_heap, (f.size, f))
-    except HttpError as ex:
-        eprint("Drive API error:", ex)
-        return 2
+    def __init__(self, path: str, *, query: Optional[str], cap: int) -> None:
+        self.path = path
+        self.query = query
+        self.cap = cap
+        self.trashed: set = set()
+        self._lock = threading.Lock()
+
+    def load(self) -> bool:
+        """Load prior progress; returns False if the file belongs to another run."""
+        if not os.path.exists(self.path):
+            return True
+        with open(self.path, "r", encoding="utf-8") as f:
+            lines = [json.loads(line) for line in f if line.strip()]
+        if not lines:
+            return True
+        header = lines[0]
+        if header.get("query") != self.query or header.get("cap") != self.cap:
+            return False
+        for entry in lines[1:]:
+            self.trashed.update(entry.get("trashed", ()))
+        return True
+
+    def record(self, trashed: List[str], failed: List[Tuple[str, str]]) -> None:
+        with self._lock:
+            new_file = not os.path.exists(self.path)
+            with open(self.path, "a", encoding="utf-8") as f:
+                if new_file:
+                    f.write(json.dumps({"query": self.query, "cap": self.cap}) + "\n")
+                f.write(json.dumps({"trashed": trashed, "failed": [fid for fid, _ in failed]}) + "\n")
+            self.trashed.update(trashed)
+
+    def remove(self) -> None:
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def _trash_query_stream(
+    args: argparse.Namespace, service: Any, *, final_q: Optional[str], scopes: List[str]
+) -> int:
+    """
+    Trash matches while the scan is still running.
+
+    Full batches of 100 IDs go to a worker thread as soon as they are scanned,
+    so total time approaches max(scan, trash) instead of scan + trash. Because
+    nothing is shown before trashing starts, this mode only runs with --apply
+    and a count confirmed by a prior dry run ("TRASH <n> FILES"), optionally
+    restricted to an approved ID set from `--ids-out`. It never trashes more
+    than the confirmed count (or --limit).
+    """
+    approved: Optional[set] = None
+    if args.approved_ids:
+        ids = load_file_ids(args.approved_ids)
+        if ids is None:
+            return 2
+        approved = set(ids)
+        m = re.fullmatch(r"TRASH (\d+) FILES", args.confirm or "")
+        if not m or int(m.group(1)) != len(approved):
+            eprint("Refusing to proceed without exact confirmation string.")
+            eprint(f"Provide: --confirm \"TRASH {len(approved)} FILES\"")
+            return 2
+    else:
+        m = re.fullmatch(r"TRASH (\d+) FILES", args.confirm or "")
+        if not m:
+            eprint("--stream trashes while scanning, so it needs the count from a dry run:")
+            eprint("run without --stream first, then pass its --confirm \"TRASH <n> FILES\".")
+            return 2
+    if not args.apply:
+        print("Dry-run only (no changes). Re-run with --apply to execute.")
+        return 0
 
-    # The heap contains the k largest files, sorted smallest to largest.
-    top_n_files = sorted([item[1] for item in top_n_heap], key=lambda x: x.size or -1, reverse=True)
+    cap = int(m.group(1))
+    if args.limit:
+        cap = min(cap, args.limit)
+    checkpoint = TrashCheckpoint(args.checkpoint, query=final_q, cap=cap)
+    if not checkpoint.load():
+        eprint(f"Checkpoint {args.checkpoint} belongs to a different query or count.")
+        eprint("Remove it or pass another --checkpoint path.")
+        return 2
+    if checkpoint.trashed:
+        print(f"Resuming: {len(checkpoint.trashed)} files already trashed by a previous run.")
 
-    print(f"Files scanned: {scanned_count}")
-    print(f"Total size (files with size): {human_bytes(total_size)} ({count_with_size} files)")
-    print("")
-    print(f"Top {len(top_n_files)} largest files:")
-    for f in top_n_files:
-        print(f"- {human_bytes(f.size)}  {f.name}  ({f.id})")
-        if args.show_links and f.webViewLink:
-            print(f"  link: {f.webViewLink}")
-    return 0
+    batches: "queue.Queue[Optional[List[str]]]" = queue.Queue(maxsize=16)
+    failed: List[Tuple[str, str]] = []
+    pbar = tqdm(total=cap, initial=len(checkpoint.trashed), desc="Trashing files", unit="files")
+
+    def _worker() -> None:
+        # googleapiclient services are not thread-safe; use a separate one.
+        # The worker must keep draining `batches` whatever goes wrong, or the
+        # scanner blocks forever on a full queue.
+        wservice: Any = None
+        setup_error: Optional[Exception] = None
+        try:
+            wservice = open_drive_service(args, scopes=scopes)
+        except Exception as ex:
+            setup_error = ex
+        while True:
+            chunk = batches.get()
+            if chunk is None:
+                return
+            if setup_error is not None:
+                chunk_failed = [(fid, f"could not open Drive service: {setup_error}") for fid in chunk]
+            else:
+                try:
+                    chunk_failed = trash_chunk(wservice, file_ids=chunk)
+                except Exception as ex:
+                    # HttpError, but also timeouts, dropped connections and
+                    # token refresh errors: fail this chunk so a re-run retries it.
+                    chunk_failed = [(fid, f"{type(ex).__name__}: {ex}") for fid in chunk]
+            bad = {fid for fid, _ in chunk_failed}
+            checkpoint.record([fid for fid in chunk if fid not in bad], chunk_failed)
+            failed.extend(chunk_failed)
+            pbar.update(len(chunk))
 
+    worker = threading.Thread(target=_worker, name="trash-worker", daemon=True)
+    worker.start()
 
-def _cmd_audit_export(args: argparse.Namespace, service: Any) -> int:
-    """Original audit implementation, used when exporting requires all files in memory."""
+    seen = set(checkpoint.trashed)
+    queued = len(seen)
+    skipped = 0
+    scan_error: Optional[HttpError] = None
+    pending: List[str] = []
+    try:
+        while queued < cap:
+            new_in_pass = 0
+            iterator = iter_files(
+                service,
+                q=final_q,
+                include_trashed=args.include_trashed,
+                page_size=args.page_size,
+                fields=TRASH_QUERY_FIELDS,
+            )
+            for f in iterator:
+                if f.id in seen:
+                    continue
+                seen.add(f.id)
+                if approved is not None and f.id not in approved:
+                    skipped += 1
+                    continue
+                new_in_pass += 1
+                pending.append(f.id)
+                queued += 1
+                if len(pending) == GOOGLE_API_BATCH_LIMIT:
+                    batches.put(pending)
+                    pending = []
+                if queued >= cap:
+                    break
+            if pending:
+                batches.put(pending)
+                pending = []
+            # Trashing while paginating can shift later pages, so rescan until
+            # a pass finds nothing new. Trashed items drop out of the query,
+            # which keeps follow-up passes small.
+            if new_in_pass == 0 or args.include_trashed:
+                break
+    except HttpError as ex:
+        scan_error = ex
+    finally:
+        batches.put(None)
+        worker.join()
+        pbar.close()
+
+    done = len(checkpoint.trashed)
+    print(f"Trashed: {done}/{cap} (confirmed count{' capped by --limit' if args.limit else ''})")
+    if skipped:
+        print(f"Skipped {skipped} matches not in --approved-ids.")
+    if scan_error is not None:
+        eprint("Drive API error:", scan_error)
+        eprint(f"Progress saved to {args.checkpoint}; re-run the same command to continue.")
+        return 2
+    if failed:
+        print("")
+        print("Failures:")
+        for fid, msg in failed[:25]:
+            print(f"- {fid}: {msg}")
+        if len(failed) > 25:
+            print(f"... and {len(failed) - 25} more")
+        print(f"Progress saved to {args.checkpoint}; re-run the same command to retry failures.")
+        return 3
+    if queued >= cap and approved is None and not args.limit:
+        print("Stopped at the confirmed count; run a new dry run to check for further matches.")
+    checkpoint.remove()
+    return 0
+
+
+# --- OPTIMIZATION: Sampled audit estimates ---
+# `audit --estimate` answers "roughly how much?" without reading every page.
+# The query's modifiedTime range is cut into equal-width strata; strata are
+# drawn at random and each drawn stratum is listed completely. Stratum totals
+# are a simple random sample of clusters, so the expansion estimator and its
+# variance give totals with confidence intervals. Sampling stops once the
+# interval is within the target error or the page budget is spent.
+ESTIMATE_RANGE_FIELDS = "files(modifiedTime)"
+ESTIMATE_FIELDS = ",".join(["nextPageToken", "files(id,size)"])
+ESTIMATE_SIZE_BUCKETS = [1 << 10, 1 << 20, 16 << 20, 256 << 20, 1 << 30]
+ESTIMATE_MIN_STRATA = 10
+ESTIMATE_Z = 1.96
+
+
+def _drive_time(ts: str) -> int:
+    """Seconds since the epoch for a Drive RFC 3339 timestamp."""
+    return int(dt.datetime.fromisoformat(ts.replace("Z", "+00:00")).timestamp())
+
+
+def _drive_time_literal(seconds: int) -> str:
+    """A UTC timestamp literal for Drive query comparisons."""
+    return dt.datetime.fromtimestamp(seconds, dt.timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def size_bucket(size: int) -> int:
+    """Index of the ESTIMATE_SIZE_BUCKETS range `size` falls in."""
+    for i, upper in enumerate(ESTIMATE_SIZE_BUCKETS):
+        if size < upper:
+            return i
+    return len(ESTIMATE_SIZE_BUCKETS)
+
+
+def size_bucket_labels() -> List[str]:
+    bounds = ESTIMATE_SIZE_BUCKETS
+    labels = [f"< {human_bytes(bounds[0])}"]
+    labels += [f"{human_bytes(lo)} - {human_bytes(hi)}" for lo, hi in zip(bounds, bounds[1:])]
+    labels.append(f">= {human_bytes(bounds[-1])}")
+    return labels
+
+
+def srs_total(values: List[float], population: int, *, z: float = ESTIMATE_Z) -> Tuple[float, float]:
+    """
+    Estimate a population total from a simple random sample (without
+    replacement) of `population` cluster totals.
+
+    Returns (estimate, confidence interval half-width). The half-width is 0
+    once every cluster is sampled and infinite with fewer than two samples.
+    """
+    m = len(values)
+    if m == 0:
+        return 0.0, math.inf
+    mean = sum(values) / m
+    estimate = population * mean
+    if m >= population:
+        return estimate, 0.0
+    if m < 2:
+        return estimate, math.inf
+    s2 = sum((v - mean) ** 2 for v in values) / (m - 1)
+    variance = population * population * (1 - m / population) * s2 / m
+    return estimate, z * math.sqrt(variance)
+
+
+@dataclass
+class UsageEstimate:
+    strata: int
+    sampled: int
+    pages: int
+    files: Tuple[float, float]
+    size: Tuple[float, float]
+    buckets: List[Tuple[str, Tuple[float, float], Tuple[float, float]]]
+    budget_hit: bool = False
+
+    @property
+    def exact(self) -> bool:
+        return self.sampled >= self.strata
+
+
+def _relative_error(est: Tuple[float, float]) -> float:
+    value, half_width = est
+    if half_width == 0:
+        return 0.0
+    return half_width / value if value > 0 else math.inf
+
+
+def _modified_time_range(service: Any, *, final_q: Optional[str]) -> Optional[Tuple[int, int]]:
+    """Oldest and newest modifiedTime matching `final_q` (two one-item listings)."""
+    bounds = []
+    for order in ("modifiedTime", "modifiedTime desc"):
+        resp = (
+            service.files()
+            .list(
+                q=final_q,
+                fields=ESTIMATE_RANGE_FIELDS,
+                pageSize=1,
+                orderBy=order,
+                supportsAllDrives=True,
+                includeItemsFromAllDrives=True,
+            )
+            .execute()
+        )
+        files = resp.get("files", [])
+        if not files or not files[0].get("modifiedTime"):
+            return None
+        bounds.append(_drive_time(files[0]["modifiedTime"]))
+    return bounds[0], bounds[1]
+
+
+class _PageBudgetSpent(Exception):
+    """Raised by estimate_usage's page counter when --estimate-max-pages is used up."""
+
+
+def estimate_usage(
+    service: Any,
+    *,
+    q: Optional[str],
+    include_trashed: bool,
+    page_size: int,
+    strata: int,
+    target_error: float,
+    max_pages: int,
+    rng: random.Random,
+) -> Optional[UsageEstimate]:
+    """
+    Estimate file count, total size and size distribution for `q` by sampling
+    modifiedTime strata. Returns None if nothing matches.
+
+    No more than `max_pages` list requests are made. A stratum still being
+    listed when the budget runs out is dropped, since a partial listing
+    would bias its total.
+    """
+    time_range = _modified_time_range(service, final_q=_final_query(q, include_trashed))
+    if time_range is None:
+        return None
+    start, end = time_range[0], time_range[1] + 1
+    width = max(1, -(-(end - start) // max(1, strata)))
+    n_strata = -(-(end - start) // width)
+    order = list(range(n_strata))
+    rng.shuffle(order)
+
+    # One row per sampled stratum: [files, bytes, bucket counts..., bucket bytes...].
+    n_buckets = len(ESTIMATE_SIZE_BUCKETS) + 1
+    samples: List[List[int]] = []
+    pages = 2
+    budget_hit = False
+
+    def _count_page(_: Optional[str]) -> None:
+        nonlocal pages
+        # Checked before each request, so one dense window cannot turn the
+        # estimate into a full scan.
+        if pages >= max_pages:
+            raise _PageBudgetSpent()
+        pages += 1
+
+    def _estimate() -> UsageEstimate:
+        cols = list(zip(*samples)) if samples else [()] * (2 + 2 * n_buckets)
+        totals = [srs_total(list(c), n_strata) for c in cols]
+        buckets = [
+            (label, totals[2 + i], totals[2 + n_buckets + i])
+            for i, label in enumerate(size_bucket_labels())
+        ]
+        return UsageEstimate(
+            strata=n_strata,
+            sampled=len(samples),
+            pages=pages,
+            files=totals[0],
+            size=totals[1],
+            buckets=buckets,
+            budget_hit=budget_hit,
+        )
+
+    bar = tqdm(total=n_strata, desc="Sampling strata", unit="strata")
+    for idx in order:
+        lo = start + idx * width
+        hi = min(end, lo + width)
+        stratum_q = and_query(
+            [
+                q,
+                f"modifiedTime >= '{_drive_time_literal(lo)}' and modifiedTime < '{_drive_time_literal(hi)}'",
+            ]
+        )
+        row = [0] * (2 + 2 * n_buckets)
+        try:
+            for f in iter_files(
+                service,
+                q=stratum_q,
+                include_trashed=include_trashed,
+                page_size=page_size,
+                fields=ESTIMATE_FIELDS,
+                on_page=_count_page,
+            ):
+                row[0] += 1
+                if f.size is not None:
+                    b = size_bucket(f.size)
+                    row[1] += f.size
+                    row[2 + b] += 1
+                    row[2 + n_buckets + b] += f.size
+        except _PageBudgetSpent:
+            budget_hit = True
+            break
+        samples.append(row)
+        bar.update(1)
+
+        if len(samples) < ESTIMATE_MIN_STRATA and len(samples) < n_strata:
+            continue
+        est = _estimate()
+        err = max(_relative_error(est.files), _relative_error(est.size))
+        bar.set_postfix(err=f"{err:.1%}" if math.isfinite(err) else "-", pages=pages)
+        if err <= target_error or pages >= max_pages:
+            break
+    bar.close()
+    return _estimate()
+
+
+def print_estimate(est: UsageEstimate) -> None:
+    def _count(x: Tuple[float, float]) -> str:
+        value, hw = x
+        if hw == 0:
+            return f"{value:,.0f}"
+        return f"~{value:,.0f} (95% CI {max(0.0, value - hw):,.0f} - {value + hw:,.0f})"
+
+    def _bytes(x: Tuple[float, float]) -> str:
+        value, hw = x
+        if hw == 0:
+            return human_bytes(int(value))
+        if not math.isfinite(hw):
+            return f"~{human_bytes(int(value))} (CI unavailable)"
+        return f"~{human_bytes(int(value))} (95% CI {human_bytes(int(max(0.0, value - hw)))} - {human_bytes(int(value + hw))})"
+
+    kind = "exact: every stratum listed" if est.exact else "estimate"
+    print(f"Sampled {est.sampled}/{est.strata} modifiedTime strata in {est.pages} pages ({kind})")
+    if est.budget_hit:
+        print("Page budget (--estimate-max-pages) spent; the stratum being listed was dropped.")
+    print(f"Files: {_count(est.files)}")
+    print(f"Total size (files with size): {_bytes(est.size)}")
+    print("")
+    print("Size distribution:")
+    for label, count, size in est.buckets:
+        print(f"- {label:<20} files: {_count(count)}  size: {_bytes(size)}")
+
+
+def _cmd_audit_estimate(args: argparse.Namespace, service: Any) -> int:
+    if args.csv or args.json or args.rollup or args.resume:
+        eprint("--estimate cannot be combined with --csv/--json/--rollup/--resume.")
+        return 2
+    try:
+        est = estimate_usage(
+            service,
+            q=args.query,
+            include_trashed=args.include_trashed,
+            page_size=args.page_size,
+            strata=args.estimate_strata,
+            target_error=args.estimate_error,
+            max_pages=args.estimate_max_pages,
+            rng=random.Random(args.estimate_seed),
+        )
+    except HttpError as ex:
+        eprint("Drive API error:", ex)
+        return 2
+    if est is None:
+        print("No files match.")
+        return 0
+    if est.sampled == 0:
+        eprint("No stratum could be listed within --estimate-max-pages.")
+        eprint("Raise the budget, or use more --estimate-strata so each stratum is smaller.")
+        return 2
+    print_estimate(est)
+    return 0
+
+
+def cmd_audit(args: argparse.Namespace) -> int:
+    scopes = SCOPES_READONLY
+    service = open_drive_service(args, scopes=scopes)
+    if args.estimate:
+        return _cmd_audit_estimate(args, service)
+
+    # --- OPTIMIZATION: Memory-efficient audit ---
+    # When not exporting to CSV/JSON, the audit can find the largest files
+    # without storing the entire file list in memory. This is critical for
+    # very large drives, as it reduces memory usage from O(N) to O(k), where N
+    # is the total number of files and k is the number of top files to show.
+    # A min-heap is used to keep track of the largest k files seen so far.
+    is_exporting = args.csv or args.json
+    if is_exporting:
+        if args.resume:
+            eprint("--resume is not supported with --csv/--json (the export needs every file).")
+            return 2
+        if args.all_drives:
+            eprint("--all-drives is not supported with --csv/--json.")
+            return 2
+        # Fallback to the original memory-intensive method when exporting.
+        return _cmd_audit_export(args, service)
+
+    totals = AuditTotals(top=args.top, rollup=args.rollup)
+    resolver = FolderPathResolver(service) if args.show_paths else None
+    # --- OPTIMIZATION: Minimal fields for audit scan ---
+    # When only displaying the top N files on the terminal, we don't need
+    # full metadata for every file. Requesting only essential fields
+    # significantly reduces the API payload and speeds up the scan.
+    fields = (
+        AUDIT_ROLLUP_FIELDS
+        if args.rollup
+        else TRASH_QUERY_PATH_FIELDS if args.show_paths else TRASH_QUERY_FIELDS
+    )
+    if args.all_drives:
+        return _cmd_audit_all_drives(args, service, scopes=scopes, fields=fields, resolver=resolver)
+
+    try:
+        ckpt, saved = open_scan_checkpoint(
+            args, fields=fields, options={"top": args.top, "rollup": args.rollup}, state_fn=totals.to_state
+        )
+    except ValueError as ex:
+        eprint(str(ex))
+        return 2
+    if saved:
+        totals.load_state(saved)
+
+    try:
+        iterator = iter_files(
+            service,
+            q=args.query,
+            include_trashed=args.include_trashed,
+            page_size=args.page_size,
+            fields=fields,
+            page_token=ckpt.page_token,
+            on_page=ckpt.on_page,
+        )
+        for f in tqdm(iterator, desc="Scanning files", unit="files", initial=totals.scanned):
+            totals.add(f)
+            if totals.rollup and resolver:
+                resolver.seed(f)
+    except SCAN_ERRORS as ex:
+        # The failed request was a page fetch, so the aggregates match the
+        # last page token and can be saved as-is.
+        ckpt.save()
+        eprint("Drive API error:", ex)
+        if ckpt.every_pages > 0:
+            eprint(f"Progress saved to {ckpt.path}; re-run with --resume to continue.")
+        return 2
+    ckpt.remove()
+
+    print_audit(args, totals, resolver=resolver)
+    return 0
+
+
+def print_audit(
+    args: argparse.Namespace,
+    totals: AuditTotals,
+    *,
+    resolver: Optional["FolderPathResolver"] = None,
+    drive_of: Optional[Dict[str, str]] = None,
+) -> None:
+    top_n_files = totals.top_files()
+    print(f"Files scanned: {totals.scanned}")
+    print(f"Total size (files with size): {human_bytes(totals.total_size)} ({totals.count_with_size} files)")
+    print("")
+    if resolver:
+        resolver.resolve_files(top_n_files)
+    print(f"Top {len(top_n_files)} largest files:")
+    for f in top_n_files:
+        drive = f"  [{drive_of[f.id]}]" if drive_of else ""
+        print(f"- {human_bytes(f.size)}  {f.name}  ({f.id}){drive}")
+        if resolver:
+            print(f"  path: {resolver.path_of(f)}")
+        if args.show_links and f.webViewLink:
+            print(f"  link: {f.webViewLink}")
+    if totals.rollup:
+        print_rollup(totals.rollup, top=args.rollup_top, resolver=resolver)
+
+
+def _cmd_audit_all_drives(
+    args: argparse.Namespace,
+    service: Any,
+    *,
+    scopes: List[str],
+    fields: str,
+    resolver: Optional["FolderPathResolver"],
+) -> int:
+    """Audit My Drive and each shared drive in parallel; report per drive and merged."""
+    if args.resume:
+        eprint("--resume is not supported with --all-drives.")
+        return 2
+
+    def _scan(wservice: Any, drive: DriveScope) -> AuditTotals:
+        totals = AuditTotals(top=args.top, rollup=args.rollup)
+        for f in iter_files(
+            wservice,
+            q=args.query,
+            include_trashed=args.include_trashed,
+            page_size=args.page_size,
+            fields=fields,
+            drive_id=drive.id,
+        ):
+            totals.add(f)
+        return totals
+
+    try:
+        drives = list_drives(service)
+        per_drive = scan_drives(args, scopes=scopes, drives=drives, scan=_scan)
+    except HttpError as ex:
+        eprint("Drive API error:", ex)
+        return 2
+
+    merged = AuditTotals(top=args.top, rollup=args.rollup)
+    drive_of: Dict[str, str] = {}
+    print(f"Drives scanned: {len(drives)}")
+    for drive, totals in zip(drives, per_drive):
+        print(f"- {drive.name}: {totals.scanned} files, {human_bytes(totals.total_size)}  ({drive.id})")
+        drive_of.update((fid, drive.name) for _, fid, _ in totals.heap)
+        merged.merge(totals)
+    print("")
+    print_audit(args, merged, resolver=resolver, drive_of=drive_of)
+    return 0
+
+
+def _cmd_audit_export(args: argparse.Namespace, service: Any) -> int:
+    """Original audit implementation, used when exporting requires all files in memory."""
     files: List[DriveFile] = []
     total_size = 0
     count_with_size = 0
+    rollup = UsageRollup() if args.rollup else None
+    resolver = FolderPathResolver(service) if args.show_paths else None
     try:
         iterator = iter_files(
             service,
@@ -515,6 +1909,10 @@ def _cmd_audit_export(args: argparse.Namespace, service: Any) -> int:
         )
         for f in tqdm(iterator, desc="Scanning files for export", unit="files"):
             files.append(f)
+            if rollup:
+                rollup.add(f)
+            if resolver:
+                resolver.seed(f)
             if f.size is not None:
                 total_size += f.size
                 count_with_size += 1
@@ -528,14 +1926,24 @@ def _cmd_audit_export(args: argparse.Namespace, service: Any) -> int:
     print(f"Files scanned: {len(files)}")
     print(f"Total size (files with size): {human_bytes(total_size)} ({count_with_size} files)")
     print("")
+    paths: Optional[Dict[str, str]] = None
+    if resolver:
+        # Folders seen in the listing are already seeded, so this only fetches
+        # ancestors outside the scanned set (e.g. when --query narrows it).
+        resolver.resolve_files(files)
+        paths = {f.id: resolver.path_of(f) for f in files}
     print(f"Top {len(top_n)} largest files:")
     for f in top_n:
         print(f"- {human_bytes(f.size)}  {f.name}  ({f.id})")
+        if paths:
+            print(f"  path: {paths[f.id]}")
         if args.show_links and f.webViewLink:
             print(f"  link: {f.webViewLink}")
+    if rollup:
+        print_rollup(rollup, top=args.rollup_top, resolver=resolver)
 
     if args.csv:
-        write_csv(args.csv, files_sorted)
+        write_csv(args.csv, files_sorted, paths=paths)
         print("")
         print(f"Wrote CSV: {args.csv}")
     if args.json:
@@ -545,7 +1953,10 @@ def _cmd_audit_export(args: argparse.Namespace, service: Any) -> int:
             "includeTrashed": args.include_trashed,
             "fileCount": len(files),
             "totalSizeBytes": total_size,
-            "files": [f.__dict__ for f in files_sorted],
+            "files": [
+                dict(f.__dict__, path=paths[f.id]) if paths else f.__dict__
+                for f in files_sorted
+            ],
         }
         write_json(args.json, payload)
         print("")
@@ -555,37 +1966,88 @@ def _cmd_audit_export(args: argparse.Namespace, service: Any) -> int:
 
 def cmd_duplicates(args: argparse.Namespace) -> int:
     scopes = SCOPES_READONLY
-    creds = load_credentials(
-        credentials_path=args.credentials,
-        token_path=args.token,
-        scopes=scopes,
-    )
-    service = drive_service(creds=creds)
+    service = open_drive_service(args, scopes=scopes)
 
     # --- OPTIMIZATION: Two-pass strategy for finding duplicates ---
     # Pass 1: Fetch minimal fields to find duplicate md5Checksums.
     # This pass is memory-efficient and minimizes API response size.
     eprint("Pass 1: Finding duplicate checksums...")
-    by_hash: Dict[str, List[str]] = defaultdict(list)
+    index = ChecksumIndex()
     scanned = 0
-    try:
-        iterator = iter_files(
-            service,
-            q=args.query,
-            include_trashed=args.include_trashed,
-            page_size=args.page_size,
-            fields=DUPLICATES_PASS1_FIELDS,
-        )
-        for f in tqdm(iterator, desc="Scanning checksums", unit="files"):
-            scanned += 1
-            if f.md5Checksum:
-                by_hash[f.md5Checksum].append(f.id)
-    except HttpError as ex:
-        eprint("Drive API error (pass 1):", ex)
-        return 2
+    drives: Optional[List[DriveScope]] = None
+
+    if args.all_drives:
+        if args.resume:
+            eprint("--resume is not supported with --all-drives.")
+            return 2
+
+        def _scan(wservice: Any, drive: DriveScope) -> Tuple[ChecksumIndex, int]:
+            drive_index = ChecksumIndex()
+            n = 0
+            for f in iter_files(
+                wservice,
+                q=args.query,
+                include_trashed=args.include_trashed,
+                page_size=args.page_size,
+                fields=DUPLICATES_PASS1_FIELDS,
+                drive_id=drive.id,
+            ):
+                n += 1
+                if f.md5Checksum:
+                    drive_index.add(f.id, f.md5Checksum, f.size)
+            return drive_index, n
+
+        try:
+            drives = list_drives(service)
+            per_drive = scan_drives(args, scopes=scopes, drives=drives, scan=_scan)
+        except HttpError as ex:
+            eprint("Drive API error (pass 1):", ex)
+            return 2
+        # One merged index, so duplicates are found across drives too.
+        for drive, (drive_index, n) in zip(drives, per_drive):
+            eprint(f"- {drive.name}: {n} files scanned")
+            index.extend(drive_index)
+            scanned += n
+    else:
+
+        def _state() -> Dict[str, Any]:
+            return {"index": index.to_state(), "scanned": scanned}
+
+        try:
+            ckpt, saved = open_scan_checkpoint(
+                args, fields=DUPLICATES_PASS1_FIELDS, options={}, state_fn=_state
+            )
+        except ValueError as ex:
+            eprint(str(ex))
+            return 2
+        if saved:
+            index = ChecksumIndex.from_state(saved["index"])
+            scanned = saved["scanned"]
 
-    # Filter for checksums with 2 or more files.
-    dup_checksums = {k: v for k, v in by_hash.items() if len(v) >= 2}
+        try:
+            iterator = iter_files(
+                service,
+                q=args.query,
+                include_trashed=args.include_trashed,
+                page_size=args.page_size,
+                fields=DUPLICATES_PASS1_FIELDS,
+                page_token=ckpt.page_token,
+                on_page=ckpt.on_page,
+            )
+            for f in tqdm(iterator, desc="Scanning checksums", unit="files", initial=scanned):
+                scanned += 1
+                if f.md5Checksum:
+                    index.add(f.id, f.md5Checksum, f.size)
+        except SCAN_ERRORS as ex:
+            ckpt.save()
+            eprint("Drive API error (pass 1):", ex)
+            if ckpt.every_pages > 0:
+                eprint(f"Progress saved to {ckpt.path}; re-run with --resume to continue.")
+            return 2
+        ckpt.remove()
+
+    # Only checksums with 2 or more files become full objects.
+    dup_checksums = index.duplicate_groups()
     if not dup_checksums:
         print("No duplicate files found.")
         return 0
@@ -610,8 +2072,16 @@ def cmd_duplicates(args: argparse.Namespace) -> int:
         reverse=True,
     )
 
+    resolver = None
+    if args.show_paths:
+        resolver = FolderPathResolver(service)
+        resolver.resolve_files(f for g in dup_groups for f in g)
+
     print(f"Files scanned: {scanned}")
     print(f"Duplicate groups found (md5Checksum): {len(dup_groups)}")
+    if drives is not None:
+        cross = sum(1 for g in dup_groups if len({x.driveId for x in g}) > 1)
+        print(f"Groups spanning more than one drive: {cross}")
     print("")
 
     plan: Dict[str, Any] = {
@@ -627,14 +2097,21 @@ def cmd_duplicates(args: argparse.Namespace) -> int:
         group = {
             "md5Checksum": g[0].md5Checksum,
             "totalSizeBytes": total,
-            "files": [x.__dict__ for x in sorted(g, key=lambda x: (x.modifiedTime or ""))],
+            "files": [
+                dict(x.__dict__, path=resolver.path_of(x)) if resolver else x.__dict__
+                for x in sorted(g, key=lambda x: (x.modifiedTime or ""))
+            ],
         }
+        if drives is not None:
+            group["drives"] = sorted({drive_label(drives, x.driveId) for x in g})
         plan["groups"].append(group)
 
         if shown < args.show:
-            print(f"md5={g[0].md5Checksum}  total={human_bytes(total)}  count={len(g)}")
+            where = f"  drives={', '.join(group['drives'])}" if drives is not None else ""
+            print(f"md5={g[0].md5Checksum}  total={human_bytes(total)}  count={len(g)}{where}")
             for x in sorted(g, key=lambda x: (x.size or -1), reverse=True)[: args.show_per_group]:
-                print(f"  - {human_bytes(x.size)}  {x.name}  ({x.id})")
+                label = resolver.path_of(x) if resolver else x.name
+                print(f"  - {human_bytes(x.size)}  {label}  ({x.id})")
             print("")
             shown += 1
 
@@ -645,28 +2122,105 @@ def cmd_duplicates(args: argparse.Namespace) -> int:
     return 0
 
 
-def cmd_trash(args: argparse.Namespace) -> int:
-    # This command modifies Drive, so it uses the broader scope.
-    scopes = SCOPES_TRASH
-    creds = load_credentials(
-        credentials_path=args.credentials,
-        token_path=args.token,
-        scopes=scopes,
-    )
-    service = drive_service(creds=creds)
+def cmd_duplicate_folders(args: argparse.Namespace) -> int:
+    scopes = SCOPES_READONLY
+    service = open_drive_service(args, scopes=scopes)
+
+    scanned = 0
+    resolver = FolderPathResolver(service) if args.show_paths else None
 
-    if not os.path.exists(args.ids_json):
-        eprint(f"Missing ids JSON: {args.ids_json}")
+    def _counted(it: Iterable[DriveFile]) -> Iterable[DriveFile]:
+        nonlocal scanned
+        for f in it:
+            scanned += 1
+            if resolver:
+                resolver.seed(f)
+            yield f
+
+    try:
+        iterator = iter_files(
+            service,
+            q=args.query,
+            include_trashed=args.include_trashed,
+            page_size=args.page_size,
+            fields=FOLDER_TREE_FIELDS,
+        )
+        groups = find_duplicate_folders(
+            _counted(tqdm(iterator, desc="Scanning folder tree", unit="files"))
+        )
+    except HttpError as ex:
+        eprint("Drive API error:", ex)
         return 2
-    with open(args.ids_json, "r", encoding="utf-8") as f:
+
+    print(f"Items scanned: {scanned}")
+    print(f"Duplicate folder trees found: {len(groups)}")
+    print("")
+    if not groups:
+        return 0
+    if resolver:
+        resolver.resolve(n.id for g in groups for n in g)
+
+    def _label(n: FolderNode) -> str:
+        return resolver.folder_path(n.id) if resolver else n.name
+
+    plan: Dict[str, Any] = {
+        "generatedAt": dt.datetime.now(dt.timezone.utc).isoformat(),
+        "kind": "gdrive-folder-duplicates",
+        "note": "Review carefully. Each group lists folders with identical contents.",
+        "groups": [],
+    }
+    for i, g in enumerate(groups):
+        head = g[0]
+        plan["groups"].append(
+            {
+                "treeHash": head.digest.hex(),
+                "folderSizeBytes": head.size,
+                "fileCount": head.file_count,
+                "reclaimableBytes": head.size * (len(g) - 1),
+                "folders": [
+                    {"id": n.id, "name": n.name, "parent": n.parent, "path": _label(n)}
+                    for n in g
+                ],
+            }
+        )
+        if i < args.show:
+            print(
+                f"tree={head.digest.hex()[:16]}  size={human_bytes(head.size)}  "
+                f"files={head.file_count}  copies={len(g)}"
+            )
+            for n in g:
+                print(f"  - {_label(n)}  ({n.id})")
+            print("")
+
+    if args.plan_json:
+        write_json(args.plan_json, plan)
+        print(f"Wrote plan JSON: {args.plan_json}")
+    return 0
+
+
+def load_file_ids(path: str) -> Optional[List[str]]:
+    """Load and de-duplicate {"fileIds": [...]}; prints an error and returns None if invalid."""
+    if not os.path.exists(path):
+        eprint(f"Missing ids JSON: {path}")
+        return None
+    with open(path, "r", encoding="utf-8") as f:
         payload = json.load(f)
 
-    file_ids = payload.get("fileIds")
+    file_ids = payload.get("fileIds") if isinstance(payload, dict) else None
     if not isinstance(file_ids, list) or not all(isinstance(x, str) for x in file_ids):
         eprint("ids JSON must look like: {\"fileIds\": [\"<id>\", ...]}")
-        return 2
+        return None
+    return list(dict.fromkeys(file_ids))  # de-dupe, keep order
+
+
+def cmd_trash(args: argparse.Namespace) -> int:
+    # This command modifies Drive, so it uses the broader scope.
+    scopes = SCOPES_TRASH
+    service = open_drive_service(args, scopes=scopes)
 
-    file_ids = list(dict.fromkeys(file_ids))  # de-dupe, keep order
+    file_ids = load_file_ids(args.ids_json)
+    if file_ids is None:
+        return 2
     n = len(file_ids)
     if n == 0:
         print("No file IDs provided; nothing to do.")
@@ -699,6 +2253,478 @@ def cmd_trash(args: argparse.Namespace) -> int:
     return 0
 
 
+# --- OPTIMIZATION: Folder-tree listing by level ---
+# A backup folder is listed breadth-first: each request asks for the children
+# of up to PARENTS_PER_QUERY folders at once ('a' in parents or 'b' in ...),
+# so a tree of F folders needs about F / PARENTS_PER_QUERY listings instead of
+# one per folder, with only the fields needed to compare content.
+PARENTS_PER_QUERY = 40
+
+
+def iter_folder_tree(
+    service: Any,
+    *,
+    root_id: str,
+    page_size: int,
+    fields: str = FOLDER_TREE_FIELDS,
+) -> Iterable[Tuple[str, DriveFile]]:
+    """
+    Yield (relative path, item) for everything below `root_id`, level by level.
+
+    Paths use "/" separators; folders are yielded before their contents.
+    Trashed items are skipped.
+    """
+    level: Dict[str, str] = {root_id: ""}
+    while level:
+        next_level: Dict[str, str] = {}
+        ids = list(level)
+        for i in range(0, len(ids), PARENTS_PER_QUERY):
+            chunk = ids[i : i + PARENTS_PER_QUERY]
+            q = " or ".join(f"{drive_single_quote(fid)} in parents" for fid in chunk)
+            for f in iter_files(service, q=q, include_trashed=False, page_size=page_size, fields=fields):
+                parent = next((p for p in f.parents if p in level), None)
+                if parent is None:
+                    continue
+                rel = f"{level[parent]}/{f.name}" if level[parent] else f.name
+                if f.mimeType == FOLDER_MIME_TYPE:
+                    next_level[f.id] = rel
+                yield rel, f
+        level = next_level
+
+
+def _local_tree(root: str, *, exclude: Optional[str] = None) -> Dict[str, Tuple[str, os.stat_result]]:
+    """{relative path: (absolute path, stat)} for regular files under `root`."""
+    out: Dict[str, Tuple[str, os.stat_result]] = {}
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            if exclude and os.path.abspath(path) == exclude:
+                continue
+            st = os.stat(path)
+            rel = os.path.relpath(path, root).replace(os.sep, "/")
+            out[rel] = (os.path.abspath(path), st)
+    return out
+
+
+def cmd_verify_backup(args: argparse.Namespace) -> int:
+    scopes = SCOPES_READONLY
+    if not os.path.isdir(args.local):
+        eprint(f"Local directory not found: {args.local}")
+        return 2
+    service = open_drive_service(args, scopes=scopes)
+
+    cache_path = os.path.abspath(args.hash_cache)
+    local = _local_tree(args.local, exclude=cache_path)
+
+    remote: Dict[str, DriveFile] = {}
+    native = 0
+    try:
+        for rel, f in tqdm(
+            iter_folder_tree(service, root_id=args.folder_id, page_size=args.page_size),
+            desc="Listing Drive folder",
+            unit="items",
+        ):
+            if f.mimeType == FOLDER_MIME_TYPE:
+                continue
+            if f.md5Checksum is None:
+                # Google Docs/Sheets etc. have no binary content to compare.
+                native += 1
+                continue
+            remote.setdefault(rel, f)
+    except HttpError as ex:
+        eprint("Drive API error:", ex)
+        return 2
+
+    missing = sorted(rel for rel in local if rel not in remote)
+    extra = sorted(rel for rel in remote if rel not in local)
+    # Only files present on both sides with equal sizes need a hash; a size
+    # mismatch already means the file changed.
+    changed = [rel for rel in local if rel in remote and remote[rel].size != local[rel][1].st_size]
+    candidates = [rel for rel in local if rel in remote and remote[rel].size == local[rel][1].st_size]
+
+    cache = HashCache(cache_path).load()
+    pbar = tqdm(
+        total=sum(local[rel][1].st_size for rel in candidates),
+        desc="Hashing local files",
+        unit="B",
+        unit_scale=True,
+    )
+    try:
+        digests, hashed = hash_files_parallel(
+            (local[rel] for rel in candidates),
+            cache=cache,
+            workers=args.hash_workers,
+            on_hashed=pbar.update,
+        )
+    finally:
+        pbar.close()
+        root_prefix = os.path.join(os.path.abspath(args.local), "")
+        cache.retain(root_prefix, (path for path, _ in local.values()))
+        cache.save()
+    changed += [rel for rel in candidates if digests[local[rel][0]] != remote[rel].md5Checksum]
+    changed.sort()
+    ok = sum(1 for rel in candidates if digests[local[rel][0]] == remote[rel].md5Checksum)
+
+    size_of = {path: st.st_size for path, st in local.values()}
+    hashed_bytes = sum(size_of[path] for path in hashed)
+    ignored = f" (+{native} Google-native, ignored)" if native else ""
+    print(f"Local files: {len(local)}  Drive files: {len(remote)}{ignored}")
+    print(f"Hashed: {len(hashed)} files ({human_bytes(hashed_bytes)}); cache hits: {len(candidates) - len(hashed)}")
+    print(f"OK: {ok}")
+    print(f"Missing on Drive: {len(missing)}")
+    print(f"Changed: {len(changed)}")
+    print(f"Extra on Drive: {len(extra)}")
+    for title, rels in (("Missing on Drive", missing), ("Changed", changed), ("Extra on Drive", extra)):
+        if rels and args.show:
+            print("")
+            print(f"{title} (showing {min(args.show, len(rels))}/{len(rels)}):")
+            for rel in rels[: args.show]:
+                print(f"- {rel}")
+
+    if args.json:
+        write_json(
+            args.json,
+            {
+                "generatedAt": dt.datetime.now(dt.timezone.utc).isoformat(),
+                "local": os.path.abspath(args.local),
+                "folderId": args.folder_id,
+                "ok": ok,
+                "missing": missing,
+                "changed": [
+                    {
+                        "path": rel,
+                        "localSize": local[rel][1].st_size,
+                        "driveSize": remote[rel].size,
+                        "localMd5": digests.get(local[rel][0]),
+                        "driveMd5": remote[rel].md5Checksum,
+                        "fileId": remote[rel].id,
+                    }
+                    for rel in changed
+                ],
+                "extra": [{"path": rel, "fileId": remote[rel].id} for rel in extra],
+            },
+        )
+        print("")
+        print(f"Wrote JSON: {args.json}")
+    return 1 if missing or changed else 0
+
+
+# --- OPTIMIZATION: Parallel, resumable uploads ---
+# `upload` mirrors a local directory into a Drive folder:
+#   - files whose size and md5 already match remotely are skipped (md5s come
+#     from the shared hash cache, so unchanged files are not re-hashed);
+#   - missing folders are created level by level with batch requests;
+#   - small files go up as single multipart requests, large ones through
+#     resumable sessions, on a pool of workers (one service per thread);
+#   - resumable session URIs are saved as soon as they exist, so a rerun
+#     after a crash asks Drive how much it received and continues from there.
+UPLOAD_RESULT_FIELDS = "id,size,md5Checksum"
+UPLOAD_RETRIES = 3
+
+
+class UploadSessions:
+    """Resumable upload session URIs, persisted (atomically) for crash recovery."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def load(self) -> "UploadSessions":
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+        return self
+
+    def get(self, rel: str, st: os.stat_result, target: str) -> Optional[str]:
+        """The saved session URI, if the local file and target are unchanged."""
+        with self._lock:
+            e = self.entries.get(rel)
+        if e and e["size"] == st.st_size and e["mtimeNs"] == st.st_mtime_ns and e["target"] == target:
+            return e["uri"]
+        return None
+
+    def put(self, rel: str, st: os.stat_result, target: str, uri: str) -> None:
+        with self._lock:
+            self.entries[rel] = {"uri": uri, "size": st.st_size, "mtimeNs": st.st_mtime_ns, "target": target}
+            write_json_atomic(self.path, self.entries)
+
+    def drop(self, rel: str) -> None:
+        with self._lock:
+            if self.entries.pop(rel, None) is None:
+                return
+            if self.entries:
+                write_json_atomic(self.path, self.entries)
+            elif os.path.exists(self.path):
+                os.remove(self.path)
+
+
+def _resumable_status(request: Any, uri: str, size: int) -> Tuple[Optional[int], Optional[Dict[str, Any]]]:
+    """
+    Ask Drive how much of a resumable session it has (empty PUT with
+    `Content-Range: bytes */size`). Returns (bytes received, None), or
+    (size, file resource) if the upload already completed, or (None, None)
+    if the session is gone.
+    """
+    resp, content = request.http.request(
+        uri, "PUT", headers={"Content-Length": "0", "Content-Range": f"bytes */{size}"}
+    )
+    status = int(resp.status)
+    if status in (200, 201):
+        return size, json.loads(content)
+    if status == 308:
+        received = resp.get("range")
+        return (int(received.rsplit("-", 1)[1]) + 1 if received else 0), None
+    return None, None
+
+
+def upload_file(
+    service: Any,
+    *,
+    path: str,
+    rel: str,
+    st: os.stat_result,
+    parent_id: str,
+    file_id: Optional[str],
+    resumable: bool,
+    chunk_size: int,
+    sessions: UploadSessions,
+    on_progress: Callable[[int], None],
+) -> Dict[str, Any]:
+    """Upload one file (new, or new content for `file_id`); returns the file resource."""
+    mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    media = MediaFileUpload(path, mimetype=mimetype, chunksize=chunk_size, resumable=resumable)
+    if file_id:
+        request = service.files().update(
+            fileId=file_id, media_body=media, fields=UPLOAD_RESULT_FIELDS, supportsAllDrives=True
+        )
+    else:
+        request = service.files().create(
+            body={"name": os.path.basename(path), "parents": [parent_id]},
+            media_body=media,
+            fields=UPLOAD_RESULT_FIELDS,
+            supportsAllDrives=True,
+        )
+    if not resumable:
+        resp = request.execute(num_retries=UPLOAD_RETRIES)
+        on_progress(st.st_size)
+        return resp
+
+    target = file_id or parent_id
+    uri = sessions.get(rel, st, target)
+    if uri:
+        received, done = _resumable_status(request, uri, st.st_size)
+        if done is not None:
+            sessions.drop(rel)
+            on_progress(st.st_size)
+            return done
+        if received is not None:
+            request.resumable_uri = uri
+            request.resumable_progress = received
+            on_progress(received)
+
+    sent = request.resumable_progress
+    resp = None
+    while resp is None:
+        status, resp = request.next_chunk(num_retries=UPLOAD_RETRIES)
+        if request.resumable_uri != uri:
+            uri = request.resumable_uri
+            sessions.put(rel, st, target, uri)
+        progress = status.resumable_progress if status else st.st_size
+        on_progress(progress - sent)
+        sent = progress
+    sessions.drop(rel)
+    return resp
+
+
+def create_folders_batch(service: Any, *, folders: List[Tuple[str, str, str]]) -> Dict[str, str]:
+    """
+    Create folders given as (key, name, parent ID) with batch requests.
+
+    Returns {key: new folder ID}; raises the first HttpError.
+    """
+    created: Dict[str, str] = {}
+    errors: List[HttpError] = []
+
+    def _callback(request_id: str, response: Any, exception: Any) -> None:
+        if exception is not None:
+            errors.append(exception)
+        else:
+            created[request_id] = response["id"]
+
+    for i in range(0, len(folders), GOOGLE_API_BATCH_LIMIT):
+        batch = service.new_batch_http_request(callback=_callback)
+        for key, name, parent_id in folders[i : i + GOOGLE_API_BATCH_LIMIT]:
+            batch.add(
+                service.files().create(
+                    body={"name": name, "mimeType": FOLDER_MIME_TYPE, "parents": [parent_id]},
+                    fields="id",
+                    supportsAllDrives=True,
+                ),
+                request_id=key,
+            )
+        batch.execute()
+        if errors:
+            raise errors[0]
+    return created
+
+
+def cmd_upload(args: argparse.Namespace) -> int:
+    # This command modifies Drive, so it uses the broader scope.
+    scopes = SCOPES_TRASH
+    if not os.path.isdir(args.local):
+        eprint(f"Local directory not found: {args.local}")
+        return 2
+    if args.chunk_mb <= 0:
+        eprint("--chunk-mb must be a positive whole number of MB.")
+        return 2
+    chunk_size = args.chunk_mb * 1024 * 1024
+    service = open_drive_service(args, scopes=scopes)
+
+    cache_path = os.path.abspath(args.hash_cache)
+    sessions_path = os.path.abspath(args.sessions)
+    local = {
+        rel: v
+        for rel, v in _local_tree(args.local, exclude=cache_path).items()
+        if v[0] != sessions_path
+    }
+
+    folder_ids: Dict[str, str] = {"": args.folder_id}
+    remote: Dict[str, DriveFile] = {}
+    try:
+        for rel, f in tqdm(
+            iter_folder_tree(service, root_id=args.folder_id, page_size=args.page_size),
+            desc="Listing Drive folder",
+            unit="items",
+        ):
+            if f.mimeType == FOLDER_MIME_TYPE:
+                folder_ids.setdefault(rel, f.id)
+            else:
+                remote.setdefault(rel, f)
+    except HttpError as ex:
+        eprint("Drive API error:", ex)
+        return 2
+
+    # Same size remotely: compare md5 (cached) before deciding to upload.
+    same_size = [
+        rel for rel, (_, st) in local.items() if rel in remote and remote[rel].size == st.st_size
+    ]
+    cache = HashCache(cache_path).load()
+    digests, _ = hash_files_parallel(
+        (local[rel] for rel in same_size), cache=cache, workers=args.hash_workers
+    )
+    cache.save()
+    up_to_date = {rel for rel in same_size if digests[local[rel][0]] == remote[rel].md5Checksum}
+    todo = sorted(rel for rel in local if rel not in up_to_date)
+    new = [rel for rel in todo if rel not in remote]
+    changed = [rel for rel in todo if rel in remote]
+
+    def _parent(rel: str) -> str:
+        return rel.rsplit("/", 1)[0] if "/" in rel else ""
+
+    missing_dirs = set()
+    for rel in todo:
+        d = _parent(rel)
+        while d and d not in folder_ids:
+            missing_dirs.add(d)
+            d = _parent(d)
+
+    todo_bytes = sum(local[rel][1].st_size for rel in todo)
+    print(f"Local files: {len(local)}  Up to date on Drive: {len(up_to_date)}")
+    print(f"To upload: {len(new)} new, {len(changed)} changed ({human_bytes(todo_bytes)})")
+    print(f"Folders to create: {len(missing_dirs)}")
+    for rel in todo[: args.show]:
+        print(f"- {'update' if rel in remote else 'new'}  {human_bytes(local[rel][1].st_size)}  {rel}")
+    if len(todo) > args.show:
+        print(f"... and {len(todo) - args.show} more")
+    if not todo:
+        return 0
+    if not args.apply:
+        print("")
+        print("Dry-run only (no changes). Re-run with --apply to upload.")
+        return 0
+
+    try:
+        # Parents first: one batch round per directory depth.
+        by_depth: Dict[int, List[str]] = defaultdict(list)
+        for d in missing_dirs:
+            by_depth[d.count("/")].append(d)
+        for depth in sorted(by_depth):
+            level = sorted(by_depth[depth])
+            created = create_folders_batch(
+                service,
+                folders=[(d, d.rsplit("/", 1)[-1], folder_ids[_parent(d)]) for d in level],
+            )
+            folder_ids.update(created)
+    except HttpError as ex:
+        eprint("Drive API error (creating folders):", ex)
+        return 2
+
+    sessions = UploadSessions(sessions_path).load()
+    if sessions.entries:
+        print(f"Found {len(sessions.entries)} interrupted upload session(s); resuming them.")
+    local_thread = threading.local()
+    open_lock = threading.Lock()
+    pbar = tqdm(total=todo_bytes, desc="Uploading", unit="B", unit_scale=True)
+    pbar_lock = threading.Lock()
+
+    def _progress(n: int) -> None:
+        with pbar_lock:
+            pbar.update(n)
+
+    def _upload(rel: str) -> Tuple[str, Optional[str]]:
+        path, st = local[rel]
+        try:
+            wservice = getattr(local_thread, "service", None)
+            if wservice is None:
+                with open_lock:
+                    wservice = local_thread.service = open_drive_service(args, scopes=scopes)
+            resp = upload_file(
+                wservice,
+                path=path,
+                rel=rel,
+                st=st,
+                parent_id=folder_ids[_parent(rel)],
+                file_id=remote[rel].id if rel in remote else None,
+                resumable=st.st_size >= args.resumable_mb * 1024 * 1024,
+                chunk_size=chunk_size,
+                sessions=sessions,
+                on_progress=_progress,
+            )
+        except Exception as ex:
+            # HttpError and OSError, but also httplib2 transport errors and
+            # token refresh failures: fail this file, keep the run going so
+            # the report and saved sessions are still written.
+            return rel, f"{type(ex).__name__}: {ex}"
+        if int(resp.get("size", -1)) != st.st_size:
+            return rel, f"size mismatch after upload ({resp.get('size')} != {st.st_size})"
+        return rel, None
+
+    failed: List[Tuple[str, str]] = []
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+            # Largest first keeps the pool busy until the end.
+            order = sorted(todo, key=lambda rel: local[rel][1].st_size, reverse=True)
+            for rel, err in pool.map(_upload, order):
+                if err:
+                    failed.append((rel, err))
+    finally:
+        pbar.close()
+
+    print(f"Uploaded: {len(todo) - len(failed)}/{len(todo)}")
+    if failed:
+        print("")
+        print("Failures:")
+        for rel, msg in failed[:25]:
+            print(f"- {rel}: {msg}")
+        if len(failed) > 25:
+            print(f"... and {len(failed) - 25} more")
+        if sessions.entries:
+            print(f"Resumable sessions saved to {sessions_path}; re-run the same command to continue.")
+        return 3
+    return 0
+
+
 def build_parser() -> argparse.ArgumentParser:
     p = argparse.ArgumentParser(
         prog="gdrive_cleanup.py",
@@ -713,26 +2739,127 @@ def build_parser() -> argparse.ArgumentParser:
     )
     p.add_argument("--query", default=None, help="Drive API query (q=...) to filter files")
     p.add_argument("--page-size", type=int, default=1000, help="API page size (max 1000)")
+    p.add_argument(
+        "--all-drives",
+        action="store_true",
+        help="Scan My Drive and each shared drive separately, in parallel, and report per drive "
+        "(audit, duplicates, trash-query)",
+    )
+    p.add_argument(
+        "--drive-workers",
+        type=int,
+        default=4,
+        help="Drives scanned concurrently with --all-drives (default: 4)",
+    )
 
     sub = p.add_subparsers(dest="cmd", required=True)
 
     a = sub.add_parser("audit", help="Scan files and report largest items")
     a.add_argument("--top", type=int, default=25, help="How many largest files to show")
     a.add_argument("--show-links", action="store_true", help="Print webViewLink for shown items")
+    a.add_argument(
+        "--show-paths",
+        action="store_true",
+        help="Resolve and print full folder paths (ancestors fetched once, in batches)",
+    )
     a.add_argument("--csv", default=None, help="Write full file list as CSV")
     a.add_argument("--json", default=None, help="Write full file list as JSON")
+    a.add_argument(
+        "--rollup",
+        action="store_true",
+        help="Also report size/count by owner, by mimeType and recursively by folder",
+    )
+    a.add_argument("--rollup-top", type=int, default=10, help="Rows to print per rollup")
+    a.add_argument(
+        "--checkpoint",
+        default="gdrive-audit.checkpoint.json",
+        help="Where scan progress is saved periodically (removed when the scan completes)",
+    )
+    a.add_argument(
+        "--checkpoint-every",
+        type=int,
+        default=10,
+        help="Save progress every N pages (0 = never)",
+    )
+    a.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted scan from its checkpoint",
+    )
+    a.add_argument(
+        "--estimate",
+        action="store_true",
+        help="Estimate totals and size distribution by sampling modifiedTime strata instead of a full scan",
+    )
+    a.add_argument(
+        "--estimate-error",
+        type=float,
+        default=0.05,
+        help="Stop sampling once the 95%% CI is within this relative error (default: 0.05)",
+    )
+    a.add_argument(
+        "--estimate-max-pages",
+        type=int,
+        default=100,
+        help="Page budget for --estimate (sampling stops when it is spent)",
+    )
+    a.add_argument(
+        "--estimate-strata",
+        type=int,
+        default=1000,
+        help="Number of equal-width modifiedTime strata for --estimate",
+    )
+    a.add_argument("--estimate-seed", type=int, default=None, help="Random seed for --estimate")
     a.set_defaults(func=cmd_audit)
 
     d = sub.add_parser("duplicates", help="Find duplicate binary files using md5Checksum")
     d.add_argument("--show", type=int, default=10, help="How many duplicate groups to print")
     d.add_argument("--show-per-group", type=int, default=5, help="Items per group to print")
+    d.add_argument(
+        "--show-paths",
+        action="store_true",
+        help="Resolve and print full folder paths (ancestors fetched once, in batches)",
+    )
     d.add_argument(
         "--plan-json",
         default=f"gdrive-plan-{now_stamp()}.json",
         help="Write duplicate groups JSON for review (default: timestamped file)",
     )
+    d.add_argument(
+        "--checkpoint",
+        default="gdrive-duplicates.checkpoint.json",
+        help="Where scan progress is saved periodically (removed when the scan completes)",
+    )
+    d.add_argument(
+        "--checkpoint-every",
+        type=int,
+        default=10,
+        help="Save progress every N pages (0 = never)",
+    )
+    d.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted scan from its checkpoint",
+    )
     d.set_defaults(func=cmd_duplicates)
 
+    df = sub.add_parser(
+        "duplicate-folders",
+        help="Find identical folder trees (Merkle hash of names and md5s) from a single listing",
+    )
+    df.add_argument("--show", type=int, default=10, help="How many duplicate folder groups to print")
+    df.add_argument(
+        "--show-paths",
+        action="store_true",
+        help="Resolve and print full folder paths (ancestors fetched once, in batches)",
+    )
+    df.add_argument(
+        "--plan-json",
+        default=f"gdrive-folder-plan-{now_stamp()}.json",
+        help="Write duplicate folder groups JSON for review (default: timestamped file)",
+    )
+    df.set_defaults(func=cmd_duplicate_folders)
+
     t = sub.add_parser(
         "trash",
         help="Move specific file IDs to trash (requires --apply and a confirmation string). Uses batch requests for performance.",
@@ -764,6 +2891,11 @@ def build_parser() -> argparse.ArgumentParser:
     )
     tq.add_argument("--show", type=int, default=25, help="How many matched files to print")
     tq.add_argument("--show-links", action="store_true", help="Print webViewLink for shown items")
+    tq.add_argument(
+        "--show-paths",
+        action="store_true",
+        help="Resolve and print full folder paths (ancestors fetched once, in batches)",
+    )
     tq.add_argument(
         "--ids-out",
         default=None,
@@ -775,8 +2907,73 @@ def build_parser() -> argparse.ArgumentParser:
         default=None,
         help="Must exactly match: TRASH <n> FILES (printed by the dry-run step)",
     )
+    tq.add_argument(
+        "--stream",
+        action="store_true",
+        help="Trash in batches while still scanning (needs --apply and the count confirmed by a dry run)",
+    )
+    tq.add_argument(
+        "--approved-ids",
+        default=None,
+        help="With --stream: only trash IDs listed in this JSON (e.g. the dry run's --ids-out)",
+    )
+    tq.add_argument(
+        "--checkpoint",
+        default="trash-query.checkpoint.jsonl",
+        help="With --stream: progress log used to continue an interrupted run",
+    )
     tq.set_defaults(func=cmd_trash_query)
 
+    vb = sub.add_parser(
+        "verify-backup",
+        help="Compare a local directory with a Drive folder by md5 (missing, changed, extra files)",
+    )
+    vb.add_argument("--local", required=True, help="Local directory, e.g. trading_data/archive")
+    vb.add_argument("--folder-id", required=True, help="Drive folder ID holding the backup")
+    vb.add_argument(
+        "--hash-cache",
+        default="gdrive-hash-cache.json",
+        help="Local md5 cache keyed by size and mtime; unchanged files are never re-hashed",
+    )
+    vb.add_argument(
+        "--hash-workers",
+        type=int,
+        default=0,
+        help="Threads hashing local files (default: CPU count)",
+    )
+    vb.add_argument("--show", type=int, default=25, help="How many paths to print per category")
+    vb.add_argument("--json", default=None, help="Write the full report as JSON")
+    vb.set_defaults(func=cmd_verify_backup)
+
+    up = sub.add_parser(
+        "upload",
+        help="Mirror a local directory into a Drive folder (parallel, resumable; dry-run by default)",
+    )
+    up.add_argument("--local", required=True, help="Local directory to upload, e.g. trading_data/archive")
+    up.add_argument("--folder-id", required=True, help="Destination Drive folder ID")
+    up.add_argument("--apply", action="store_true", help="Actually upload (default: print the plan)")
+    up.add_argument("--workers", type=int, default=8, help="Concurrent uploads (default: 8)")
+    up.add_argument(
+        "--resumable-mb",
+        type=int,
+        default=8,
+        help="Files at least this large use resumable sessions; smaller ones one multipart request",
+    )
+    up.add_argument("--chunk-mb", type=int, default=16, help="Resumable upload chunk size in MB")
+    up.add_argument(
+        "--sessions",
+        default="gdrive-upload.sessions.json",
+        help="Where resumable session URIs are saved for crash recovery",
+    )
+    up.add_argument(
+        "--hash-cache",
+        default="gdrive-hash-cache.json",
+        help="Local md5 cache keyed by size and mtime (shared with verify-backup)",
+    )
+    up.add_argument("--hash-workers", type=int, default=0, help="Threads hashing local files (default: CPU count)")
+    up.add_argument("--show", type=int, default=25, help="How many planned uploads to print")
+    up.set_defaults(func=cmd_upload)
+
     return p
 
 
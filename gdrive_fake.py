@@ -0,0 +1,645 @@
+#!/usr/bin/env python3
+"""
+Offline stand-in for the Google Drive v3 service used by gdrive_cleanup.py.
+
+It implements the small subset of the googleapiclient surface the cleanup
+commands touch (files.list/get/create/update with multipart and resumable
+media uploads, drives.list and batch requests) on top of an
+in-memory corpus, so commands can be exercised and benchmarked without a
+Google account or network.
+
+Corpus sources:
+  - synthetic_corpus(): generated folders/files with a tunable duplicate ratio
+  - load_corpus(): recorded items (JSON list, {"files": [...]}, or JSONL)
+
+Injected behaviour:
+  - latency_ms / jitter_ms: sleep per HTTP request (a batch is one request)
+  - error_rate: probability of a 500 backendError per call
+  - max_qps: token-bucket quota; calls over it fail with 429 rateLimitExceeded
+
+Use it by setting `args.service` before calling a command (see
+gdrive_cleanup.open_drive_service), or via gdrive_bench.py.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import httplib2
+from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaUploadProgress
+
+from gdrive_cleanup import FOLDER_MIME_TYPE
+
+
+def _http_error(status: int, reason: str) -> HttpError:
+    resp = httplib2.Response({"status": status})
+    resp.reason = reason
+    body = json.dumps({"error": {"code": status, "message": reason, "errors": [{"reason": reason}]}})
+    return HttpError(resp, body.encode("utf-8"))
+
+
+# --- Query evaluation ---
+# Supports the subset of Drive query syntax the cleanup tool generates:
+# and/or/parentheses, trashed, mimeType, name contains, 'id' in parents and
+# modifiedTime/createdTime comparisons. Anything else is rejected with 400,
+# like Drive does for invalid queries, so benchmarks never silently diverge.
+
+_ATOM_RE = re.compile(
+    r"""^\s*(?:
+        (?P<field>trashed|mimeType|name|modifiedTime|createdTime)\s*
+        (?P<op>=|!=|<=|>=|<|>|contains)\s*
+        (?P<value>'(?:[^'\\]|\\.)*'|true|false)
+      |
+        (?P<parent>'(?:[^'\\]|\\.)*')\s+in\s+parents
+    )\s*$""",
+    re.VERBOSE,
+)
+
+
+def _unquote(v: str) -> str:
+    if v.startswith("'"):
+        return re.sub(r"\\(.)", r"\1", v[1:-1])
+    return v
+
+
+def _split_top(q: str, word: str) -> List[str]:
+    parts: List[str] = []
+    depth = 0
+    in_str = False
+    start = 0
+    i = 0
+    token = f" {word} "
+    while i < len(q):
+        c = q[i]
+        if in_str:
+            if c == "\\":
+                i += 2
+                continue
+            if c == "'":
+                in_str = False
+        elif c == "'":
+            in_str = True
+        elif c == "(":
+            depth += 1
+        elif c == ")":
+            depth -= 1
+        elif depth == 0 and q.startswith(token, i):
+            parts.append(q[start:i])
+            i += len(token)
+            start = i
+            continue
+        i += 1
+    parts.append(q[start:])
+    return parts
+
+
+def _strip_parens(q: str) -> str:
+    q = q.strip()
+    while q.startswith("(") and q.endswith(")"):
+        depth = 0
+        for i, c in enumerate(q):
+            depth += c == "("
+            depth -= c == ")"
+            if depth == 0 and i < len(q) - 1:
+                return q
+        q = q[1:-1].strip()
+    return q
+
+
+def compile_query(q: Optional[str]) -> Callable[[Dict[str, Any]], bool]:
+    """Compile a Drive query string into a predicate over item dicts."""
+    if not q or not q.strip():
+        return lambda item: True
+    q = _strip_parens(q)
+    ors = _split_top(q, "or")
+    if len(ors) > 1:
+        preds = [compile_query(p) for p in ors]
+        return lambda item: any(p(item) for p in preds)
+    ands = _split_top(q, "and")
+    if len(ands) > 1:
+        preds = [compile_query(p) for p in ands]
+        return lambda item: all(p(item) for p in preds)
+
+    m = _ATOM_RE.match(q)
+    if not m:
+        raise _http_error(400, f"invalid query: {q}")
+    if m.group("parent"):
+        parent = _unquote(m.group("parent"))
+        return lambda item: parent in (item.get("parents") or ())
+    field, op, value = m.group("field"), m.group("op"), _unquote(m.group("value"))
+    if field == "trashed":
+        want = value == "true"
+        if op == "=":
+            return lambda item: bool(item.get("trashed", False)) == want
+        return lambda item: bool(item.get("trashed", False)) != want
+    if op == "contains":
+        needle = value.lower()
+        return lambda item: needle in str(item.get(field, "")).lower()
+    ops: Dict[str, Callable[[Any, Any], bool]] = {
+        "=": lambda a, b: a == b,
+        "!=": lambda a, b: a != b,
+        "<": lambda a, b: a < b,
+        "<=": lambda a, b: a <= b,
+        ">": lambda a, b: a > b,
+        ">=": lambda a, b: a >= b,
+    }
+    cmp = ops[op]
+    return lambda item: cmp(str(item.get(field, "")), value)
+
+
+def _top_fields(fields: Optional[str]) -> Optional[Set[str]]:
+    """Top-level item field names in a partial-response mask ('files(...)' or plain)."""
+    if not fields:
+        return None
+    m = re.search(r"files\((.*)\)", fields)
+    inner = m.group(1) if m else fields
+    names: Set[str] = set()
+    depth = 0
+    cur = ""
+    for c in inner + ",":
+        if c == "(":
+            depth += 1
+        elif c == ")":
+            depth -= 1
+        elif c == "," and depth == 0:
+            names.add(cur.strip())
+            cur = ""
+            continue
+        if depth == 0 and c not in "()":
+            cur += c
+    return {n for n in names if n}
+
+
+def _project(item: Dict[str, Any], names: Optional[Set[str]]) -> Dict[str, Any]:
+    if names is None:
+        return dict(item)
+    return {k: v for k, v in item.items() if k in names}
+
+
+class _Request:
+    def __init__(self, service: "FakeDriveService", kind: str, fn: Callable[[], Any]) -> None:
+        self._service = service
+        self.kind = kind
+        self._fn = fn
+
+    def execute(self, num_retries: int = 0) -> Any:
+        self._service._http_request()
+        self._service._count(self.kind)
+        self._service._maybe_fail()
+        return self._fn()
+
+
+class _Batch:
+    def __init__(self, service: "FakeDriveService", callback: Callable[[str, Any, Any], None]) -> None:
+        self._service = service
+        self._callback = callback
+        self._requests: List[Tuple[_Request, str]] = []
+
+    def add(self, request: _Request, request_id: Optional[str] = None, callback: Any = None) -> None:
+        self._requests.append((request, request_id or str(len(self._requests) + 1)))
+
+    def execute(self) -> None:
+        self._service._http_request()
+        self._service._count("batch")
+        self._service._maybe_fail()
+        for req, req_id in self._requests:
+            self._service._count(req.kind)
+            try:
+                self._service._maybe_fail()
+                resp, exc = req._fn(), None
+            except HttpError as ex:
+                resp, exc = None, ex
+            self._callback(req_id, resp, exc)
+
+
+class _UploadHttp:
+    """The `request.http` of a media request: answers resumable status probes."""
+
+    def __init__(self, service: "FakeDriveService") -> None:
+        self._s = service
+
+    def request(self, uri: str, method: str = "GET", body: Any = None, headers: Any = None) -> Tuple[Any, bytes]:
+        self._s._http_request()
+        self._s._count("upload.status")
+        return self._s._upload_status(uri)
+
+
+class _MediaRequest:
+    """files.create/update with a media body (multipart or resumable)."""
+
+    def __init__(
+        self,
+        service: "FakeDriveService",
+        kind: str,
+        *,
+        file_id: Optional[str],
+        body: Dict[str, Any],
+        media: Any,
+        fields: Optional[str],
+    ) -> None:
+        self._s = service
+        self.kind = kind
+        self._file_id = file_id
+        self._body = body
+        self._media = media
+        self._fields = fields
+        self.http = _UploadHttp(service)
+        self.resumable_uri: Optional[str] = None
+        self.resumable_progress = 0
+
+    def execute(self, num_retries: int = 0) -> Any:
+        """Multipart upload: metadata and content in one request."""
+        self._s._http_request()
+        self._s._count(self.kind)
+        self._s._maybe_fail()
+        data = self._media.getbytes(0, self._media.size())
+        return self._s._store_upload(self._file_id, self._body, data, self._fields)
+
+    def next_chunk(self, http: Any = None, num_retries: int = 0) -> Tuple[Any, Any]:
+        """Resumable upload: start a session on first call, then send one chunk."""
+        size = self._media.size()
+        if self.resumable_uri is None:
+            self._s._http_request()
+            self._s._count(self.kind)
+            self._s._maybe_fail()
+            self.resumable_uri = self._s._start_session(self._file_id, self._body, size, self._fields)
+        data = self._media.getbytes(self.resumable_progress, self._media.chunksize())
+        self._s._http_request()
+        self._s._count("upload.chunk")
+        self._s._maybe_fail()
+        resp = self._s._append_chunk(self.resumable_uri, self.resumable_progress, data)
+        self.resumable_progress += len(data)
+        if resp is not None:
+            return None, resp
+        return MediaUploadProgress(self.resumable_progress, size), None
+
+
+class _Files:
+    def __init__(self, service: "FakeDriveService") -> None:
+        self._s = service
+
+    def list(self, **kw: Any) -> _Request:
+        return _Request(self._s, "files.list", lambda: self._s._list(**kw))
+
+    def get(self, *, fileId: str, fields: Optional[str] = None, **_: Any) -> _Request:
+        return _Request(self._s, "files.get", lambda: self._s._get(fileId, fields))
+
+    def create(
+        self,
+        *,
+        body: Dict[str, Any],
+        media_body: Any = None,
+        fields: Optional[str] = None,
+        **_: Any,
+    ) -> Any:
+        if media_body is None:
+            return _Request(self._s, "files.create", lambda: self._s._store_upload(None, body, None, fields))
+        return _MediaRequest(self._s, "files.create", file_id=None, body=body, media=media_body, fields=fields)
+
+    def update(
+        self,
+        *,
+        fileId: str,
+        body: Optional[Dict[str, Any]] = None,
+        media_body: Any = None,
+        fields: Optional[str] = None,
+        **_: Any,
+    ) -> Any:
+        if media_body is None:
+            return _Request(self._s, "files.update", lambda: self._s._update(fileId, body or {}))
+        return _MediaRequest(self._s, "files.update", file_id=fileId, body=body or {}, media=media_body, fields=fields)
+
+
+class _Drives:
+    def __init__(self, service: "FakeDriveService") -> None:
+        self._s = service
+
+    def list(self, **kw: Any) -> _Request:
+        return _Request(self._s, "drives.list", lambda: self._s._list_drives(**kw))
+
+
+class FakeDriveService:
+    """In-memory Drive v3 stand-in with injectable latency, errors and quota."""
+
+    def __init__(
+        self,
+        items: Iterable[Dict[str, Any]],
+        *,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        max_qps: float = 0.0,
+        seed: int = 0,
+        drives: Optional[Iterable[Dict[str, Any]]] = None,
+    ) -> None:
+        self._items: Dict[str, Dict[str, Any]] = {}
+        for it in items:
+            self._items[it["id"]] = dict(it)
+        self._order: List[str] = list(self._items)
+        # Shared drives: given explicitly, or one per distinct item driveId.
+        if drives is None:
+            drive_ids = sorted({it["driveId"] for it in self._items.values() if it.get("driveId")})
+            drives = [{"id": d, "name": d} for d in drive_ids]
+        self._drives: List[Dict[str, Any]] = [dict(d) for d in drives]
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.max_qps = max_qps
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._results: Dict[Tuple[Any, ...], List[str]] = {}
+        self._sessions: Dict[str, Dict[str, Any]] = {}
+        self._ids = itertools.count(1)
+        self._tokens = max_qps
+        self._last_refill = time.monotonic()
+        self.calls: Counter = Counter()
+
+    # --- googleapiclient surface ---
+
+    def files(self) -> _Files:
+        return _Files(self)
+
+    def drives(self) -> _Drives:
+        return _Drives(self)
+
+    def new_batch_http_request(self, callback: Callable[[str, Any, Any], None]) -> _Batch:
+        return _Batch(self, callback)
+
+    # --- instrumentation ---
+
+    @property
+    def http_requests(self) -> int:
+        return self.calls["http"]
+
+    def _count(self, kind: str) -> None:
+        with self._lock:
+            self.calls[kind] += 1
+
+    def _http_request(self) -> None:
+        with self._lock:
+            self.calls["http"] += 1
+            delay = self.latency_ms + (self._rng.random() * self.jitter_ms if self.jitter_ms else 0)
+            throttled = False
+            if self.max_qps > 0:
+                now = time.monotonic()
+                self._tokens = min(self.max_qps, self._tokens + (now - self._last_refill) * self.max_qps)
+                self._last_refill = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                else:
+                    throttled = True
+                    self.calls["throttled"] += 1
+        if delay:
+            time.sleep(delay / 1000.0)
+        if throttled:
+            raise _http_error(429, "rateLimitExceeded")
+
+    def _maybe_fail(self) -> None:
+        if self.error_rate <= 0:
+            return
+        with self._lock:
+            fail = self._rng.random() < self.error_rate
+            if fail:
+                self.calls["errors"] += 1
+        if fail:
+            raise _http_error(500, "backendError")
+
+    # --- operations ---
+
+    def _matching(self, q: Optional[str], order_by: Optional[str], scope: Tuple[Any, ...]) -> List[str]:
+        key = (q, order_by, scope)
+        with self._lock:
+            cached = self._results.get(key)
+        if cached is not None:
+            return cached
+        pred = compile_query(q)
+        drive_id, include_all = scope
+        ids = []
+        for fid in self._order:
+            item = self._items[fid]
+            item_drive = item.get("driveId")
+            if drive_id is not None and item_drive != drive_id:
+                continue
+            if drive_id is None and not include_all and item_drive:
+                continue
+            if pred(item):
+                ids.append(fid)
+        if order_by:
+            field, _, direction = order_by.partition(" ")
+            ids.sort(key=lambda i: str(self._items[i].get(field, "")), reverse=direction == "desc")
+        with self._lock:
+            self._results[key] = ids
+        return ids
+
+    def _list(
+        self,
+        *,
+        q: Optional[str] = None,
+        fields: Optional[str] = None,
+        pageSize: int = 100,
+        pageToken: Optional[str] = None,
+        orderBy: Optional[str] = None,
+        driveId: Optional[str] = None,
+        includeItemsFromAllDrives: bool = False,
+        **_: Any,
+    ) -> Dict[str, Any]:
+        ids = self._matching(q, orderBy, (driveId, includeItemsFromAllDrives))
+        start = int(pageToken) if pageToken else 0
+        end = min(start + max(1, min(int(pageSize), 1000)), len(ids))
+        names = _top_fields(fields)
+        with self._lock:
+            page = [_project(self._items[i], names) for i in ids[start:end]]
+        resp: Dict[str, Any] = {"files": page}
+        if end < len(ids):
+            resp["nextPageToken"] = str(end)
+        return resp
+
+    def _list_drives(self, *, pageSize: int = 10, pageToken: Optional[str] = None, **_: Any) -> Dict[str, Any]:
+        start = int(pageToken) if pageToken else 0
+        end = min(start + max(1, min(int(pageSize), 100)), len(self._drives))
+        resp: Dict[str, Any] = {"drives": [dict(d) for d in self._drives[start:end]]}
+        if end < len(self._drives):
+            resp["nextPageToken"] = str(end)
+        return resp
+
+    def _get(self, file_id: str, fields: Optional[str]) -> Dict[str, Any]:
+        with self._lock:
+            item = self._items.get(file_id)
+            if item is None:
+                raise _http_error(404, "notFound")
+            return _project(item, _top_fields(fields))
+
+    def _store_upload(
+        self,
+        file_id: Optional[str],
+        body: Dict[str, Any],
+        data: Optional[bytes],
+        fields: Optional[str],
+    ) -> Dict[str, Any]:
+        """Create a file (or folder) or replace an existing file's content."""
+        now = time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime())
+        with self._lock:
+            if file_id is None:
+                file_id = f"new{next(self._ids):08d}"
+                item = {"id": file_id, "trashed": False, "createdTime": now, "mimeType": "application/octet-stream"}
+                self._items[file_id] = item
+                self._order.append(file_id)
+            else:
+                item = self._items.get(file_id)
+                if item is None:
+                    raise _http_error(404, "notFound")
+            item.update(body)
+            item["modifiedTime"] = now
+            if data is not None:
+                item["size"] = str(len(data))
+                item["md5Checksum"] = hashlib.md5(data).hexdigest()
+            self._results.clear()
+            return _project(item, _top_fields(fields))
+
+    def _start_session(self, file_id: Optional[str], body: Dict[str, Any], size: int, fields: Optional[str]) -> str:
+        with self._lock:
+            uri = f"https://fake.upload/session/{next(self._ids)}"
+            self._sessions[uri] = {"fileId": file_id, "body": body, "size": size, "fields": fields, "data": bytearray()}
+        return uri
+
+    def _append_chunk(self, uri: str, offset: int, data: bytes) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            session = self._sessions.get(uri)
+            if session is None or "response" in session:
+                raise _http_error(404, "notFound")
+            if offset != len(session["data"]):
+                raise _http_error(400, "badContentRange")
+            session["data"] += data
+            if len(session["data"]) < session["size"]:
+                return None
+        resp = self._store_upload(session["fileId"], session["body"], bytes(session["data"]), session["fields"])
+        with self._lock:
+            # Completed sessions answer status probes with the file resource.
+            session["response"] = resp
+            session["data"] = bytearray()
+        return resp
+
+    def _upload_status(self, uri: str) -> Tuple[Any, bytes]:
+        """Answer a `Content-Range: bytes */size` probe like Drive (308 + Range)."""
+        with self._lock:
+            session = self._sessions.get(uri)
+            if session is None:
+                return httplib2.Response({"status": 404}), b""
+            if "response" in session:
+                return httplib2.Response({"status": 200}), json.dumps(session["response"]).encode("utf-8")
+            received = len(session["data"])
+        headers: Dict[str, Any] = {"status": 308}
+        if received:
+            headers["range"] = f"bytes=0-{received - 1}"
+        return httplib2.Response(headers), b""
+
+    def _update(self, file_id: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            item = self._items.get(file_id)
+            if item is None:
+                raise _http_error(404, "notFound")
+            item.update(body)
+            # Cached result sets may now be stale (e.g. trashed = false).
+            self._results.clear()
+            return {"id": file_id}
+
+
+def synthetic_corpus(
+    n_files: int,
+    *,
+    files_per_folder: int = 50,
+    dup_ratio: float = 0.1,
+    seed: int = 0,
+    shared_drives: int = 0,
+) -> List[Dict[str, Any]]:
+    """
+    Generate a folder tree with `n_files` files.
+
+    Roughly `dup_ratio` of the files reuse an earlier file's content (same md5
+    and size). Folders form a shallow tree (fan-out 10) under "root". With
+    `shared_drives`, the top-level subtrees are spread round-robin over My
+    Drive and shared drives "drive0", "drive1", ... (items carry `driveId`).
+    """
+    rng = random.Random(seed)
+    items: List[Dict[str, Any]] = []
+    n_folders = max(1, n_files // max(1, files_per_folder))
+    folder_ids: List[str] = []
+    drive_of: Dict[str, Optional[str]] = {}
+    for i in range(n_folders):
+        fid = f"fold{i:08d}"
+        if i < 10:
+            slot = i % (shared_drives + 1)
+            drive = f"drive{slot - 1}" if slot else None
+            parent = drive or "root"
+        else:
+            parent = folder_ids[rng.randrange(0, min(i, max(1, i // 2)))]
+            drive = drive_of[parent]
+        drive_of[fid] = drive
+        folder = {
+            "id": fid,
+            "name": f"folder-{i}",
+            "mimeType": FOLDER_MIME_TYPE,
+            "parents": [parent],
+            "owners": [{"emailAddress": "owner@example.com"}],
+            "createdTime": "2020-01-01T00:00:00.000Z",
+            "modifiedTime": "2020-01-01T00:00:00.000Z",
+            "trashed": False,
+        }
+        if drive:
+            folder["driveId"] = drive
+        items.append(folder)
+        folder_ids.append(fid)
+
+    mimes = ["text/csv", "application/zip", "application/octet-stream", "image/png"]
+    owners = ["trader@example.com", "backup@example.com", "ops@example.com"]
+    contents: List[Tuple[str, int]] = []
+    base_ts = 1_577_836_800  # 2020-01-01
+    for i in range(n_files):
+        if contents and rng.random() < dup_ratio:
+            md5, size = contents[rng.randrange(len(contents))]
+        else:
+            md5 = hashlib.md5(f"content-{seed}-{i}".encode()).hexdigest()
+            size = int(rng.lognormvariate(11, 2.5))
+            contents.append((md5, size))
+        ts = time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime(base_ts + rng.randrange(0, 6 * 365 * 86400)))
+        fid = f"file{i:09d}"
+        parent = folder_ids[rng.randrange(n_folders)]
+        item = {
+            "id": fid,
+            "name": f"file-{i}.dat",
+            "mimeType": mimes[i % len(mimes)],
+            "size": str(size),
+            "md5Checksum": md5,
+            "parents": [parent],
+            "owners": [{"emailAddress": owners[i % len(owners)]}],
+            "createdTime": ts,
+            "modifiedTime": ts,
+            "trashed": False,
+            "webViewLink": f"https://drive.google.com/file/d/{fid}/view",
+        }
+        if drive_of[parent]:
+            item["driveId"] = drive_of[parent]
+        items.append(item)
+    return items
+
+
+def load_corpus(path: Path) -> List[Dict[str, Any]]:
+    """Load recorded items from a JSON list, a {"files": [...]} object, or JSONL."""
+    text = path.read_text(encoding="utf-8")
+    try:
+        payload = json.loads(text)
+    except json.JSONDecodeError:
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    if isinstance(payload, dict):
+        payload = payload.get("files", [])
+    return list(payload)
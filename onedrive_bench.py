@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Offline throughput benchmark for dropbox_to_onedrive.py.
+
+Builds a synthetic Dropbox share (a ZIP of many small files plus a few
+large ones), serves it and a fake Graph API from onedrive_fake.py, and runs
+the import once per combination of worker count and chunk size, from the
+ZIP or (--source dropbox-api) file by file through the Dropbox API. Each run
+is a separate process, so its peak RSS is its own. Reports MB/s, HTTP
+requests per file and peak RSS, so --parallel, --chunk-mb and
+--memory-mb defaults can be chosen from data without cloud accounts.
+
+Examples:
+  python onedrive_bench.py
+  python onedrive_bench.py --workers 1,4,8,16 --chunk-mb 5,10,20,60 --latency-ms 40
+  python onedrive_bench.py --bandwidth-mbps 200 --throttle-rate 0.02 --stream-zip --json bench.json
+  python onedrive_bench.py --source dropbox-api --bandwidth-mbps 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None  # type: ignore[assignment]
+
+from common_utils import eprint, write_json
+from onedrive_fake import FakeGraphServer
+
+BENCH_FOLDER = "Bench"
+
+
+def build_zip(path: Path, *, small_files: int, small_kb: int, large_files: int, large_mb: int, seed: int) -> int:
+    """Write a synthetic share as a ZIP (stored; random content does not compress). Returns the file count."""
+    rng = random.Random(seed)
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_STORED) as zf:
+        for i in range(small_files):
+            size = rng.randint(1, max(1, small_kb) * 2048)
+            zf.writestr(f"share/docs/{i % 20}/file{i}.bin", rng.randbytes(size))
+        for i in range(large_files):
+            with zf.open(f"share/media/large{i}.bin", "w", force_zip64=True) as f:
+                left = large_mb * 1024 * 1024
+                while left > 0:
+                    n = min(left, 4 * 1024 * 1024)
+                    f.write(rng.randbytes(n))
+                    left -= n
+    return small_files + large_files
+
+
+def _peak_rss_mb() -> Optional[float]:
+    # On Linux, ru_maxrss survives exec, so a child started from this (large)
+    # parent would report the parent's peak; VmHWM belongs to the child alone.
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, other Unixes KiB.
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def cmd_worker(args: argparse.Namespace) -> int:
+    """One import against the fake endpoints; prints its measurements as JSON."""
+    import dropbox_to_onedrive as d2o
+
+    result: Dict[str, Any] = {}
+    with tempfile.TemporaryDirectory(prefix="onedrive_bench_") as tmp:
+        zip_path = Path(tmp) / "share.zip"
+        reader: Optional[d2o.ZipReader] = None
+        fetch = None
+        with contextlib.redirect_stdout(sys.stderr):
+            t0 = time.perf_counter()
+            if args.source == "dropbox-api":
+                # Only the listing happens up front; files are downloaded
+                # during the upload stage, overlapped with it.
+                dbx = d2o.DropboxClient(
+                    "bench",
+                    shared_url=args.dropbox_url,
+                    pool_size=args.download_workers,
+                    api_url=args.dropbox_api_url,
+                    content_url=args.dropbox_api_url,
+                )
+                files, _ = d2o.list_shared_folder(dbx, workers=args.download_workers)
+                t1 = time.perf_counter()
+                spool_dir = Path(tmp) / "spool"
+                spool_dir.mkdir()
+                fetch = d2o.dropbox_fetcher(dbx, spool_dir)
+            else:
+                d2o.download_to_file(args.dropbox_url, dest_path=zip_path, workers=args.download_workers)
+                t1 = time.perf_counter()
+                if args.stream_zip:
+                    with zipfile.ZipFile(zip_path) as zf:
+                        files, _ = d2o.iter_zip_members(zf)
+                    reader = d2o.ZipReader(zip_path)
+                else:
+                    extract_dir = Path(tmp) / "extracted"
+                    extract_dir.mkdir()
+                    d2o.extract_zip_parallel(zip_path, extract_dir, workers=args.extract_workers)
+                    files = list(d2o.iter_files_with_size(d2o.pick_extracted_root(extract_dir)))
+
+            chunk_size = max(327_680, (args.chunk_mb * 1024 * 1024 // 327_680) * 327_680)
+            client = d2o.GraphClient(
+                d2o.GraphAuth(access_token="bench"),
+                governor=d2o.GraphGovernor(args.parallel),
+                buffers=d2o.ChunkBufferPool(
+                    max(chunk_size, d2o.SIMPLE_UPLOAD_MAX), budget_bytes=args.memory_mb * 1024 * 1024
+                ),
+                base_url=args.graph_url,
+            )
+            children_cache: Dict[str, Dict[str, str]] = {}
+            t2 = time.perf_counter()
+            try:
+                dest_folder_id = d2o.get_or_create_folder(
+                    client, parent_id="root", name=BENCH_FOLDER, children_cache=children_cache
+                )
+                uploaded = d2o.upload_files(
+                    client,
+                    files,
+                    onedrive_folder=BENCH_FOLDER,
+                    dest_folder_id=dest_folder_id,
+                    children_cache=children_cache,
+                    folder_id_cache={},
+                    chunk_size=chunk_size,
+                    workers=args.parallel,
+                    reader=reader,
+                    fetch=fetch,
+                    fetch_workers=args.download_workers,
+                )
+            finally:
+                if reader is not None:
+                    reader.close()
+            t3 = time.perf_counter()
+
+        upload_bytes = sum(size for _, _, size in files)
+        result = {
+            "files": uploaded,
+            "bytes": upload_bytes,
+            "downloadSeconds": round(t1 - t0, 3),
+            "uploadSeconds": round(t3 - t2, 3),
+            "totalSeconds": round(t3 - t0, 3),
+            "uploadMBps": round(upload_bytes / (1024 * 1024) / max(t3 - t2, 1e-9), 1),
+            "peakRssMB": _peak_rss_mb(),
+            "throttled": client.governor.throttled,
+        }
+    print(json.dumps(result))
+    return 0
+
+
+def bench_one(
+    server: FakeGraphServer, *, workers: int, chunk_mb: int, args: argparse.Namespace, n_files: int
+) -> Dict[str, Any]:
+    server.reset()
+    argv = [
+        sys.executable,
+        os.path.abspath(__file__),
+        "worker",
+        "--graph-url", server.graph_url,
+        "--dropbox-url", server.dropbox_url,
+        "--dropbox-api-url", server.dropbox_api_url,
+        "--source", args.source,
+        "--parallel", str(workers),
+        "--chunk-mb", str(chunk_mb),
+        "--memory-mb", str(args.memory_mb),
+        "--download-workers", str(args.download_workers),
+        "--extract-workers", str(args.extract_workers),
+    ]
+    if args.stream_zip:
+        argv.append("--stream-zip")
+    # tqdm reads TQDM_* only when first imported, so the worker gets it in
+    # its environment; otherwise every progress bar lands in proc.stderr.
+    env = dict(os.environ, TQDM_DISABLE="1")
+    proc = subprocess.run(argv, capture_output=True, text=True, env=env)
+    if proc.returncode != 0:
+        raise RuntimeError(f"Benchmark worker failed ({workers} workers, {chunk_mb} MB chunks):\n{proc.stderr}")
+    r = json.loads(proc.stdout.strip().splitlines()[-1])
+    calls = dict(server.calls)
+    uploaded = sum(1 for p in server.files() if p.startswith(f"{BENCH_FOLDER}/"))
+    if uploaded != n_files:
+        raise RuntimeError(f"Fake drive holds {uploaded} of {n_files} files after the run")
+    dropbox_requests = sum(calls.pop(k) for k in list(calls) if k.startswith("dropbox."))
+    graph_requests = calls.get("http", 0) - dropbox_requests
+    r.update(
+        workers=workers,
+        chunkMB=chunk_mb,
+        graphRequests=graph_requests,
+        requestsPerFile=round(graph_requests / max(1, n_files), 2),
+        calls={k: v for k, v in calls.items() if k != "http"},
+    )
+    return r
+
+
+def cmd_run(args: argparse.Namespace) -> int:
+    try:
+        worker_counts = [int(x) for x in args.workers.split(",") if x.strip()]
+        chunk_sizes = [int(x) for x in args.chunk_mb.split(",") if x.strip()]
+    except ValueError:
+        eprint("--workers and --chunk-mb take comma-separated integers.")
+        return 2
+
+    results: List[Dict[str, Any]] = []
+    with tempfile.TemporaryDirectory(prefix="onedrive_bench_") as tmp:
+        zip_path = Path(tmp) / "share.zip"
+        n_files = build_zip(
+            zip_path,
+            small_files=args.small_files,
+            small_kb=args.small_kb,
+            large_files=args.large_files,
+            large_mb=args.large_mb,
+            seed=args.seed,
+        )
+        server = FakeGraphServer(
+            latency_ms=args.latency_ms,
+            jitter_ms=args.jitter_ms,
+            bandwidth_mbps=args.bandwidth_mbps,
+            throttle_rate=args.throttle_rate,
+            max_qps=args.max_qps,
+            retry_after_s=args.retry_after_s,
+            zip_path=zip_path,
+            seed=args.seed,
+        ).start()
+        try:
+            print(
+                f"Share: {n_files} files in a {zip_path.stat().st_size / (1024 * 1024):.1f} MB ZIP; "
+                f"source={args.source} latency={args.latency_ms}ms bandwidth={args.bandwidth_mbps or '-'}Mbit/s "
+                f"throttle_rate={args.throttle_rate} max_qps={args.max_qps or '-'}"
+            )
+            print(
+                f"{'workers':>7} {'chunkMB':>7} {'total s':>8} {'upload s':>9} {'MB/s':>8} {'req/file':>9} "
+                f"{'throttled':>9} {'peakRSS MB':>10}"
+            )
+            for workers in worker_counts:
+                for chunk_mb in chunk_sizes:
+                    r = bench_one(server, workers=workers, chunk_mb=chunk_mb, args=args, n_files=n_files)
+                    results.append(r)
+                    print(
+                        f"{workers:>7} {chunk_mb:>7} {r['totalSeconds']:>8.2f} {r['uploadSeconds']:>9.2f} "
+                        f"{r['uploadMBps']:>8.1f} {r['requestsPerFile']:>9.2f} {r['throttled']:>9} "
+                        f"{r['peakRssMB'] or '-':>10}"
+                    )
+        finally:
+            server.stop()
+
+    if args.json:
+        write_json(args.json, {"files": n_files, "results": results})
+        print(f"Wrote JSON: {args.json}")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(
+        prog="onedrive_bench.py",
+        description="Benchmark dropbox_to_onedrive.py uploads against a local fake Graph and Dropbox server.",
+    )
+    p.add_argument("--workers", default="1,4,8", help="Comma-separated --parallel values to sweep")
+    p.add_argument("--chunk-mb", default="5,10,20", help="Comma-separated --chunk-mb values to sweep")
+    p.add_argument("--memory-mb", type=int, default=512, help="--memory-mb for every run")
+    p.add_argument("--small-files", type=int, default=300, help="Small files in the synthetic share")
+    p.add_argument("--small-kb", type=int, default=64, help="Mean small-file size in KB")
+    p.add_argument("--large-files", type=int, default=4, help="Large files (upload sessions) in the share")
+    p.add_argument("--large-mb", type=int, default=24, help="Size of each large file in MB")
+    p.add_argument("--latency-ms", type=float, default=20.0, help="Latency per HTTP request")
+    p.add_argument("--jitter-ms", type=float, default=0.0, help="Random extra latency per request")
+    p.add_argument("--bandwidth-mbps", type=float, default=0.0, help="Shared link capacity in Mbit/s (0 = unlimited)")
+    p.add_argument("--throttle-rate", type=float, default=0.0, help="Probability of a 429 per Graph request")
+    p.add_argument("--max-qps", type=float, default=0.0, help="Graph quota in requests/sec (0 = unlimited)")
+    p.add_argument("--retry-after-s", type=float, default=1.0, help="Retry-After sent with throttled responses")
+    p.add_argument("--source", choices=["zip", "dropbox-api"], default="zip", help="Dropbox source mode")
+    p.add_argument("--stream-zip", action="store_true", help="Upload straight from the ZIP instead of extracting")
+    p.add_argument(
+        "--download-workers", type=int, default=4, help="Concurrent ZIP ranges, or file downloads with dropbox-api"
+    )
+    p.add_argument("--extract-workers", type=int, default=min(8, os.cpu_count() or 1), help="Extraction threads")
+    p.add_argument("--seed", type=int, default=0, help="Random seed")
+    p.add_argument("--json", default=None, help="Write results as JSON")
+    p.set_defaults(func=cmd_run)
+
+    sub = p.add_subparsers(dest="cmd")
+    w = sub.add_parser("worker", help=argparse.SUPPRESS)
+    w.add_argument("--graph-url", required=True)
+    w.add_argument("--dropbox-url", required=True)
+    w.add_argument("--dropbox-api-url", required=True)
+    w.add_argument("--source", choices=["zip", "dropbox-api"], default="zip")
+    w.add_argument("--parallel", type=int, default=1)
+    w.add_argument("--chunk-mb", type=int, default=10)
+    w.add_argument("--memory-mb", type=int, default=512)
+    w.add_argument("--download-workers", type=int, default=4)
+    w.add_argument("--extract-workers", type=int, default=1)
+    w.add_argument("--stream-zip", action="store_true")
+    w.set_defaults(func=cmd_worker)
+    return p
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    return int(args.func(args))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,592 @@
+#!/usr/bin/env python3
+"""
+Offline stand-in for the Microsoft Graph and Dropbox endpoints used by
+dropbox_to_onedrive.py.
+
+It is a real local HTTP server (so connection pooling, request bodies and
+retries are exercised exactly as against the cloud) implementing the
+subset of the Graph surface GraphClient touches:
+
+  - children listing and folder create (/me/drive/{root|items/{id}}/children)
+  - JSON $batch
+  - simple upload (PUT /me/drive/root:/{path}:/content)
+  - upload sessions (createUploadSession, chunk PUTs, status GETs)
+  - delta queries with deltaLinks, and server-side copy with a monitor URL
+
+plus the Dropbox side: the shared-link ZIP download (with byte ranges) and
+the API calls --source dropbox-api uses (files/list_folder[/continue] and
+sharing/get_shared_link_file), both serving the same ZIP's contents.
+
+Injected behaviour:
+  - latency_ms / jitter_ms: sleep per HTTP request (a batch is one request)
+  - bandwidth_mbps: link capacity per direction (uploads and downloads are
+    full duplex, each shared by all connections)
+  - throttle_rate: probability of a 429 with Retry-After per request
+  - max_qps: token-bucket quota; requests over it get 429 with Retry-After
+
+Start it with FakeGraphServer(...).start() and point GraphClient at
+server.graph_url, and the download at server.dropbox_url (ZIP) or
+DropboxClient at server.dropbox_api_url, or use onedrive_bench.py.
+"""
+
+from __future__ import annotations
+
+import itertools
+import json
+import zipfile
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+from dropbox_to_onedrive import QuickXorHash, iter_zip_members
+
+_CHILDREN_RE = re.compile(r"^/me/drive/(?:root|items/(?P<id>[^/]+))/children$")
+_ROOT_PATH_RE = re.compile(r"^/me/drive/root:/(?P<path>.+):/(?P<op>content|createUploadSession)$")
+_DELTA_RE = re.compile(r"^/me/drive/items/(?P<id>[^/]+)/delta$")
+_COPY_RE = re.compile(r"^/me/drive/items/(?P<id>[^/]+)/copy$")
+_RANGE_RE = re.compile(r"^bytes (\d+)-(\d+)/(\d+)$")
+
+IO_BLOCK = 1024 * 1024
+
+
+class _Link:
+    """One direction of a link with fixed capacity: transfers queue for it in turn."""
+
+    def __init__(self, mbps: float) -> None:
+        self.bytes_per_s = mbps * 1024 * 1024 / 8
+        self._lock = threading.Lock()
+        self._free_at = 0.0
+
+    def consume(self, n: int) -> None:
+        if self.bytes_per_s <= 0 or n <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._free_at = max(self._free_at, now) + n / self.bytes_per_s
+            wait = self._free_at - now
+        time.sleep(wait)
+
+
+class _Body:
+    """A request body, read in blocks through the link rather than held whole."""
+
+    def __init__(self, rfile: Any, length: int, link: _Link) -> None:
+        self._rfile = rfile
+        self.remaining = length
+        self._link = link
+
+    def drain(self, hasher: Optional[QuickXorHash] = None) -> int:
+        """Read the rest of the body (feeding `hasher`); returns the bytes read."""
+        n = 0
+        while self.remaining > 0:
+            chunk = self._rfile.read(min(IO_BLOCK, self.remaining))
+            if not chunk:
+                break
+            self._link.consume(len(chunk))
+            if hasher is not None:
+                hasher.update(chunk)
+            n += len(chunk)
+            self.remaining -= len(chunk)
+        self.remaining = 0
+        return n
+
+    def json(self) -> Any:
+        chunks: List[bytes] = []
+        while self.remaining > 0:
+            chunk = self._rfile.read(min(IO_BLOCK, self.remaining))
+            if not chunk:
+                break
+            self._link.consume(len(chunk))
+            chunks.append(chunk)
+            self.remaining -= len(chunk)
+        self.remaining = 0
+        raw = b"".join(chunks)
+        return json.loads(raw) if raw else None
+
+
+class _Reply(Exception):
+    """Raised by a route to answer with a Graph-style error."""
+
+    def __init__(self, status: int, code: str, headers: Optional[Dict[str, str]] = None) -> None:
+        super().__init__(code)
+        self.status = status
+        self.body = {"error": {"code": code, "message": code}}
+        self.headers = headers or {}
+
+
+class FakeGraphServer(ThreadingHTTPServer):
+    """Local Graph + Dropbox stand-in with injectable latency, bandwidth and throttling."""
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(
+        self,
+        *,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        bandwidth_mbps: float = 0.0,
+        throttle_rate: float = 0.0,
+        max_qps: float = 0.0,
+        retry_after_s: float = 1.0,
+        page_size: int = 200,
+        zip_path: Optional[Path] = None,
+        hash_uploads: bool = False,
+        seed: int = 0,
+    ) -> None:
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.throttle_rate = throttle_rate
+        self.max_qps = max_qps
+        self.retry_after_s = retry_after_s
+        self.page_size = page_size
+        self.zip_path = zip_path
+        self.hash_uploads = hash_uploads
+        self.uplink = _Link(bandwidth_mbps)
+        self.downlink = _Link(bandwidth_mbps)
+        self._rng = random.Random(seed)
+        self._lock = threading.RLock()
+        self._tokens = max_qps
+        self._last_refill = time.monotonic()
+        self._thread: Optional[threading.Thread] = None
+        self._share: Optional[Dict[str, List[Dict[str, Any]]]] = None
+        self._members: Dict[str, zipfile.ZipInfo] = {}
+        self.reset()
+
+    # --- lifecycle ---
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def graph_url(self) -> str:
+        return f"{self.base_url}/v1.0"
+
+    @property
+    def dropbox_url(self) -> str:
+        return f"{self.base_url}/dropbox/share.zip"
+
+    @property
+    def dropbox_api_url(self) -> str:
+        return f"{self.base_url}/dropbox"
+
+    def start(self) -> "FakeGraphServer":
+        self._thread = threading.Thread(target=self.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def reset(self) -> None:
+        """Empty the drive and the call counters."""
+        with self._lock:
+            self.items: Dict[str, Dict[str, Any]] = {
+                "root": {"id": "root", "name": "root", "parent": None, "folder": True, "size": 0, "seq": 0}
+            }
+            self._children: Dict[str, Dict[str, str]] = {"root": {}}
+            self._sessions: Dict[str, Dict[str, Any]] = {}
+            self._ids = itertools.count(1)
+            self._seq = itertools.count(1)
+            self.calls: Counter = Counter()
+
+    # --- drive model (caller holds self._lock) ---
+
+    def _put_item(
+        self, parent: str, name: str, *, folder: bool, size: int = 0, quick_xor: Optional[str] = None
+    ) -> Dict[str, Any]:
+        existing = self._children[parent].get(name)
+        if existing is not None:
+            item = self.items[existing]
+        else:
+            item = {"id": f"item{next(self._ids)}", "name": name, "parent": parent, "folder": folder}
+            self.items[item["id"]] = item
+            self._children[parent][name] = item["id"]
+            if folder:
+                self._children[item["id"]] = {}
+        item.update(size=size, seq=next(self._seq))
+        if not folder:
+            item["quickXorHash"] = quick_xor
+        # Like Graph, a change also shows up in delta for every ancestor.
+        cur = item["parent"]
+        while cur is not None:
+            self.items[cur]["seq"] = item["seq"]
+            cur = self.items[cur]["parent"]
+        return item
+
+    def _resolve_parent(self, drive_path: str) -> Tuple[str, str]:
+        """(parent id, name) for a root-relative path, creating missing folders like Graph does."""
+        parts = [p for p in drive_path.split("/") if p]
+        parent = "root"
+        for part in parts[:-1]:
+            child = self._children[parent].get(part)
+            if child is None:
+                child = self._put_item(parent, part, folder=True)["id"]
+            elif not self.items[child]["folder"]:
+                raise _Reply(409, "nameAlreadyExists")
+            parent = child
+        return parent, parts[-1]
+
+    def _in_subtree(self, item_id: str, root_id: str) -> bool:
+        cur: Optional[str] = item_id
+        while cur is not None:
+            if cur == root_id:
+                return True
+            cur = self.items[cur]["parent"] if cur in self.items else None
+        return False
+
+    def _view(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"id": item["id"], "name": item["name"], "size": item["size"]}
+        if item["parent"] is not None:
+            out["parentReference"] = {"id": item["parent"]}
+        if item["folder"]:
+            out["folder"] = {"childCount": len(self._children[item["id"]])}
+        else:
+            hashes = {"quickXorHash": item["quickXorHash"]} if item.get("quickXorHash") else {}
+            out["file"] = {"hashes": hashes}
+        return out
+
+    # --- seeding and inspection ---
+
+    def add_file(self, drive_path: str, size: int, *, quick_xor: Optional[str] = None) -> str:
+        """Put a file (and its folders) on the drive without uploading it; returns its id."""
+        with self._lock:
+            parent, name = self._resolve_parent(drive_path)
+            return self._put_item(parent, name, folder=False, size=size, quick_xor=quick_xor)["id"]
+
+    def files(self) -> Dict[str, int]:
+        """{ root-relative path -> size } of every file on the drive."""
+        with self._lock:
+            out: Dict[str, int] = {}
+            for item in self.items.values():
+                if item["folder"]:
+                    continue
+                parts = []
+                cur: Optional[str] = item["id"]
+                while cur not in (None, "root"):
+                    parts.append(self.items[cur]["name"])
+                    cur = self.items[cur]["parent"]
+                out["/".join(reversed(parts))] = item["size"]
+            return out
+
+    # --- injected behaviour ---
+
+    def _count(self, kind: str) -> None:
+        with self._lock:
+            self.calls[kind] += 1
+
+    def _admit(self, *, graph: bool) -> Optional[float]:
+        """
+        Count an HTTP request and apply latency; returns Retry-After when a
+        Graph request is throttled (Dropbox downloads are never throttled).
+        """
+        with self._lock:
+            self.calls["http"] += 1
+            delay = self.latency_ms + (self._rng.random() * self.jitter_ms if self.jitter_ms else 0)
+            throttled = graph and self.throttle_rate > 0 and self._rng.random() < self.throttle_rate
+            if graph and self.max_qps > 0:
+                now = time.monotonic()
+                self._tokens = min(self.max_qps, self._tokens + (now - self._last_refill) * self.max_qps)
+                self._last_refill = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                else:
+                    throttled = True
+            if throttled:
+                self.calls["throttled"] += 1
+        if delay:
+            time.sleep(delay / 1000.0)
+        return self.retry_after_s if throttled else None
+
+    # --- Dropbox API routes ---
+
+    def _shared_folder(self) -> Dict[str, List[Dict[str, Any]]]:
+        """{ folder path inside the link -> its entries }, built once from the ZIP."""
+        with self._lock:
+            if self._share is None:
+                share: Dict[str, List[Dict[str, Any]]] = {"": []}
+                if self.zip_path is not None:
+                    with zipfile.ZipFile(self.zip_path) as zf:
+                        members, _ = iter_zip_members(zf)
+                    for info, rel, size in members:
+                        folder = ""
+                        for part in rel.parts[:-1]:
+                            sub = f"{folder}/{part}"
+                            if sub not in share:
+                                share[sub] = []
+                                share[folder].append({".tag": "folder", "name": part})
+                            folder = sub
+                        share[folder].append({".tag": "file", "name": rel.name, "size": size})
+                        self._members[f"{folder}/{rel.name}"] = info
+                self._share = share
+            return self._share
+
+    def dropbox_api(self, path: str, body: Any) -> Tuple[int, Any, Dict[str, str]]:
+        self._count("dropbox.list")
+        share = self._shared_folder()
+        if path == "/2/files/list_folder":
+            folder, offset = str((body or {}).get("path", "")).rstrip("/"), 0
+        else:
+            folder, _, start = str((body or {}).get("cursor", "")).rpartition("|")
+            offset = int(start or 0)
+        if folder not in share:
+            return 409, {"error_summary": "path/not_found/"}, {}
+        entries = share[folder][offset : offset + self.page_size]
+        has_more = offset + self.page_size < len(share[folder])
+        return 200, {"entries": entries, "cursor": f"{folder}|{offset + self.page_size}", "has_more": has_more}, {}
+
+    def shared_file(self, arg: str) -> Optional[zipfile.ZipInfo]:
+        self._count("dropbox.file")
+        self._shared_folder()
+        return self._members.get(str(json.loads(arg or "{}").get("path", "")))
+
+    # --- Graph routes: (status, body, headers) ---
+
+    def graph(self, method: str, path: str, query: Dict[str, str], body: Any) -> Tuple[int, Any, Dict[str, str]]:
+        try:
+            return self._graph(method, path, query, body)
+        except _Reply as reply:
+            return reply.status, reply.body, reply.headers
+
+    def _graph(self, method: str, path: str, query: Dict[str, str], body: Any) -> Tuple[int, Any, Dict[str, str]]:
+        if method == "POST" and path == "/$batch":
+            self._count("batch")
+            responses = []
+            for req in (body or {}).get("requests", []):
+                parts = urlsplit(req.get("url", ""))
+                status, out, headers = self.graph(
+                    req.get("method", "GET"), unquote(parts.path), dict(parse_qsl(parts.query)), req.get("body")
+                )
+                responses.append({"id": req.get("id"), "status": status, "headers": headers, "body": out})
+            return 200, {"responses": responses}, {}
+
+        m = _CHILDREN_RE.match(path)
+        if m:
+            parent = m.group("id") or "root"
+            with self._lock:
+                if parent not in self._children:
+                    raise _Reply(404, "itemNotFound")
+                if method == "POST":
+                    self.calls["folder.create"] += 1
+                    name = str((body or {}).get("name"))
+                    if name in self._children[parent]:
+                        raise _Reply(409, "nameAlreadyExists")
+                    return 201, self._view(self._put_item(parent, name, folder=True)), {}
+                self.calls["children.list"] += 1
+                ids = sorted(self._children[parent].values())
+                top = min(int(query.get("$top", self.page_size)), self.page_size)
+                skip = int(query.get("$skiptoken", 0))
+                page: Dict[str, Any] = {"value": [self._view(self.items[i]) for i in ids[skip : skip + top]]}
+            if skip + top < len(ids):
+                page["@odata.nextLink"] = f"{self.graph_url}{path}?$top={top}&$skiptoken={skip + top}"
+            return 200, page, {}
+
+        m = _ROOT_PATH_RE.match(path)
+        if m:
+            with self._lock:
+                parent, name = self._resolve_parent(m.group("path"))
+                if m.group("op") == "createUploadSession":
+                    self.calls["session.create"] += 1
+                    sid = f"s{next(self._ids)}"
+                    self._sessions[sid] = {
+                        "parent": parent,
+                        "name": name,
+                        "received": 0,
+                        "hash": QuickXorHash() if self.hash_uploads else None,
+                    }
+                    return 200, {"uploadUrl": f"{self.base_url}/upload/{sid}"}, {}
+                self.calls["put.simple"] += 1
+            # Content is hashed as it arrives and then dropped: the fake keeps
+            # sizes and hashes only, so its memory use stays flat.
+            hasher = QuickXorHash() if self.hash_uploads else None
+            size = body.drain(hasher)
+            with self._lock:
+                quick_xor = hasher.b64digest() if hasher is not None else None
+                item = self._put_item(parent, name, folder=False, size=size, quick_xor=quick_xor)
+                return 201, self._view(item), {}
+
+        m = _DELTA_RE.match(path)
+        if m and method == "GET":
+            root_id = m.group("id")
+            with self._lock:
+                self.calls["delta"] += 1
+                if root_id not in self.items:
+                    raise _Reply(404, "itemNotFound")
+                since = int(query.get("token", 0))
+                skip = int(query.get("skip", 0))
+                changed = sorted(
+                    (it for it in self.items.values() if it["seq"] > since and self._in_subtree(it["id"], root_id)),
+                    key=lambda it: it["seq"],
+                )
+                latest = max(it["seq"] for it in self.items.values())
+                page = {"value": [self._view(it) for it in changed[skip : skip + self.page_size]]}
+            if skip + self.page_size < len(changed):
+                page["@odata.nextLink"] = f"{self.graph_url}{path}?token={since}&skip={skip + self.page_size}"
+            else:
+                page["@odata.deltaLink"] = f"{self.graph_url}{path}?token={latest}"
+            return 200, page, {}
+
+        m = _COPY_RE.match(path)
+        if m and method == "POST":
+            with self._lock:
+                self.calls["copy"] += 1
+                src = self.items.get(m.group("id"))
+                target = ((body or {}).get("parentReference") or {}).get("id")
+                if src is None or src["folder"] or target not in self._children:
+                    raise _Reply(404, "itemNotFound")
+                name = (body or {}).get("name") or src["name"]
+                new = self._put_item(target, name, folder=False, size=src["size"], quick_xor=src.get("quickXorHash"))
+            return 202, {}, {"Location": f"{self.base_url}/monitor/{new['id']}"}
+
+        raise _Reply(400, "invalidRequest")
+
+    def upload_session(
+        self, method: str, sid: str, content_range: str, body: _Body
+    ) -> Tuple[int, Any, Dict[str, str]]:
+        with self._lock:
+            session = self._sessions.get(sid)
+            if session is None:
+                return 404, {"error": {"code": "itemNotFound"}}, {}
+            expected = {"nextExpectedRanges": [f"{session['received']}-"]}
+            if method == "GET":
+                self.calls["session.status"] += 1
+                return 200, expected, {}
+            self.calls["session.put"] += 1
+            m = _RANGE_RE.match(content_range)
+            if not m or int(m.group(1)) != session["received"] or int(m.group(2)) - int(m.group(1)) + 1 != body.remaining:
+                return 416, expected, {}
+        # The client sends a session's chunks one at a time, so the body is
+        # read (and hashed) outside the lock.
+        length = body.remaining
+        got = body.drain(session["hash"])
+        with self._lock:
+            if got != length:
+                # Connection dropped mid-chunk; the hash state is no longer usable.
+                self._sessions.pop(sid, None)
+                return 400, {"error": {"code": "incompleteBody"}}, {}
+            session["received"] = int(m.group(2)) + 1
+            if session["received"] < int(m.group(3)):
+                return 202, {"nextExpectedRanges": [f"{session['received']}-"]}, {}
+            del self._sessions[sid]
+            quick_xor = session["hash"].b64digest() if session["hash"] is not None else None
+            item = self._put_item(
+                session["parent"], session["name"], folder=False, size=session["received"], quick_xor=quick_xor
+            )
+            return 201, self._view(item), {}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; with Nagle on, keep-alive
+    # clients would wait on delayed ACKs and the fake would add ~40 ms per call.
+    disable_nagle_algorithm = True
+    server: FakeGraphServer
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _send(self, status: int, body: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(body).encode("utf-8") if body is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _dispatch(self) -> None:
+        body = _Body(self.rfile, int(self.headers.get("Content-Length") or 0), self.server.uplink)
+        parts = urlsplit(self.path)
+        path = unquote(parts.path)
+        query = dict(parse_qsl(parts.query))
+        retry_after = self.server._admit(graph=not path.startswith("/dropbox/"))
+        if retry_after is not None:
+            body.drain()
+            self._send(429, {"error": {"code": "tooManyRequests"}}, {"Retry-After": f"{retry_after:g}"})
+            return
+
+        if path.startswith("/v1.0/"):
+            # Uploaded content stays a stream; JSON bodies are parsed.
+            payload = body if self.command == "PUT" else body.json()
+            status, out, headers = self.server.graph(self.command, path[len("/v1.0"):], query, payload)
+            body.drain()
+            self._send(status, out, headers)
+        elif path.startswith("/upload/"):
+            status, out, headers = self.server.upload_session(
+                self.command, path[len("/upload/"):], self.headers.get("Content-Range", ""), body
+            )
+            body.drain()
+            self._send(status, out, headers)
+        elif path.startswith("/monitor/") and self.command == "GET":
+            self._send(200, {"status": "completed", "resourceId": path[len("/monitor/"):]})
+        elif path == "/dropbox/share.zip" and self.command == "GET" and self.server.zip_path is not None:
+            self._send_zip()
+        elif path == "/dropbox/2/sharing/get_shared_link_file" and self.command == "POST":
+            body.drain()
+            info = self.server.shared_file(self.headers.get("Dropbox-API-Arg", ""))
+            if info is None:
+                self._send(409, {"error_summary": "shared_link_not_found/"})
+            else:
+                self._send_member(info)
+        elif path.startswith("/dropbox/2/files/list_folder") and self.command == "POST":
+            status, out, headers = self.server.dropbox_api(path[len("/dropbox"):], body.json())
+            self._send(status, out, headers)
+        else:
+            self._send(404, {"error": {"code": "itemNotFound"}})
+
+    def _send_zip(self) -> None:
+        self.server._count("dropbox.get")
+        zip_path = self.server.zip_path
+        assert zip_path is not None
+        size = zip_path.stat().st_size
+        start, end = 0, size - 1
+        m = re.match(r"bytes=(\d+)-(\d*)$", self.headers.get("Range", ""))
+        if m:
+            start = int(m.group(1))
+            end = min(int(m.group(2)), size - 1) if m.group(2) else size - 1
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Type", "application/zip")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        with open(zip_path, "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = f.read(min(IO_BLOCK, remaining))
+                if not chunk:
+                    break
+                self.server.downlink.consume(len(chunk))
+                self.wfile.write(chunk)
+                remaining -= len(chunk)
+
+    def _send_member(self, info: zipfile.ZipInfo) -> None:
+        assert self.server.zip_path is not None
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(info.file_size))
+        self.end_headers()
+        with zipfile.ZipFile(self.server.zip_path) as zf, zf.open(info) as f:
+            while True:
+                chunk = f.read(IO_BLOCK)
+                if not chunk:
+                    break
+                self.server.downlink.consume(len(chunk))
+                self.wfile.write(chunk)
+
+    do_GET = do_POST = do_PUT = _dispatch
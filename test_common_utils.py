@@ -5,6 +5,7 @@ from pathlib import Path
 import tempfile
 import shutil
 import json
+import hashlib
 import os
 
 from common_utils import (
@@ -15,7 +16,11 @@ from common_utils import (
     load_json_config,
     deep_merge,
     mkdirp,
-    write_json
+    write_json,
+    write_json_atomic,
+    md5_file,
+    HashCache,
+    hash_files_parallel,
 )
 
 class TestCommonUtils(unittest.TestCase):
@@ -73,5 +78,55 @@ class TestCommonUtils(unittest.TestCase):
                 loaded = json.load(f)
             self.assertEqual(loaded, payload)
 
+    def test_write_json_atomic(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "state.json"
+            write_json_atomic(path, {"a": 1})
+            write_json_atomic(path, {"a": 2})
+            with path.open("r", encoding="utf-8") as f:
+                self.assertEqual(json.load(f), {"a": 2})
+            self.assertEqual(os.listdir(tmpdir), ["state.json"])
+
+    def test_md5_file(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            empty = Path(tmpdir) / "empty"
+            empty.write_bytes(b"")
+            data = os.urandom(100_000)
+            full = Path(tmpdir) / "data.bin"
+            full.write_bytes(data)
+            self.assertEqual(md5_file(empty), hashlib.md5(b"").hexdigest())
+            self.assertEqual(md5_file(full, block_size=4096), hashlib.md5(data).hexdigest())
+
+    def test_hash_cache_skips_unchanged_files(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            paths = []
+            for i in range(4):
+                p = Path(tmpdir) / f"f{i}.csv"
+                p.write_bytes(f"row {i}\n".encode() * 1000)
+                paths.append(str(p))
+            cache_path = Path(tmpdir) / "cache.json"
+
+            def run():
+                cache = HashCache(cache_path).load()
+                digests, hashed = hash_files_parallel(
+                    [(p, os.stat(p)) for p in paths], cache=cache, workers=2
+                )
+                cache.save()
+                return digests, hashed
+
+            digests, hashed = run()
+            self.assertEqual(sorted(hashed), sorted(paths))
+            self.assertEqual(digests[paths[0]], md5_file(paths[0]))
+            self.assertEqual(run()[1], [])
+
+            Path(paths[1]).write_bytes(b"changed")
+            digests, hashed = run()
+            self.assertEqual(hashed, [paths[1]])
+            self.assertEqual(digests[paths[1]], hashlib.md5(b"changed").hexdigest())
+
+            cache = HashCache(cache_path).load()
+            cache.retain(tmpdir, paths[:2])
+            self.assertEqual(sorted(cache.entries), sorted(paths[:2]))
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,1167 @@
+
+import base64
+import functools
+import io
+import json
+import os
+import tempfile
+import threading
+import unittest
+import warnings
+import zipfile
+from contextlib import redirect_stderr, redirect_stdout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest import mock
+
+import requests
+
+import dropbox_to_onedrive
+from common_utils import HashCache
+from onedrive_fake import FakeGraphServer
+from dropbox_to_onedrive import (
+    ChunkBufferPool,
+    DownloadParts,
+    DropboxClient,
+    GraphAuth,
+    GraphClient,
+    GraphGovernor,
+    QuickXorHash,
+    RemoteFile,
+    RemoteIndex,
+    UploadState,
+    ZipReader,
+    create_folder_tree,
+    download_to_file,
+    dropbox_fetcher,
+    extract_zip_parallel,
+    get_or_create_folder,
+    hash_sources,
+    iter_zip_members,
+    list_shared_folder,
+    plan_by_content,
+    pooled_session,
+    quickxor_file,
+    quickxor_stream,
+    sync_remote_index,
+    upload_files,
+    zip_member_rel_path,
+    zip_mtime_ns,
+)
+
+
+def _zip(entries):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in entries:
+            zf.writestr(name, data)
+    buf.seek(0)
+    return zipfile.ZipFile(buf)
+
+
+class _Response:
+    def __init__(self, status_code, body=None, headers=None):
+        self.status_code = status_code
+        self._body = body or {}
+        self.headers = headers or {}
+
+    def json(self):
+        return self._body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+
+class _RecordingSession:
+    """
+    Stands in for requests.Session against Graph upload sessions: creates
+    sessions, records chunk PUTs, answers status GETs with
+    nextExpectedRanges, and can fail chosen PUTs (by call index) with 503,
+    or accept them and then drop the connection before responding.
+    """
+
+    def __init__(self, fail_puts=(), drop_puts=()):
+        self.puts = []
+        self.gets = []
+        self.received = {}
+        self.fail_puts = set(fail_puts)
+        self.drop_puts = set(drop_puts)
+        self._lock = threading.Lock()
+
+    def request(self, method, url, **kwargs):
+        return getattr(self, method.lower())(url, **kwargs)
+
+    def post(self, url, **kwargs):
+        with self._lock:
+            upload_url = f"https://upload.example/session{len(self.received)}"
+            self.received[upload_url] = bytearray()
+        return _Response(200, {"uploadUrl": upload_url})
+
+    def get(self, url, **kwargs):
+        self.gets.append(url)
+        if url not in self.received:
+            return _Response(404)
+        return _Response(200, {"nextExpectedRanges": [f"{len(self.received[url])}-"]})
+
+    def put(self, url, data=None, headers=None, **kwargs):
+        with self._lock:
+            index = len(self.puts)
+            self.puts.append((url, bytes(data), dict(headers or {})))
+        if index in self.fail_puts:
+            return _Response(503)
+        got = self.received[url]
+        start, rest = headers["Content-Range"].split(" ")[1].split("-")
+        end, total = (int(x) for x in rest.split("/"))
+        if int(start) != len(got):
+            return _Response(416)
+        got.extend(data)
+        if index in self.drop_puts:
+            raise requests.ConnectionError("connection reset")
+        return _Response(201 if end + 1 == total else 202)
+
+
+class _ThrottlingSession:
+    """Answers each request with the next canned (status, headers) pair, recording file bodies."""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.bodies = []
+
+    def request(self, method, url, data=None, **kwargs):
+        if hasattr(data, "read"):
+            self.bodies.append(data.read())
+        status, headers = self.responses.pop(0)
+        return _Response(status, headers=headers)
+
+
+class _FolderGraph:
+    """
+    Minimal Graph folder API behind a fake session: children listings and
+    folder creation, directly or inside $batch. Names in `race` already
+    exist by the time they are created (409), as if made by another client.
+    """
+
+    def __init__(self, race=()):
+        self.children = {"base": {}}
+        self.race = set(race)
+        self.calls = []
+        self.batches = []
+        self._ids = 0
+
+    def _new_id(self):
+        self._ids += 1
+        return f"id{self._ids}"
+
+    def _handle(self, method, path, body):
+        parent = path.split("/")[4].split("?")[0] if path.startswith("/me/drive/items/") else "root"
+        kids = self.children.setdefault(parent, {})
+        if method == "GET":
+            return 200, {"value": [{"id": fid, "name": nm, "folder": {}} for nm, fid in kids.items()]}
+        name = body["name"]
+        if name in self.race:
+            self.race.discard(name)
+            kids[name] = self._new_id()
+            self.children[kids[name]] = {}
+            return 409, {"error": {"code": "nameAlreadyExists"}}
+        if name in kids:
+            return 409, {"error": {"code": "nameAlreadyExists"}}
+        kids[name] = self._new_id()
+        self.children[kids[name]] = {}
+        return 201, {"id": kids[name], "name": name, "folder": {}}
+
+    def request(self, method, url, json=None, params=None, **kwargs):
+        path = url.replace(dropbox_to_onedrive.GRAPH_BASE, "")
+        self.calls.append((method, path))
+        if path == "/$batch":
+            self.batches.append([(r["method"], r["url"]) for r in json["requests"]])
+            responses = []
+            for req in json["requests"]:
+                status, body = self._handle(req["method"], req["url"], req.get("body"))
+                responses.append({"id": req["id"], "status": status, "headers": {}, "body": body})
+            return _Response(200, {"responses": responses})
+        status, body = self._handle(method, path, json)
+        return _Response(status, body)
+
+
+def _client(session, governor=None, buffers=None):
+    client = GraphClient.__new__(GraphClient)
+    client._s = session
+    client.governor = governor or GraphGovernor(4)
+    client.buffers = buffers
+    client.base_url = dropbox_to_onedrive.GRAPH_BASE
+    return client
+
+
+def _no_backoff(test):
+    for name in ("GRAPH_BACKOFF_BASE_S", "UPLOAD_RETRY_BACKOFF_S"):
+        patcher = mock.patch.object(dropbox_to_onedrive, name, 0)
+        patcher.start()
+        test.addCleanup(patcher.stop)
+
+
+class _RangeHandler(BaseHTTPRequestHandler):
+    """Serves server.payload, honouring single byte ranges when server.ranges is set."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        srv = self.server
+        data = srv.payload
+        rng = self.headers.get("Range")
+        with srv.lock:
+            srv.requests.append(rng)
+        if rng and rng != "bytes=0-0" and getattr(srv, "fail_segments", False):
+            self.send_response(500)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if rng and srv.ranges:
+            start, end = (int(x) for x in rng.split("=")[1].split("-"))
+            body = data[start:end + 1]
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+        else:
+            body = data
+            self.send_response(200)
+        if getattr(srv, "etag", None):
+            self.send_header("ETag", srv.etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def _serve(payload, *, ranges=True):
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _RangeHandler)
+    srv.payload = payload
+    srv.ranges = ranges
+    srv.requests = []
+    srv.lock = threading.Lock()
+    threading.Thread(target=srv.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+    return srv, f"http://127.0.0.1:{srv.server_address[1]}/d.zip"
+
+
+class TestDownload(unittest.TestCase):
+
+    def setUp(self):
+        self.payload = os.urandom(10_000)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dest = Path(self.tmp.name) / "d.zip"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _download(self, url, **kw):
+        with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
+            download_to_file(url, dest_path=self.dest, segment_size=1024, **kw)
+
+    def test_ranged_segments(self):
+        srv, url = _serve(self.payload)
+        self.addCleanup(srv.server_close)
+        self.addCleanup(srv.shutdown)
+        self._download(url, workers=4)
+        self.assertEqual(self.dest.read_bytes(), self.payload)
+        # One probe plus ten 1 KB segments.
+        self.assertEqual(len(srv.requests), 11)
+        # The sidecar records the finished download, so a re-run only probes.
+        self._download(url, workers=4)
+        self.assertEqual(len(srv.requests), 12)
+
+    def test_full_size_file_without_record_is_downloaded_again(self):
+        srv, url = _serve(self.payload)
+        self.addCleanup(srv.server_close)
+        self.addCleanup(srv.shutdown)
+        # E.g. a ZIP of another share, or of this one before an edit.
+        self.dest.write_bytes(os.urandom(len(self.payload)))
+        self._download(url, workers=2)
+        self.assertEqual(self.dest.read_bytes(), self.payload)
+
+    def test_changed_etag_is_downloaded_again(self):
+        srv, url = _serve(self.payload)
+        self.addCleanup(srv.server_close)
+        self.addCleanup(srv.shutdown)
+        srv.etag = '"v1"'
+        self._download(url, workers=2)
+        # The share was edited in place; the ZIP keeps its size.
+        srv.payload = os.urandom(len(self.payload))
+        srv.etag = '"v2"'
+        self._download(url, workers=2)
+        self.assertEqual(self.dest.read_bytes(), srv.payload)
+
+    def test_resumes_from_sidecar(self):
+        srv, url = _serve(self.payload)
+        self.addCleanup(srv.server_close)
+        self.addCleanup(srv.shutdown)
+        # Simulate an interrupted run: segments 0-7 written and recorded.
+        self.dest.write_bytes(self.payload[:8192] + b"\0" * (len(self.payload) - 8192))
+        parts = DownloadParts(self.dest, url=url, size=len(self.payload), segment_size=1024)
+        for i in range(8):
+            parts.mark(i)
+
+        self._download(url, workers=2)
+        self.assertEqual(self.dest.read_bytes(), self.payload)
+        self.assertEqual(sorted(srv.requests[1:]), ["bytes=8192-9215", "bytes=9216-9999"])
+
+    def test_sidecar_for_another_download_is_ignored(self):
+        self.dest.write_bytes(b"\0" * len(self.payload))
+        Path(f"{self.dest}.parts.json").write_text(
+            json.dumps({"url": "other", "size": len(self.payload), "segmentSize": 1024, "done": [0, 1]})
+        )
+        srv, url = _serve(self.payload)
+        self.addCleanup(srv.server_close)
+        self.addCleanup(srv.shutdown)
+        self._download(url)
+        self.assertEqual(self.dest.read_bytes(), self.payload)
+
+    def test_failed_first_run_is_not_taken_as_complete(self):
+        srv, url = _serve(self.payload)
+        self.addCleanup(srv.server_close)
+        self.addCleanup(srv.shutdown)
+        srv.fail_segments = True
+        with mock.patch.object(dropbox_to_onedrive, "DOWNLOAD_RETRIES", 1):
+            with self.assertRaises(RuntimeError):
+                self._download(url, workers=2)
+        # The preallocated file is full size but holds no data yet.
+        self.assertEqual(self.dest.stat().st_size, len(self.payload))
+        self.assertTrue(Path(f"{self.dest}.parts.json").exists())
+
+        srv.fail_segments = False
+        self._download(url, workers=2)
+        self.assertEqual(self.dest.read_bytes(), self.payload)
+
+    def test_falls_back_without_range_support(self):
+        srv, url = _serve(self.payload, ranges=False)
+        self.addCleanup(srv.server_close)
+        self.addCleanup(srv.shutdown)
+        self._download(url, workers=4)
+        self.assertEqual(self.dest.read_bytes(), self.payload)
+        self.assertEqual(srv.requests, ["bytes=0-0", None])
+
+
+class TestPooledSession(unittest.TestCase):
+
+    def test_workers_reuse_pooled_connections(self):
+        srv, url = _serve(b"ok")
+        self.addCleanup(srv.server_close)
+        self.addCleanup(srv.shutdown)
+        session = pooled_session(8)
+        self.addCleanup(session.close)
+
+        def worker():
+            for _ in range(10):
+                session.get(url, timeout=10).raise_for_status()
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        stats = session.get_adapter(url).pool_stats()
+        self.assertEqual(stats["requests"], 80)
+        self.assertLessEqual(stats["connections"], 8)
+        self.assertEqual(stats["reused"], 80 - stats["connections"])
+
+
+class TestZipMembers(unittest.TestCase):
+
+    def test_rel_path_rejects_escaping_names(self):
+        self.assertEqual(zip_member_rel_path("a/./b.txt"), Path("a/b.txt"))
+        self.assertEqual(zip_member_rel_path("a\\b.txt"), Path("a/b.txt"))
+        for bad in ("../x", "a/../../x", "/etc/passwd", "C:/x", ""):
+            self.assertIsNone(zip_member_rel_path(bad), bad)
+
+    def test_single_top_level_folder_is_stripped(self):
+        zf = _zip([("Shared/", b""), ("Shared/a.txt", b"aa"), ("Shared/sub/b.txt", b"bbb")])
+        members, unsafe = iter_zip_members(zf)
+        self.assertEqual(unsafe, 0)
+        self.assertEqual(
+            [(rel.as_posix(), size) for _, rel, size in members],
+            [("a.txt", 2), ("sub/b.txt", 3)],
+        )
+
+    def test_mixed_top_level_is_kept_and_unsafe_skipped(self):
+        zf = _zip([("a.txt", b"a"), ("sub/b.txt", b"b"), ("../evil.txt", b"x")])
+        members, unsafe = iter_zip_members(zf)
+        self.assertEqual(unsafe, 1)
+        self.assertEqual([rel.as_posix() for _, rel, _ in members], ["a.txt", "sub/b.txt"])
+
+    def test_repeated_name_keeps_last_copy(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")  # "Duplicate name"
+            zf = _zip([("a.txt", b"first" * 100), ("b.txt", b"b"), ("a.txt", b"second")])
+        members, _ = iter_zip_members(zf)
+        self.assertEqual([(rel.as_posix(), size) for _, rel, size in members], [("a.txt", 6), ("b.txt", 1)])
+        self.assertEqual(zf.read(members[0][0]), b"second")
+
+    def test_reader_uses_one_handle_per_thread(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "d.zip"
+            with zipfile.ZipFile(path, "w") as zf:
+                zf.writestr("a.txt", b"hello")
+            reader = ZipReader(path)
+            info = zipfile.ZipFile(path).getinfo("a.txt")
+            out = []
+
+            def read():
+                with reader.open(info) as f:
+                    out.append(f.read())
+
+            threads = [threading.Thread(target=read) for _ in range(3)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            read()
+            read()
+            self.assertEqual(out, [b"hello"] * 5)
+            self.assertEqual(len(reader._handles), 4)
+            reader.close()
+            self.assertEqual(reader._handles, [])
+
+
+class TestExtractZipParallel(unittest.TestCase):
+
+    def test_matches_extractall_and_skips_unsafe_names(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            zip_path = tmp / "d.zip"
+            with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
+                zf.writestr("Root/empty/", b"")
+                for i in range(20):
+                    zf.writestr(f"Root/d{i % 3}/f{i}.txt", (b"x%d" % i) * (i * 500))
+                zf.writestr("../escape.txt", b"nope")
+
+            dest = tmp / "out"
+            dest.mkdir()
+            files, written, unsafe = extract_zip_parallel(zip_path, dest, workers=4)
+
+            self.assertEqual((files, unsafe), (20, 1))
+            self.assertTrue((dest / "Root" / "empty").is_dir())
+            self.assertFalse((tmp / "escape.txt").exists())
+            with zipfile.ZipFile(zip_path) as zf:
+                for i in range(20):
+                    name = f"Root/d{i % 3}/f{i}.txt"
+                    self.assertEqual((dest / name).read_bytes(), zf.read(name))
+            self.assertEqual(written, sum(len(b"x%d" % i) * i * 500 for i in range(20)))
+            with zipfile.ZipFile(zip_path) as zf:
+                info = zf.getinfo("Root/d0/f3.txt")
+            self.assertEqual((dest / "Root/d0/f3.txt").stat().st_mtime_ns, zip_mtime_ns(info))
+
+    def test_repeated_name_keeps_last_copy(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            zip_path = tmp / "d.zip"
+            with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf, warnings.catch_warnings():
+                warnings.simplefilter("ignore")  # "Duplicate name"
+                zf.writestr("a.txt", b"first" * 50_000)
+                zf.writestr("a.txt", b"second")
+
+            dest = tmp / "out"
+            dest.mkdir()
+            files, written, _ = extract_zip_parallel(zip_path, dest, workers=4)
+
+            self.assertEqual((files, written), (1, 6))
+            self.assertEqual((dest / "a.txt").read_bytes(), b"second")
+
+
+class TestUploadLargeStream(unittest.TestCase):
+
+    def test_chunks_are_read_sequentially_from_a_zip_member(self):
+        data = bytes(range(256)) * 40  # 10240 bytes
+        zf = _zip([("big.bin", data)])
+        client = _client(_RecordingSession())
+        with zf.open("big.bin") as stream:
+            client.upload_large_stream("Dest/big.bin", stream, total=len(data), chunk_size=4096)
+
+        puts = client._s.puts
+        self.assertEqual(
+            [h["Content-Range"] for _, _, h in puts],
+            ["bytes 0-4095/10240", "bytes 4096-8191/10240", "bytes 8192-10239/10240"],
+        )
+        self.assertEqual(b"".join(body for _, body, _ in puts), data)
+
+    def test_short_stream_is_an_error(self):
+        client = _client(_RecordingSession())
+        with self.assertRaises(RuntimeError):
+            client.upload_large_stream("Dest/x", io.BytesIO(b"abc"), total=10, chunk_size=4)
+
+
+
+class TestResumableUploads(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.state_path = Path(self.tmp.name) / "state.json"
+        self.data = os.urandom(10_000)
+        _no_backoff(self)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _upload(self, session, state, on_bytes=None):
+        _client(session).upload_large_stream(
+            "Dest/big.bin",
+            io.BytesIO(self.data),
+            total=len(self.data),
+            chunk_size=4096,
+            state=state,
+            on_bytes=on_bytes,
+        )
+
+    def test_lost_response_is_resent_from_next_expected_range(self):
+        # Chunk 1 lands but its response is lost; the blind retry gets 416,
+        # so the upload asks the session where it stands and moves on.
+        session = _RecordingSession(drop_puts={1})
+        state = UploadState(self.state_path)
+        progress = []
+        self._upload(session, state, progress.append)
+        self.assertEqual(progress, [4096, 4096, 1808])
+        url = session.puts[0][0]
+        self.assertEqual(bytes(session.received[url]), self.data)
+        self.assertEqual(session.gets, [url])
+        self.assertEqual(
+            [h["Content-Range"] for _, _, h in session.puts],
+            ["bytes 0-4095/10000", "bytes 4096-8191/10000", "bytes 4096-8191/10000", "bytes 8192-9999/10000"],
+        )
+        self.assertTrue(state.is_complete("Dest/big.bin", len(self.data)))
+        self.assertEqual(state.sessions, {})
+
+    def test_interrupted_upload_continues_mid_file(self):
+        session = _RecordingSession(fail_puts=set(range(1, 100)))
+        state = UploadState(self.state_path)
+        with self.assertRaises(RuntimeError):
+            self._upload(session, state)
+
+        # A new run (new process) picks the session up from the state file.
+        session.fail_puts = set()
+        resumed = UploadState(self.state_path).load()
+        self.assertEqual(resumed.sessions["Dest/big.bin"]["offset"], 4096)
+        n_puts = len(session.puts)
+        progress = []
+        self._upload(session, resumed, progress.append)
+        # Bytes accepted before the interruption count as done straight away.
+        self.assertEqual(progress, [4096, 4096, 1808])
+        url = session.puts[0][0]
+        self.assertEqual(bytes(session.received[url]), self.data)
+        self.assertEqual(
+            [h["Content-Range"] for _, _, h in session.puts[n_puts:]],
+            ["bytes 4096-8191/10000", "bytes 8192-9999/10000"],
+        )
+        resumed.flush()
+        self.assertTrue(UploadState(self.state_path).load().is_complete("Dest/big.bin", 10_000))
+
+    def test_expired_session_starts_over(self):
+        state = UploadState(self.state_path)
+        state.put_session("Dest/big.bin", len(self.data), "https://upload.example/gone", 4096)
+        session = _RecordingSession()
+        self._upload(session, state)
+        self.assertEqual(session.gets, ["https://upload.example/gone"])
+        self.assertEqual(session.puts[0][2]["Content-Range"], "bytes 0-4095/10000")
+
+    def test_changed_size_ignores_saved_session(self):
+        state = UploadState(self.state_path)
+        state.put_session("Dest/big.bin", 123, "https://upload.example/old", 0)
+        state.complete("Other/file", 5)
+        self.assertIsNone(state.session("Dest/big.bin", len(self.data)))
+        self.assertFalse(state.is_complete("Other/file", 6))
+
+
+
+class TestChunkBufferPool(unittest.TestCase):
+
+    def test_buffers_are_reused_within_the_budget(self):
+        pool = ChunkBufferPool(1024, budget_bytes=3000)
+        self.assertEqual(pool.count, 2)
+        a, b = pool.acquire(), pool.acquire()
+        got = []
+        t = threading.Thread(target=lambda: got.append(pool.acquire()))
+        t.start()
+        t.join(0.05)
+        self.assertEqual(got, [])  # blocked: both buffers in flight
+        pool.release(a)
+        t.join(1)
+        self.assertIs(got[0], a)
+        self.assertEqual(pool.allocated, 2)
+        pool.release(b)
+
+    def test_parallel_uploads_stay_within_the_budget(self):
+        pool = ChunkBufferPool(4096, budget_bytes=3 * 4096)
+        session = _RecordingSession()
+        client = _client(session, GraphGovernor(8), pool)
+        datas = [os.urandom(20_000) for _ in range(8)]
+
+        def upload(i):
+            client.upload_large_stream(f"Dest/{i}", io.BytesIO(datas[i]), total=20_000, chunk_size=4096)
+
+        threads = [threading.Thread(target=upload, args=(i,)) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertLessEqual(pool.allocated, 3)
+        self.assertEqual(len(pool._free), pool.allocated)
+        self.assertEqual(sorted(bytes(b) for b in session.received.values()), sorted(datas))
+
+    def test_small_zip_member_is_read_into_a_pooled_buffer(self):
+        pool = ChunkBufferPool(4096, budget_bytes=4096)
+        sent = []
+
+        class _Session:
+            def request(self, method, url, data=None, **kwargs):
+                sent.append(data)
+                return _Response(201)
+
+        zf = _zip([("a.txt", b"hello")])
+        with zf.open("a.txt") as stream:
+            _client(_Session(), buffers=pool).put_stream_simple("Dest/a.txt", stream, size=5)
+        self.assertIsInstance(sent[0], memoryview)
+        self.assertEqual(bytes(sent[0]), b"hello")
+        self.assertEqual(len(pool._free), 1)
+
+    def test_simple_upload_larger_than_buffers_is_refused(self):
+        pool = ChunkBufferPool(4, budget_bytes=4)
+        zf = _zip([("a.txt", b"hello")])
+        session = mock.Mock()
+        with zf.open("a.txt") as stream, self.assertRaises(ValueError):
+            _client(session, buffers=pool).put_stream_simple("Dest/a.txt", stream, size=5)
+        session.request.assert_not_called()
+
+
+class TestGraphGovernor(unittest.TestCase):
+
+    def setUp(self):
+        _no_backoff(self)
+
+    def test_aimd_limit(self):
+        gov = GraphGovernor(8)
+        gov.on_throttle(0)
+        self.assertEqual(gov.limit, 4)
+        gov.on_throttle(0)  # same pause window: no second cut
+        self.assertEqual(gov.limit, 4)
+        for _ in range(4):
+            gov.on_success()
+        self.assertEqual(gov.limit, 5)
+        for _ in range(100):
+            gov.on_success()
+        self.assertEqual(gov.limit, 8)
+        self.assertEqual(gov.throttled, 2)
+
+    def test_acquire_blocks_at_the_limit(self):
+        gov = GraphGovernor(1)
+        gov.acquire()
+        got = threading.Event()
+
+        def second():
+            gov.acquire()
+            got.set()
+            gov.release()
+
+        t = threading.Thread(target=second)
+        t.start()
+        self.assertFalse(got.wait(0.05))
+        gov.release()
+        t.join(1)
+        self.assertTrue(got.is_set())
+
+    def test_retry_after_is_honoured_and_body_rewound(self):
+        session = _ThrottlingSession([(429, {"Retry-After": "0"}), (503, {}), (201, {})])
+        client = _client(session, GraphGovernor(4))
+        r = client._request("PUT", "https://graph.example/x", data=io.BytesIO(b"payload"))
+        self.assertEqual(r.status_code, 201)
+        self.assertEqual(session.bodies, [b"payload"] * 3)
+        self.assertEqual(client.governor.throttled, 2)
+        self.assertEqual(client.governor.limit, 2)
+        self.assertEqual(client.governor.in_flight, 0)
+
+    def test_client_errors_are_returned_without_retry(self):
+        session = _ThrottlingSession([(404, {})])
+        r = _client(session)._request("GET", "https://graph.example/x")
+        self.assertEqual(r.status_code, 404)
+
+    def test_gives_up_after_retries(self):
+        session = _ThrottlingSession([(500, {})] * (dropbox_to_onedrive.GRAPH_RETRIES + 1))
+        r = _client(session)._request("GET", "https://graph.example/x")
+        self.assertEqual(r.status_code, 500)
+        self.assertEqual(session.responses, [])
+
+
+
+class TestCreateFolderTree(unittest.TestCase):
+
+    def test_levels_are_created_in_batches(self):
+        graph = _FolderGraph()
+        graph.children["base"] = {"a": "existing-a"}
+        graph.children["existing-a"] = {}
+        dirs = [Path("a/b/c"), Path("a/d"), Path("e")] + [Path(f"wide/{i}") for i in range(25)]
+        folder_ids, children = {}, {}
+
+        created = create_folder_tree(
+            _client(graph), base_parent_id="base", rel_dirs=dirs, children_cache=children, folder_id_cache=folder_ids
+        )
+
+        self.assertEqual(created, 30)
+        self.assertEqual(folder_ids["a"], "existing-a")
+        self.assertEqual(set(folder_ids), {"a", "a/b", "a/b/c", "a/d", "e", "wide"} | {f"wide/{i}" for i in range(25)})
+        for key, fid in folder_ids.items():
+            parent = folder_ids[key.rsplit("/", 1)[0]] if "/" in key else "base"
+            self.assertEqual(graph.children[parent][key.rsplit("/", 1)[-1]], fid)
+        # Everything went through $batch: listings only for parents that
+        # existed beforehand (base, a), never for folders just created.
+        self.assertEqual({m for m, _ in graph.calls}, {"POST"})
+        listed = [url for batch in graph.batches for m, url in batch if m == "GET"]
+        self.assertEqual(len(listed), 2)
+        self.assertTrue(all(len(batch) <= 20 for batch in graph.batches))
+        # Level 1: list base, create e+wide; level 2: list a, create b, d and
+        # the 25 children of wide in two batches; level 3: create c.
+        self.assertEqual(len(graph.batches), 6)
+
+    def test_conflict_in_batch_resolves_to_existing_folder(self):
+        graph = _FolderGraph(race={"x"})
+        folder_ids, children = {}, {}
+        create_folder_tree(
+            _client(graph),
+            base_parent_id="base",
+            rel_dirs=[Path("x/y"), Path("z")],
+            children_cache=children,
+            folder_id_cache=folder_ids,
+        )
+        self.assertEqual(folder_ids["x"], graph.children["base"]["x"])
+        self.assertEqual(folder_ids["x/y"], graph.children[folder_ids["x"]]["y"])
+        self.assertIn(("GET", "/me/drive/items/base/children"), graph.calls)
+
+
+
+def _quickxor_reference(data):
+    """Byte-at-a-time quickXorHash, straight from the definition."""
+    state = 0
+    for i, b in enumerate(data):
+        shift = (11 * i) % 160
+        v = b << shift
+        state ^= (v | (v >> 160)) & ((1 << 160) - 1)
+    out = bytearray(state.to_bytes(20, "little"))
+    for i, b in enumerate(len(data).to_bytes(8, "little")):
+        out[12 + i] ^= b
+    return base64.b64encode(bytes(out)).decode("ascii")
+
+
+class TestQuickXorHash(unittest.TestCase):
+
+    def test_matches_reference_across_update_boundaries(self):
+        self.assertEqual(QuickXorHash().b64digest(), "AAAAAAAAAAAAAAAAAAAAAAAAAAA=")
+        for n in (1, 7, 159, 160, 161, 1000, 4099):
+            data = os.urandom(n)
+            for cuts in ((), (n // 2,), (3, n - 1), (160, 321)):
+                h = QuickXorHash()
+                prev = 0
+                for c in [c for c in cuts if 0 <= c <= n] + [n]:
+                    h.update(data[prev:c])
+                    prev = c
+                self.assertEqual(h.b64digest(), _quickxor_reference(data), (n, cuts))
+
+    def test_file_and_stream_agree(self):
+        data = os.urandom(50_000)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "f.bin"
+            path.write_bytes(data)
+            (Path(tmp) / "empty").write_bytes(b"")
+            expected = _quickxor_reference(data)
+            self.assertEqual(quickxor_file(path, block_size=1600), expected)
+            self.assertEqual(quickxor_stream(io.BytesIO(data), block_size=1000), expected)
+            self.assertEqual(quickxor_file(Path(tmp) / "empty"), _quickxor_reference(b""))
+
+
+class TestContentDuplicates(unittest.TestCase):
+
+    def test_plan_by_content(self):
+        big = dropbox_to_onedrive.SIMPLE_UPLOAD_MAX + 1
+        files = [
+            ("s1", Path("same.txt"), 10),
+            ("s2", Path("changed.txt"), 10),
+            ("s3", Path("moved/big.bin"), big),
+            ("s4", Path("moved/small.txt"), 10),
+            ("s5", Path("new.txt"), 10),
+        ]
+        digests = {"same.txt": "A", "changed.txt": "B", "moved/big.bin": "C", "moved/small.txt": "D", "new.txt": "E"}
+        remote = {
+            Path("same.txt"): RemoteFile("r1", 10, "A"),
+            Path("changed.txt"): RemoteFile("r2", 10, "old"),
+            Path("old/big.bin"): RemoteFile("r3", big, "C"),
+            Path("old/small.txt"): RemoteFile("r4", 10, "D"),
+        }
+        uploads, copies, identical = plan_by_content(files, digests=digests, remote=remote)
+        self.assertEqual(identical, 1)
+        self.assertEqual([e[0] for e in uploads], ["s2", "s4", "s5"])
+        self.assertEqual([(e[0], twin.id) for e, twin in copies], [("s3", "r3")])
+
+    def test_copy_item_waits_for_the_monitor(self):
+        calls = []
+        responses = [
+            _Response(202, headers={"Location": "https://monitor.example/1"}),
+            _Response(202, {"status": "inProgress"}),
+            _Response(200, {"status": "completed", "resourceId": "new"}),
+        ]
+
+        class _Session:
+            def request(self, method, url, **kwargs):
+                calls.append((method, url, kwargs.get("headers"), kwargs.get("json")))
+                return responses.pop(0)
+
+        with mock.patch.object(dropbox_to_onedrive.time, "sleep"):
+            _client(_Session()).copy_item("r3", parent_id="p1", name="big.bin")
+        self.assertEqual(calls[0][3], {"parentReference": {"id": "p1"}, "name": "big.bin"})
+        self.assertEqual([c[1] for c in calls[1:]], ["https://monitor.example/1"] * 2)
+        self.assertEqual(calls[1][2], {"Authorization": None})
+
+    def test_hash_sources_uses_the_cache(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            zip_path = tmp / "d.zip"
+            with zipfile.ZipFile(zip_path, "w") as zf:
+                zf.writestr("a.txt", b"alpha")
+                zf.writestr("sub/b.txt", b"beta" * 100)
+            with zipfile.ZipFile(zip_path) as zf:
+                members, _ = iter_zip_members(zf)
+            reader = ZipReader(zip_path)
+            self.addCleanup(reader.close)
+
+            cache = HashCache(tmp / "cache.json")
+            digests = hash_sources(members, reader=reader, cache=cache, workers=2)
+            self.assertEqual(digests["sub/b.txt"], _quickxor_reference(b"beta" * 100))
+            cache.save()
+
+            # Same members extracted to disk (with the ZIP's mtimes) are
+            # cache hits under the same relative paths.
+            dest = tmp / "out"
+            dest.mkdir()
+            extract_zip_parallel(zip_path, dest, workers=2)
+            extracted = [(dest / rel, rel, size) for _, rel, size in members]
+            cache = HashCache(tmp / "cache.json").load()
+            self.assertEqual(hash_sources(extracted, reader=None, cache=cache, workers=2), digests)
+            self.assertFalse(cache.dirty)
+
+
+def _item(item_id, name, parent, *, size=None, xor=None, folder=False, deleted=False):
+    item = {"id": item_id, "name": name, "parentReference": {"id": parent}}
+    if deleted:
+        item["deleted"] = {"state": "deleted"}
+    elif folder:
+        item["folder"] = {"childCount": 0}
+    else:
+        item.update(size=size, file={"hashes": {"quickXorHash": xor}})
+    return item
+
+
+class _DeltaGraph:
+    """Serves delta pages keyed by URL; a URL mapped to an int answers with that status."""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.calls = []
+
+    def request(self, method, url, **kwargs):
+        self.calls.append((url, kwargs.get("params")))
+        page = self.pages[url]
+        if isinstance(page, int):
+            resp = requests.Response()
+            resp.status_code = page
+            return resp
+        return _Response(200, page)
+
+
+class TestRemoteIndex(unittest.TestCase):
+    FULL = "https://graph.microsoft.com/v1.0/me/drive/items/dest/delta"
+
+    def _full_listing(self):
+        return {
+            self.FULL: {
+                "value": [
+                    _item("dest", "Import", "root", folder=True),
+                    _item("f1", "docs", "dest", folder=True),
+                    _item("a", "a.txt", "f1", size=3, xor="A"),
+                ],
+                "@odata.nextLink": "next-1",
+            },
+            "next-1": {
+                "value": [_item("b", "b.txt", "dest", size=4, xor="B")],
+                "@odata.deltaLink": "token-1",
+            },
+        }
+
+    def test_second_run_fetches_only_changes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            state = Path(tmp) / "delta.json"
+            graph = _DeltaGraph(self._full_listing())
+            index = RemoteIndex(state).load()
+            self.assertEqual(sync_remote_index(_client(graph), index, item_id="dest"), 4)
+            index.save()
+            self.assertEqual(graph.calls[0], (self.FULL, {"$select": dropbox_to_onedrive.DELTA_SELECT}))
+            self.assertEqual(graph.calls[1], ("next-1", None))
+            self.assertEqual(
+                index.files(),
+                {Path("docs/a.txt"): RemoteFile("a", 3, "A"), Path("b.txt"): RemoteFile("b", 4, "B")},
+            )
+
+            # Next run: rename the folder, change b, delete a file, add one.
+            graph = _DeltaGraph(
+                {
+                    "token-1": {
+                        "value": [
+                            _item("f1", "papers", "dest", folder=True),
+                            _item("b", "b.txt", "dest", size=5, xor="B2"),
+                            _item("a", None, "f1", deleted=True),
+                            _item("c", "c.txt", "f1", size=6, xor="C"),
+                        ],
+                        "@odata.deltaLink": "token-2",
+                    }
+                }
+            )
+            index = RemoteIndex(state).load()
+            self.assertEqual(sync_remote_index(_client(graph), index, item_id="dest"), 4)
+            self.assertEqual(graph.calls, [("token-1", None)])
+            self.assertEqual(index.delta_link, "token-2")
+            self.assertEqual(
+                index.files(),
+                {Path("papers/c.txt"): RemoteFile("c", 6, "C"), Path("b.txt"): RemoteFile("b", 5, "B2")},
+            )
+
+    def test_expired_token_or_other_folder_rescans(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            index = RemoteIndex(Path(tmp) / "delta.json")
+            index.reset("dest")
+            index.delta_link = "expired"
+            index.items["stale"] = ["dest", "stale.txt", False, 1, "S"]
+            pages = self._full_listing()
+            pages["expired"] = 410
+            sync_remote_index(_client(_DeltaGraph(pages)), index, item_id="dest")
+            self.assertEqual(index.delta_link, "token-1")
+            self.assertEqual(set(index.files()), {Path("docs/a.txt"), Path("b.txt")})
+
+            index.delta_link = "expired"
+            graph = _DeltaGraph({"https://graph.microsoft.com/v1.0/me/drive/items/other/delta": {"value": []}})
+            sync_remote_index(_client(graph), index, item_id="other")
+            self.assertEqual(index.root_id, "other")
+            self.assertEqual(index.files(), {})
+
+
+class TestUploadScheduling(unittest.TestCase):
+
+    def test_largest_first_with_byte_progress(self):
+        sizes = [10, 5_000, 0, 700, 42]
+        files = [(Path(f"/src/f{i}"), Path(f"f{i}.bin"), size) for i, size in enumerate(sizes)]
+        started = []
+
+        def upload_one_file(source, rel_path, size, *, on_bytes, **kw):
+            started.append(size)
+            on_bytes(size)
+            return str(rel_path), size
+
+        with mock.patch.object(dropbox_to_onedrive, "upload_one_file", upload_one_file), \
+                mock.patch.object(dropbox_to_onedrive, "tqdm") as bar, \
+                redirect_stdout(io.StringIO()):
+            n = upload_files(
+                mock.Mock(),
+                files,
+                onedrive_folder="Dest",
+                dest_folder_id="dest",
+                children_cache={},
+                folder_id_cache={},
+                chunk_size=327_680,
+                workers=1,
+            )
+        self.assertEqual(n, len(sizes))
+        self.assertEqual(started, sorted(sizes, reverse=True))
+        self.assertEqual(bar.call_args.kwargs["total"], sum(sizes))
+        pbar = bar.return_value.__enter__.return_value
+        self.assertEqual(sum(c.args[0] for c in pbar.update.call_args_list), sum(sizes))
+
+
+class TestFakeGraphServer(unittest.TestCase):
+    """End to end against onedrive_fake: ZIP download, folder tree, simple and session uploads, delta."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = Path(tmp.name)
+        self.large = os.urandom(dropbox_to_onedrive.SIMPLE_UPLOAD_MAX + 5000)
+        self.zip_path = self.tmp / "share.zip"
+        with zipfile.ZipFile(self.zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr("share/a.txt", b"alpha")
+            zf.writestr("share/x/y/b.txt", b"beta")
+            zf.writestr("share/media/big.bin", self.large)
+        self.server = FakeGraphServer(zip_path=self.zip_path, hash_uploads=True, page_size=2).start()
+        self.addCleanup(self.server.stop)
+
+    def _client(self):
+        return GraphClient(GraphAuth("test"), governor=GraphGovernor(4), base_url=self.server.graph_url)
+
+    def test_import_into_fake_drive(self):
+        dest = self.tmp / "dl.zip"
+        with redirect_stderr(io.StringIO()):
+            download_to_file(self.server.dropbox_url, dest_path=dest, workers=2, segment_size=1 << 20)
+        self.assertEqual(dest.read_bytes(), self.zip_path.read_bytes())
+
+        with zipfile.ZipFile(dest) as zf:
+            files, _ = iter_zip_members(zf)
+        reader = ZipReader(dest)
+        self.addCleanup(reader.close)
+        client = self._client()
+        children = {}
+        dest_id = get_or_create_folder(client, parent_id="root", name="Import", children_cache=children)
+        with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
+            n = upload_files(
+                client,
+                files,
+                onedrive_folder="Import",
+                dest_folder_id=dest_id,
+                children_cache=children,
+                folder_id_cache={},
+                chunk_size=327_680 * 4,
+                workers=3,
+                reader=reader,
+            )
+        self.assertEqual(n, 3)
+        self.assertEqual(
+            self.server.files(),
+            {"Import/a.txt": 5, "Import/x/y/b.txt": 4, "Import/media/big.bin": len(self.large)},
+        )
+        self.assertEqual(self.server.calls["session.create"], 1)
+        self.assertEqual(self.server.calls["session.put"], 4)
+
+        index = RemoteIndex(self.tmp / "delta.json")
+        sync_remote_index(client, index, item_id=dest_id)
+        remote = index.files()
+        self.assertEqual(remote[Path("media/big.bin")].quick_xor, _quickxor_reference(self.large))
+        self.assertEqual(len(remote), 3)
+
+        self.server.add_file("Import/x/new.txt", 7)
+        self.server.calls.clear()
+        # Only new.txt and its ancestors x and Import come back.
+        self.assertEqual(sync_remote_index(client, index, item_id=dest_id), 3)
+        self.assertEqual(self.server.calls["delta"], 2)  # two pages of two
+        self.assertEqual(index.files()[Path("x/new.txt")].size, 7)
+
+    def test_stream_zip_repeated_name_uploads_last_copy_once(self):
+        zip_path = self.tmp / "dup.zip"
+        with zipfile.ZipFile(zip_path, "w") as zf, warnings.catch_warnings():
+            warnings.simplefilter("ignore")  # "Duplicate name"
+            zf.writestr("share/a.txt", b"stale" * 1000)
+            zf.writestr("share/a.txt", b"fresh")
+        with zipfile.ZipFile(zip_path) as zf:
+            files, _ = iter_zip_members(zf)
+        reader = ZipReader(zip_path)
+        self.addCleanup(reader.close)
+        client = self._client()
+        children = {}
+        dest_id = get_or_create_folder(client, parent_id="root", name="Import", children_cache=children)
+        with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
+            n = upload_files(
+                client,
+                files,
+                onedrive_folder="Import",
+                dest_folder_id=dest_id,
+                children_cache=children,
+                folder_id_cache={},
+                chunk_size=327_680 * 4,
+                workers=3,
+                reader=reader,
+            )
+        self.assertEqual(n, 1)
+        self.assertEqual(self.server.calls["put.simple"], 1)
+        a = [it for it in self.server.items.values() if it["name"] == "a.txt"]
+        self.assertEqual([it["quickXorHash"] for it in a], [_quickxor_reference(b"fresh")])
+
+    def test_throttled_requests_are_retried(self):
+        _no_backoff(self)
+        self.server.throttle_rate = 0.5
+        self.server.retry_after_s = 0
+        client = self._client()
+        for i in range(10):
+            client.put_content_simple(f"T/{i}.txt", b"x" * i)
+        self.assertEqual(len(self.server.files()), 10)
+        self.assertGreater(self.server.calls["throttled"], 0)
+        self.assertEqual(client.governor.throttled, self.server.calls["throttled"])
+
+    def _dropbox_import(self, existing=None):
+        url = self.server.dropbox_api_url
+        dbx = DropboxClient("token", shared_url="https://dropbox.test/s", api_url=url, content_url=url)
+        files, unsafe = list_shared_folder(dbx, workers=2)
+        self.assertEqual(unsafe, 0)
+        spool = self.tmp / "spool"
+        spool.mkdir()
+        client = self._client()
+        children = {}
+        dest_id = get_or_create_folder(client, parent_id="root", name="Import", children_cache=children)
+        with redirect_stdout(io.StringIO()) as out, redirect_stderr(io.StringIO()):
+            n = upload_files(
+                client,
+                files,
+                onedrive_folder="Import",
+                dest_folder_id=dest_id,
+                children_cache=children,
+                folder_id_cache={},
+                chunk_size=327_680 * 4,
+                workers=3,
+                fetch=dropbox_fetcher(dbx, spool, existing=existing),
+                fetch_workers=2,
+            )
+        self.assertEqual(list(spool.iterdir()), [])
+        return files, n, out.getvalue()
+
+    def test_dropbox_api_source(self):
+        files, n, out = self._dropbox_import()
+        self.assertEqual(
+            sorted((str(rel), size) for _, rel, size in files),
+            [("a.txt", 5), ("media/big.bin", len(self.large)), ("x/y/b.txt", 4)],
+        )
+        self.assertEqual(n, 3)
+        self.assertNotIn("Unchanged", out)
+        self.assertEqual(
+            self.server.files(),
+            {"Import/a.txt": 5, "Import/x/y/b.txt": 4, "Import/media/big.bin": len(self.large)},
+        )
+        # root (a.txt, media, x: two pages), media, x, x/y
+        self.assertEqual(self.server.calls["dropbox.list"], 5)
+
+    def test_dropbox_api_skips_unchanged_after_download(self):
+        existing = {
+            Path("a.txt"): RemoteFile("1", 5, _quickxor_reference(b"alpha")),
+            Path("x/y/b.txt"): RemoteFile("2", 4, _quickxor_reference(b"bet4")),
+        }
+        _, n, out = self._dropbox_import(existing)
+        self.assertEqual(set(self.server.files()), {"Import/x/y/b.txt", "Import/media/big.bin"})
+        self.assertEqual(n, 2)
+        self.assertIn("Unchanged: 1 (skipped after download).", out)
+
+    def test_finished_run_does_not_skip_same_size_changes_next_time(self):
+        state_path = self.tmp / "upload_state.json"
+        argv = ["--dropbox-url", self.server.dropbox_url, "--client-id", "c", "--onedrive-folder", "Import",
+                "--upload-state", str(state_path), "--parallel", "2"]
+        graph = functools.partial(GraphClient, base_url=self.server.graph_url)
+        with mock.patch.object(dropbox_to_onedrive, "load_onedrive_auth", return_value=GraphAuth("t")), \
+                mock.patch.object(dropbox_to_onedrive, "GraphClient", graph), \
+                redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
+            self.assertEqual(dropbox_to_onedrive.main(argv), 0)
+            self.assertFalse(state_path.exists())
+            with zipfile.ZipFile(self.zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
+                zf.writestr("share/a.txt", b"ALPHA")
+                zf.writestr("share/x/y/b.txt", b"beta")
+                zf.writestr("share/media/big.bin", self.large)
+            self.assertEqual(dropbox_to_onedrive.main(argv), 0)
+        a = [it for it in self.server.items.values() if it["name"] == "a.txt"]
+        self.assertEqual([it["quickXorHash"] for it in a], [_quickxor_reference(b"ALPHA")])
+
+    def test_dropbox_api_source_requires_token(self):
+        argv = ["--dropbox-url", "https://dropbox.test/s", "--client-id", "c", "--source", "dropbox-api"]
+        with mock.patch.dict(os.environ), redirect_stderr(io.StringIO()) as err:
+            os.environ.pop("DROPBOX_ACCESS_TOKEN", None)
+            self.assertEqual(dropbox_to_onedrive.main(argv), 2)
+        self.assertIn("--dropbox-token", err.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,703 @@
+
+import io
+import json
+import os
+import datetime as dt
+import hashlib
+import tempfile
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+from unittest import mock
+
+import gdrive_cleanup
+import httplib2
+from common_utils import human_bytes
+from google.auth.exceptions import RefreshError
+from google.oauth2.credentials import Credentials
+from gdrive_cleanup import (
+    FOLDER_MIME_TYPE,
+    MY_DRIVE_ID,
+    ChecksumIndex,
+    DriveFile,
+    FolderPathResolver,
+    ScanCheckpoint,
+    UsageRollup,
+    bottom_up_order,
+    build_parser,
+    find_duplicate_folders,
+    list_drives,
+    load_credentials,
+    srs_total,
+)
+from gdrive_fake import FakeDriveService, _http_error, compile_query, synthetic_corpus
+
+
+def run_cmd(argv, service):
+    """Run a gdrive_cleanup command against a fake service; return (rc, stdout)."""
+    args = build_parser().parse_args(argv)
+    args.service = service
+    out = io.StringIO()
+    with redirect_stdout(out), redirect_stderr(io.StringIO()):
+        rc = args.func(args)
+    return rc, out.getvalue()
+
+
+def _folder(fid, name, parent=None):
+    d = {"id": fid, "name": name, "mimeType": FOLDER_MIME_TYPE}
+    if parent:
+        d["parents"] = [parent]
+    return DriveFile.from_api(d)
+
+
+def _file(fid, name, parent, md5=None, size=0):
+    d = {"id": fid, "name": name, "mimeType": "text/csv", "parents": [parent], "size": str(size)}
+    if md5:
+        d["md5Checksum"] = md5
+    return DriveFile.from_api(d)
+
+
+class TestChecksumIndex(unittest.TestCase):
+    def test_duplicate_groups(self):
+        idx = ChecksumIndex()
+        a = "0" * 31 + "1"
+        b = "ff" * 16
+        idx.add("id1", a, 10)
+        idx.add("id2", b, 20)
+        idx.add("id3", a, 10)
+        idx.add("id4", "ab" * 16, None)
+        idx.add("id5", b, 20)
+        idx.add("id6", a, 10)
+
+        groups = idx.duplicate_groups()
+        self.assertEqual(groups, {a: ["id1", "id3", "id6"], b: ["id2", "id5"]})
+        self.assertEqual(len(idx), 6)
+        self.assertIsNone(idx.size(3))
+        self.assertEqual(idx.file_id(4), "id5")
+
+    def test_rejects_invalid_checksum(self):
+        idx = ChecksumIndex()
+        self.assertFalse(idx.add("id1", "not-hex", 1))
+        self.assertFalse(idx.add("id2", "abcd", 1))
+        self.assertEqual(len(idx), 0)
+        self.assertEqual(idx.duplicate_groups(), {})
+
+
+class TestFolderTrees(unittest.TestCase):
+    def test_bottom_up_order(self):
+        order = bottom_up_order({"a": None, "b": "a", "c": "b", "d": "a", "e": "missing"})
+        for child, parent in (("b", "a"), ("c", "b"), ("d", "a")):
+            self.assertLess(order.index(child), order.index(parent))
+        self.assertEqual(set(order), {"a", "b", "c", "d", "e"})
+
+    def test_find_duplicate_folders_reports_maximal_subtrees(self):
+        files = [
+            _folder("root", "Backups"),
+            _folder("p1", "Profile", "root"),
+            _folder("p2", "Profile (copy)", "root"),
+            _file("f1", "a.csv", "p1", md5="aa", size=100),
+            _file("f2", "a.csv", "p2", md5="aa", size=100),
+            _folder("s1", "charts", "p1"),
+            _folder("s2", "charts", "p2"),
+            _file("f3", "b.chr", "s1", md5="bb", size=50),
+            _file("f4", "b.chr", "s2", md5="bb", size=50),
+            # Same name, different content: must not match.
+            _folder("p3", "Profile", "root"),
+            _file("f5", "a.csv", "p3", md5="cc", size=100),
+            # Google Docs have no md5 and never match.
+            _folder("g1", "Docs", "root"),
+            _folder("g2", "Docs copy", "root"),
+            _file("d1", "notes", "g1"),
+            _file("d2", "notes", "g2"),
+        ]
+        groups = find_duplicate_folders(files)
+        self.assertEqual(len(groups), 1)
+        self.assertEqual([n.id for n in groups[0]], ["p1", "p2"])
+        self.assertEqual(groups[0][0].size, 150)
+        self.assertEqual(groups[0][0].file_count, 2)
+
+
+class TestUsageRollup(unittest.TestCase):
+    def test_rollup_by_owner_mime_and_folder(self):
+        rollup = UsageRollup()
+        for f in [
+            _file("f1", "a.csv", "sub", size=100),
+            _folder("root", "Backups"),
+            _folder("sub", "MT5", "root"),
+            _file("f2", "b.csv", "root", size=50),
+            DriveFile.from_api(
+                {
+                    "id": "f3",
+                    "name": "c.zip",
+                    "mimeType": "application/zip",
+                    "size": "7",
+                    "parents": ["sub"],
+                    "owners": [{"emailAddress": "me@example.com"}],
+                }
+            ),
+        ]:
+            rollup.add(f)
+
+        totals = rollup.folder_totals()
+        self.assertEqual(totals["sub"], ("MT5", 107, 2))
+        self.assertEqual(totals["root"], ("Backups", 157, 3))
+        self.assertEqual(rollup.by_mime["text/csv"], [150, 2])
+        self.assertEqual(rollup.by_owner["me@example.com"], [7, 1])
+        self.assertEqual(rollup.by_owner["(no owner)"], [150, 2])
+        self.assertEqual(rollup.top_folders(1)[0][0], "root")
+
+
+class _StubBatch:
+    def __init__(self, service, callback):
+        self._service = service
+        self._callback = callback
+        self._calls = []
+
+    def add(self, request, request_id):
+        self._calls.append((request, request_id))
+
+    def execute(self):
+        self._service.batches += 1
+        for file_id, req_id in self._calls:
+            item = self._service.items.get(file_id)
+            self._callback(req_id, item, None if item else Exception("404"))
+
+
+class _StubFiles:
+    def __init__(self, service):
+        self._service = service
+
+    def get(self, fileId, fields, supportsAllDrives):
+        self._service.gets.append(fileId)
+        return fileId
+
+
+class _StubService:
+    def __init__(self, items):
+        self.items = items
+        self.gets = []
+        self.batches = 0
+
+    def files(self):
+        return _StubFiles(self)
+
+    def new_batch_http_request(self, callback):
+        return _StubBatch(self, callback)
+
+
+class TestFolderPathResolver(unittest.TestCase):
+    def test_resolves_each_folder_once_in_batches(self):
+        service = _StubService(
+            {
+                "root": {"id": "root", "name": "My Drive"},
+                "a": {"id": "a", "name": "Backups", "parents": ["root"]},
+                "b": {"id": "b", "name": "MT5", "parents": ["a"]},
+            }
+        )
+        resolver = FolderPathResolver(service)
+        resolver.seed(_folder("c", "Profiles", "b"))
+        files = [_file("f1", "x.csv", "c"), _file("f2", "y.csv", "b"), _file("f3", "z.csv", "a")]
+        with redirect_stderr(io.StringIO()):
+            resolver.resolve_files(files)
+            resolver.resolve_files(files)
+
+        self.assertEqual(
+            [resolver.path_of(f) for f in files],
+            ["My Drive/Backups/MT5/Profiles/x.csv", "My Drive/Backups/MT5/y.csv", "My Drive/Backups/z.csv"],
+        )
+        self.assertEqual(sorted(service.gets), ["a", "b", "root"])
+        self.assertEqual(service.batches, 2)
+
+    def test_inaccessible_ancestor(self):
+        resolver = FolderPathResolver(_StubService({}))
+        with redirect_stderr(io.StringIO()):
+            resolver.resolve(["gone"])
+        self.assertEqual(resolver.path_of(_file("f1", "x.csv", "gone")), "[gone]/x.csv")
+
+
+class TestFakeDriveService(unittest.TestCase):
+    def test_compile_query(self):
+        pred = compile_query(
+            "((name contains 'bak') and (mimeType != 'application/vnd.google-apps.folder')) "
+            "and (trashed = false)"
+        )
+        self.assertTrue(pred({"name": "x.BAK", "mimeType": "text/csv"}))
+        self.assertFalse(pred({"name": "x.bak", "mimeType": "text/csv", "trashed": True}))
+        pred = compile_query("'a' in parents or 'b' in parents")
+        self.assertTrue(pred({"parents": ["b"]}))
+        self.assertFalse(pred({"parents": ["c"]}))
+
+    def test_audit_and_duplicates_offline(self):
+        items = synthetic_corpus(500, files_per_folder=20, dup_ratio=0.3, seed=1)
+        service = FakeDriveService(items)
+        rc, out = run_cmd(["--page-size", "100", "audit", "--top", "5"], service)
+        self.assertEqual(rc, 0)
+        self.assertIn(f"Files scanned: {len(items)}", out)
+        self.assertEqual(service.calls["files.list"], (len(items) + 99) // 100)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            plan_path = os.path.join(tmp, "plan.json")
+            rc, _ = run_cmd(["duplicates", "--plan-json", plan_path], service)
+            self.assertEqual(rc, 0)
+            with open(plan_path, encoding="utf-8") as f:
+                plan = json.load(f)
+        self.assertTrue(plan["groups"])
+        for g in plan["groups"]:
+            self.assertGreaterEqual(len(g["files"]), 2)
+            self.assertEqual({x["md5Checksum"] for x in g["files"]}, {g["md5Checksum"]})
+
+
+class TestAuditEstimate(unittest.TestCase):
+    def setUp(self):
+        self.items = synthetic_corpus(600, files_per_folder=30, seed=4)
+        self.total_size = sum(int(x.get("size", 0)) for x in self.items)
+
+    def test_srs_total(self):
+        self.assertEqual(srs_total([1, 2, 3], 3), (6.0, 0.0))
+        est, hw = srs_total([10, 10, 10, 10], 100)
+        self.assertEqual((est, hw), (1000.0, 0.0))
+        est, hw = srs_total([0, 20], 10)
+        self.assertEqual(est, 100.0)
+        self.assertGreater(hw, 0)
+
+    def test_all_strata_sampled_is_exact(self):
+        service = FakeDriveService(self.items)
+        rc, out = run_cmd(
+            ["audit", "--estimate", "--estimate-strata", "20", "--estimate-error", "0"], service
+        )
+        self.assertEqual(rc, 0)
+        self.assertIn("Sampled 20/20", out)
+        self.assertIn(f"Files: {len(self.items):,}", out)
+        self.assertIn(f"Total size (files with size): {human_bytes(self.total_size)}", out)
+
+    def test_page_budget_bounds_sampling(self):
+        service = FakeDriveService(self.items)
+        rc, out = run_cmd(
+            ["audit", "--estimate", "--estimate-max-pages", "15", "--estimate-seed", "1"], service
+        )
+        self.assertEqual(rc, 0)
+        self.assertIn("Files: ~", out)
+        self.assertLessEqual(service.calls["files.list"], 15)
+
+    def test_page_budget_is_checked_within_strata(self):
+        # The minimum of ESTIMATE_MIN_STRATA strata no longer overrides the budget.
+        service = FakeDriveService(self.items)
+        rc, out = run_cmd(["audit", "--estimate", "--estimate-max-pages", "5", "--estimate-seed", "1"], service)
+        self.assertEqual(rc, 0)
+        self.assertIn("Page budget (--estimate-max-pages) spent", out)
+        self.assertEqual(service.calls["files.list"], 5)
+
+    def test_dense_window_does_not_become_a_full_scan(self):
+        # A bulk migration stamped every file with the same modifiedTime.
+        items = [dict(x, modifiedTime="2023-05-01T00:00:00.000Z") for x in self.items]
+        service = FakeDriveService(items)
+        argv = ["--page-size", "10", "audit", "--estimate", "--estimate-max-pages", "8"]
+        rc, _ = run_cmd(argv, service)
+        self.assertEqual(rc, 2)
+        self.assertEqual(service.calls["files.list"], 8)
+
+    def test_rejects_export(self):
+        rc, _ = run_cmd(["audit", "--estimate", "--csv", "x.csv"], FakeDriveService(self.items))
+        self.assertEqual(rc, 2)
+
+
+class TestAllDrives(unittest.TestCase):
+    def setUp(self):
+        self.items = synthetic_corpus(1200, files_per_folder=30, dup_ratio=0.3, seed=6, shared_drives=2)
+
+    def test_list_drives_pages(self):
+        drives = [{"id": f"d{i}", "name": f"Team {i}"} for i in range(150)]
+        service = FakeDriveService([], drives=drives)
+        listed = list_drives(service)
+        self.assertEqual(listed[0].id, MY_DRIVE_ID)
+        self.assertEqual([d.name for d in listed[1:]], [d["name"] for d in drives])
+        self.assertEqual(service.calls["drives.list"], 2)
+
+    def test_audit_per_drive_matches_single_stream(self):
+        _, single = run_cmd(["audit", "--top", "5"], FakeDriveService(self.items))
+        service = FakeDriveService(self.items)
+        rc, out = run_cmd(["--all-drives", "--drive-workers", "3", "audit", "--top", "5"], service)
+        self.assertEqual(rc, 0)
+        self.assertIn("Drives scanned: 3", out)
+        for name in ("My Drive", "drive0", "drive1"):
+            n = sum(1 for x in self.items if (x.get("driveId") or "My Drive") == name)
+            self.assertIn(f"- {name}: {n} files", out)
+        # Merged totals and top files agree with one includeItemsFromAllDrives stream.
+        merged = out.split("\n\n", 1)[1]
+        self.assertEqual([l.split("  [")[0] for l in merged.splitlines()], single.splitlines())
+        self.assertEqual(service.calls["files.list"], 3)
+
+    def test_duplicates_across_drives(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            plan_path = os.path.join(tmp, "plan.json")
+            rc, out = run_cmd(
+                ["--all-drives", "duplicates", "--plan-json", plan_path], FakeDriveService(self.items)
+            )
+            self.assertEqual(rc, 0)
+            with open(plan_path, encoding="utf-8") as f:
+                plan = json.load(f)
+        cross = [g for g in plan["groups"] if len(g["drives"]) > 1]
+        self.assertTrue(cross)
+        self.assertIn(f"Groups spanning more than one drive: {len(cross)}", out)
+        for g in cross:
+            self.assertEqual(
+                len(g["drives"]), len({(x["driveId"] or MY_DRIVE_ID) for x in g["files"]})
+            )
+
+
+class TestLoadCredentials(unittest.TestCase):
+    def setUp(self):
+        self.addCleanup(gdrive_cleanup._credentials_cache.clear)
+
+    def test_valid_token_is_reused_and_not_rewritten(self):
+        scopes = ["https://www.googleapis.com/auth/drive.metadata.readonly"]
+        creds = Credentials(
+            token="t",
+            refresh_token="r",
+            client_id="c",
+            client_secret="s",
+            token_uri="https://oauth2.googleapis.com/token",
+            scopes=scopes,
+            # google-auth compares expiry as naive UTC.
+            expiry=dt.datetime.now(dt.timezone.utc).replace(tzinfo=None) + dt.timedelta(hours=1),
+        )
+        with tempfile.TemporaryDirectory() as tmp:
+            token_path = os.path.join(tmp, "token.json")
+            with open(token_path, "w", encoding="utf-8") as f:
+                f.write(creds.to_json())
+            os.utime(token_path, ns=(1, 1))
+            kw = dict(credentials_path=os.path.join(tmp, "missing.json"), token_path=token_path, scopes=scopes)
+            first = load_credentials(**kw)
+            self.assertEqual(first.token, "t")
+            self.assertEqual(os.stat(token_path).st_mtime_ns, 1)
+            os.remove(token_path)
+            # Later services in the same process reuse the loaded credentials.
+            self.assertIs(load_credentials(**kw), first)
+
+
+class TestVerifyBackup(unittest.TestCase):
+    def test_reports_missing_changed_extra_and_caches_hashes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            local = os.path.join(tmp, "archive")
+            os.makedirs(os.path.join(local, "2024", "01"))
+            files = {
+                "2024/01/a.csv": b"a" * 100,
+                "2024/01/b.csv": b"b" * 100,
+                "2024/c.xlsx": b"c" * 50,
+                "d.csv": b"d",
+            }
+            for rel, data in files.items():
+                with open(os.path.join(local, rel), "wb") as f:
+                    f.write(data)
+
+            def item(fid, name, parent, data=None):
+                d = {"id": fid, "name": name, "parents": [parent]}
+                if data is None:
+                    d["mimeType"] = FOLDER_MIME_TYPE
+                else:
+                    d.update(mimeType="text/csv", size=str(len(data)), md5Checksum=hashlib.md5(data).hexdigest())
+                return d
+
+            items = [
+                item("backup", "archive", "root"),
+                item("y2024", "2024", "backup"),
+                item("m01", "01", "y2024"),
+                item("fa", "a.csv", "m01", files["2024/01/a.csv"]),
+                item("fb", "b.csv", "m01", b"B" * 100),  # same size, other content
+                item("fc", "c.xlsx", "y2024", b"c" * 49),  # size differs
+                item("fx", "old.csv", "backup", b"x"),
+                {"id": "doc", "name": "notes", "mimeType": "application/vnd.google-apps.document", "parents": ["backup"]},
+            ]
+            report = os.path.join(tmp, "report.json")
+            argv = [
+                "verify-backup", "--local", local, "--folder-id", "backup",
+                "--hash-cache", os.path.join(tmp, "cache.json"), "--json", report,
+            ]
+            service = FakeDriveService(items)
+            rc, out = run_cmd(argv, service)
+            self.assertEqual(rc, 1)
+            with open(report, encoding="utf-8") as f:
+                payload = json.load(f)
+            self.assertEqual(payload["ok"], 1)
+            self.assertEqual(payload["missing"], ["d.csv"])
+            self.assertEqual([c["path"] for c in payload["changed"]], ["2024/01/b.csv", "2024/c.xlsx"])
+            self.assertEqual([x["path"] for x in payload["extra"]], ["old.csv"])
+            # Two size-equal candidates hashed; the size mismatch never is.
+            self.assertIn("Hashed: 2 files", out)
+            # One listing per folder level.
+            self.assertEqual(service.calls["files.list"], 3)
+
+            rc, out = run_cmd(argv, FakeDriveService(items))
+            self.assertIn("Hashed: 0 files (0B); cache hits: 2", out)
+
+    def test_missing_local_fails_before_opening_drive(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            argv = ["verify-backup", "--local", os.path.join(tmp, "typo"), "--folder-id", "backup"]
+            with mock.patch("gdrive_cleanup.open_drive_service") as opener:
+                rc, _ = run_cmd(argv, FakeDriveService([]))
+        self.assertEqual(rc, 2)
+        opener.assert_not_called()
+
+
+class _InterruptedUploads(FakeDriveService):
+    """Fails the n-th resumable chunk once, like a dropped connection."""
+
+    def __init__(self, items, fail_on_chunk):
+        super().__init__(items)
+        self.fail_on_chunk = fail_on_chunk
+
+    def _append_chunk(self, uri, offset, data):
+        if self.calls["upload.chunk"] == self.fail_on_chunk:
+            self.fail_on_chunk = None
+            raise _http_error(503, "backendError")
+        return super()._append_chunk(uri, offset, data)
+
+
+class TestUpload(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.local = os.path.join(self.tmp.name, "archive")
+        os.makedirs(os.path.join(self.local, "2024", "01"))
+        self.files = {
+            "same.csv": b"same" * 10,
+            "changed.csv": b"new content",
+            "2024/01/small.csv": b"x" * 1000,
+            "2024/big.bin": os.urandom(2 * 1024 * 1024 + 7),  # 3 chunks of 1 MB
+        }
+        for rel, data in self.files.items():
+            with open(os.path.join(self.local, rel), "wb") as f:
+                f.write(data)
+        self.items = [
+            {"id": "backup", "name": "archive", "mimeType": FOLDER_MIME_TYPE, "parents": ["root"]},
+            {"id": "same", "name": "same.csv", "mimeType": "text/csv", "parents": ["backup"],
+             "size": "40", "md5Checksum": hashlib.md5(self.files["same.csv"]).hexdigest()},
+            {"id": "old", "name": "changed.csv", "mimeType": "text/csv", "parents": ["backup"],
+             "size": "11", "md5Checksum": hashlib.md5(b"old content").hexdigest()},
+        ]
+        self.argv = [
+            "upload", "--local", self.local, "--folder-id", "backup",
+            "--resumable-mb", "1", "--chunk-mb", "1",
+            "--sessions", os.path.join(self.tmp.name, "sessions.json"),
+            "--hash-cache", os.path.join(self.tmp.name, "cache.json"),
+        ]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _verify(self, service):
+        rc, out = run_cmd(
+            ["verify-backup", "--local", self.local, "--folder-id", "backup",
+             "--hash-cache", os.path.join(self.tmp.name, "cache.json")],
+            service,
+        )
+        self.assertEqual(rc, 0, out)
+        self.assertIn(f"OK: {len(self.files)}", out)
+
+    def test_dry_run_then_upload(self):
+        service = FakeDriveService(self.items)
+        rc, out = run_cmd(self.argv, service)
+        self.assertEqual(rc, 0)
+        self.assertIn("To upload: 2 new, 1 changed", out)
+        self.assertIn("Folders to create: 2", out)
+        self.assertIn("Dry-run only", out)
+        self.assertEqual(service.calls["files.create"], 0)
+
+        rc, out = run_cmd(self.argv + ["--apply"], service)
+        self.assertEqual(rc, 0, out)
+        self.assertIn("Uploaded: 3/3", out)
+        self.assertEqual(service.calls["batch"], 2)  # one per folder level
+        self.assertEqual(service.calls["upload.chunk"], 3)  # big.bin only
+        self.assertEqual(service._items["old"]["md5Checksum"], hashlib.md5(b"new content").hexdigest())
+        self._verify(service)
+
+        rc, out = run_cmd(self.argv + ["--apply"], service)
+        self.assertEqual(rc, 0)
+        self.assertIn("To upload: 0 new, 0 changed", out)
+
+    def test_transport_error_fails_the_file_not_the_run(self):
+        service = FakeDriveService(self.items)
+        real = gdrive_cleanup.upload_file
+
+        def flaky(svc, **kw):
+            if kw["rel"] == "2024/01/small.csv":
+                raise httplib2.ServerNotFoundError("Unable to find the server at www.googleapis.com")
+            return real(svc, **kw)
+
+        with mock.patch("gdrive_cleanup.upload_file", side_effect=flaky):
+            rc, out = run_cmd(self.argv + ["--apply"], service)
+        self.assertEqual(rc, 3)
+        self.assertIn("Uploaded: 2/3", out)
+        self.assertIn("- 2024/01/small.csv: ServerNotFoundError: Unable to find the server", out)
+
+    def test_bad_arguments_fail_before_opening_drive(self):
+        missing = self.argv.copy()
+        missing[missing.index("--local") + 1] = os.path.join(self.tmp.name, "typo")
+        zero_chunk = self.argv.copy()
+        zero_chunk[zero_chunk.index("--chunk-mb") + 1] = "0"
+        with mock.patch("gdrive_cleanup.open_drive_service") as opener:
+            self.assertEqual(run_cmd(missing, FakeDriveService(self.items))[0], 2)
+            self.assertEqual(run_cmd(zero_chunk, FakeDriveService(self.items))[0], 2)
+        opener.assert_not_called()
+
+    def test_resumes_interrupted_session(self):
+        argv = self.argv
+        service = _InterruptedUploads(self.items, fail_on_chunk=2)
+        rc, out = run_cmd(argv + ["--apply", "--workers", "1"], service)
+        self.assertEqual(rc, 3)
+        self.assertIn("2024/big.bin", out)
+        sessions_path = os.path.join(self.tmp.name, "sessions.json")
+        self.assertTrue(os.path.exists(sessions_path))
+
+        rc, out = run_cmd(argv + ["--apply"], service)
+        self.assertEqual(rc, 0, out)
+        self.assertIn("To upload: 1 new, 0 changed", out)
+        self.assertEqual(service.calls["upload.status"], 1)
+        # Drive kept chunk 1, so the rerun sends chunks 2 and 3 only (plus the failed attempt).
+        self.assertEqual(service.calls["upload.chunk"], 4)
+        self.assertFalse(os.path.exists(sessions_path))
+        self._verify(service)
+
+
+class TestTrashQueryStream(unittest.TestCase):
+    def setUp(self):
+        self.items = synthetic_corpus(450, files_per_folder=50, seed=2)
+        self.service = FakeDriveService(self.items)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.ckpt = os.path.join(self.tmp.name, "ckpt.jsonl")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _trashed(self):
+        return {i for i, it in self.service._items.items() if it.get("trashed")}
+
+    def test_requires_confirmed_count(self):
+        rc, _ = run_cmd(["trash-query", "--stream", "--apply", "--checkpoint", self.ckpt], self.service)
+        self.assertEqual(rc, 2)
+        self.assertEqual(self._trashed(), set())
+
+    def test_streams_up_to_confirmed_count(self):
+        argv = ["--page-size", "100", "trash-query", "--stream", "--apply",
+                "--confirm", "TRASH 250 FILES", "--checkpoint", self.ckpt]
+        rc, out = run_cmd(argv, self.service)
+        self.assertEqual(rc, 0)
+        self.assertIn("Trashed: 250/250", out)
+        self.assertEqual(len(self._trashed()), 250)
+        self.assertFalse(os.path.exists(self.ckpt))
+
+    def test_resume_and_approved_ids(self):
+        files = [it["id"] for it in self.items if it["id"].startswith("file")]
+        approved = files[:150]
+        ids_path = os.path.join(self.tmp.name, "ids.json")
+        with open(ids_path, "w", encoding="utf-8") as f:
+            json.dump({"fileIds": approved}, f)
+        q = "mimeType != 'application/vnd.google-apps.folder'"
+        # A previous run already trashed the first 100 approved files.
+        with open(self.ckpt, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"query": q, "cap": 150}) + "\n")
+            f.write(json.dumps({"trashed": approved[:100], "failed": []}) + "\n")
+        for fid in approved[:100]:
+            self.service._items[fid]["trashed"] = True
+
+        argv = ["trash-query", "--stream", "--apply", "--approved-ids", ids_path,
+                "--confirm", "TRASH 150 FILES", "--checkpoint", self.ckpt]
+        rc, out = run_cmd(argv, self.service)
+        self.assertEqual(rc, 0)
+        self.assertIn("Resuming: 100", out)
+        self.assertEqual(self._trashed(), set(approved))
+        self.assertEqual(self.service.calls["files.update"], 50)
+
+    def test_worker_transport_error_fails_chunks_without_hanging(self):
+        argv = ["--page-size", "100", "trash-query", "--stream", "--apply",
+                "--confirm", "TRASH 250 FILES", "--checkpoint", self.ckpt]
+        with mock.patch("gdrive_cleanup.trash_chunk", side_effect=TimeoutError("timed out")):
+            rc, out = run_cmd(argv, self.service)
+        self.assertEqual(rc, 3)
+        self.assertIn("TimeoutError: timed out", out)
+        self.assertIn("Trashed: 0/250", out)
+        self.assertTrue(os.path.exists(self.ckpt))
+        self.assertEqual(self._trashed(), set())
+
+
+class _FlakyDriveService(FakeDriveService):
+    """Fails the n-th files.list call once, like a network blip mid-scan."""
+
+    def __init__(self, items, fail_on_call, error=None):
+        super().__init__(items)
+        self.fail_on_call = fail_on_call
+        self.error = error or _http_error(503, "backendError")
+
+    def _list(self, **kw):
+        if self.calls["files.list"] == self.fail_on_call:
+            self.fail_on_call = -1
+            raise self.error
+        return super()._list(**kw)
+
+
+class TestResumableScans(unittest.TestCase):
+    def setUp(self):
+        self.items = synthetic_corpus(1000, files_per_folder=25, dup_ratio=0.2, seed=3)
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _resume_matches_clean_run(self, cmd_args, error=None):
+        ckpt = os.path.join(self.tmp.name, "scan.json")
+        common = ["--page-size", "50"]
+        extra = ["--checkpoint", ckpt, "--checkpoint-every", "3"]
+        _, expected = run_cmd(common + cmd_args, FakeDriveService(self.items))
+
+        flaky = _FlakyDriveService(self.items, fail_on_call=13, error=error)
+        rc, _ = run_cmd(common + cmd_args + extra, flaky)
+        self.assertEqual(rc, 2)
+        self.assertTrue(os.path.exists(ckpt))
+
+        rc, out = run_cmd(common + cmd_args + extra + ["--resume"], flaky)
+        self.assertEqual(rc, 0)
+        self.assertEqual(out, expected)
+        self.assertFalse(os.path.exists(ckpt))
+        # The failed call plus the resumed pages: nothing before page 13 is re-read.
+        self.assertEqual(flaky.calls["files.list"], 13 + (len(self.items) + 49) // 50 - 12)
+
+    def test_audit_resume(self):
+        self._resume_matches_clean_run(["audit", "--top", "10", "--rollup"])
+
+    def test_duplicates_resume(self):
+        plan = os.path.join(self.tmp.name, "plan.json")
+        self._resume_matches_clean_run(["duplicates", "--plan-json", plan])
+
+    def test_resume_after_transport_and_token_errors(self):
+        self._resume_matches_clean_run(["audit", "--top", "10"], error=TimeoutError("timed out"))
+        plan = os.path.join(self.tmp.name, "plan.json")
+        self._resume_matches_clean_run(["duplicates", "--plan-json", plan], error=RefreshError("invalid_grant"))
+
+    def test_periodic_saves_are_spaced_by_their_cost(self):
+        clock = [100.0]
+        saves = []
+
+        def state():
+            saves.append(clock[0])
+            clock[0] += 1.0  # each save takes a second
+            return {}
+
+        ckpt = ScanCheckpoint(os.path.join(self.tmp.name, "c.json"), key={}, every_pages=1, state_fn=state)
+        with mock.patch.object(gdrive_cleanup, "time") as fake_time:
+            fake_time.monotonic.side_effect = lambda: clock[0]
+            for page in range(100):
+                ckpt.on_page(str(page))
+                clock[0] += 0.5
+        # One save, then none until 20 s (20x its duration) have passed.
+        self.assertEqual(saves, [100.0, 121.0, 142.0])
+        ckpt.save()  # explicit saves, as on errors, are never skipped
+        self.assertEqual(len(saves), 4)
+
+    def test_resume_rejects_other_scan(self):
+        ckpt = os.path.join(self.tmp.name, "scan.json")
+        with open(ckpt, "w", encoding="utf-8") as f:
+            json.dump({"key": {"command": "audit", "query": "x"}, "pageToken": "5"}, f)
+        rc, _ = run_cmd(["audit", "--checkpoint", ckpt, "--resume"], FakeDriveService(self.items))
+        self.assertEqual(rc, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()